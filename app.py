@@ -3,7 +3,7 @@
 # Este código corrige todos os erros críticos de build e runtime
 # Arquitetura otimizada para plano pago com Metal Build Environment
 
-from flask import Flask
+from flask import Flask, request
 import requests
 from bs4 import BeautifulSoup
 import time
@@ -12,17 +12,53 @@ import logging
 import os
 import re
 import random
-import spacy
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import urllib.parse
-from supabase import create_client
+
+try:
+    import zstandard  # Opcional: compressão melhor para o arquivo de respostas
+except ImportError:
+    zstandard = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser  # Opcional: parser HTML mais rápido
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    import fcntl  # Trava entre processos no cache de embeddings em disco (POSIX)
+except ImportError:
+    fcntl = None
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from geopy.geocoders import Nominatim
+from geopy.extra.rate_limiter import RateLimiter
 import ssl
 import certifi
 import subprocess
 import sys
+import hashlib
+import csv
+import sqlite3
+import unicodedata
+import gzip
+import codecs
+import math
+import itertools
+import html as html_module
+import base64
+import threading
+import gc
+import queue
+import uuid
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+from email.utils import parsedate_to_datetime
 
 # Configurar logs
 logging.basicConfig(
@@ -38,74 +74,758 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 SCRAPERAPI_KEY = os.getenv("SCRAPERAPI_KEY")
 
-# Verificar variáveis obrigatórias
-required_vars = {
-    "SERPAPI_KEY": SERPAPI_KEY,
-    "SUPABASE_URL": SUPABASE_URL,
-    "SUPABASE_SERVICE_ROLE_KEY": SUPABASE_SERVICE_ROLE_KEY
-}
+def require_env(**variables):
+    """Falha com mensagem clara se alguma variável obrigatória não estiver configurada"""
+    missing_vars = [var for var, value in variables.items() if not value]
+    if missing_vars:
+        raise RuntimeError(f"Variáveis de ambiente não configuradas: {', '.join(missing_vars)}")
 
-missing_vars = [var for var, value in required_vars.items() if not value]
-if missing_vars:
-    logger.error(f"❌ Variáveis de ambiente não configuradas: {', '.join(missing_vars)}")
-    exit(1)
+# 📏 MÉTRICAS (histogramas e contadores por estágio, formato Prometheus)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_PROFILE_DIR = os.getenv("METRICS_PROFILE_DIR")  # Relatório JSON por execução (vazio = desativado)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
 
-# Criar cliente Supabase
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+class _NullTimer:
+    __slots__ = ()
 
-# 🧠 CARREGAR MODELOS DE IA COM CACHE E FALBACK (ARQUITETURA OTIMIZADA)
-try:
-    # 1. Verificar se os modelos NLP estão instalados, senão instalar
-    def install_spacy_models():
-        """Instala modelos NLP do spaCy se não estiverem disponíveis"""
-        try:
-            # Verificar se modelo completo está disponível
-            spacy.load("pt_core_news_lg")
-            logger.info("✅ Modelo NLP completo (pt_core_news_lg) já instalado")
-            return "pt_core_news_lg"
-        except Exception as e1:
-            logger.warning(f"⚠️ Modelo completo não disponível: {e1}")
-            
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+class Metrics:
+    """Contadores e histogramas em memória, expostos no formato texto do Prometheus.
+
+    Desativado (``METRICS_ENABLED=0``), ``timer`` devolve um context manager vazio e
+    ``inc``/``observe`` retornam na primeira linha — o custo fica num if. Gauges são
+    callbacks lidos só na hora de renderizar ``/metrics``.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._definitions = OrderedDict()  # nome → (tipo, ajuda, buckets)
+        self._counters = {}  # (nome, labels) → valor
+        self._histograms = {}  # (nome, labels) → [contagens por bucket, soma, contagem]
+        self._gauges = OrderedDict()  # nome → callback que devolve {labels: valor}
+
+    def counter(self, name, help_text):
+        self._definitions[name] = ("counter", help_text, None)
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._definitions[name] = ("histogram", help_text, tuple(buckets))
+
+    def gauge(self, name, help_text, callback):
+        self._definitions[name] = ("gauge", help_text, None)
+        self._gauges[name] = callback
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        buckets = self._definitions[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def timer(self, name, **labels):
+        """``with METRICS.timer("eleva_x_seconds"):`` mede o bloco e registra no histograma"""
+        return _Timer(self, name, labels) if self.enabled else _NULL_TIMER
+
+    def time_iter(self, name, iterable):
+        """Mede o tempo para produzir cada item de um iterador (ex.: cada Doc do ``nlp.pipe``)"""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iter(iterable))
+
+    def _timed_iter(self, name, iterator):
+        while True:
+            start = time.perf_counter()
             try:
-                # Verificar se modelo leve está disponível
-                spacy.load("pt_core_news_sm")
-                logger.info("✅ Modelo NLP leve (pt_core_news_sm) já instalado")
-                return "pt_core_news_sm"
-            except Exception as e2:
-                logger.warning(f"⚠️ Modelo leve não disponível: {e2}. Instalando...")
-                
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(name, time.perf_counter() - start)
+            yield item
+
+    def snapshot(self):
+        """Cópia dos valores atuais (para calcular o perfil de uma execução)"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {key: [list(state[0]), state[1], state[2]] for key, state in self._histograms.items()}
+            }
+
+    def delta(self, before):
+        """O que mudou desde ``before``, no formato de ``snapshot`` (para enviar entre processos)"""
+        after = self.snapshot()
+        counters = {key: value - before["counters"].get(key, 0) for key, value in after["counters"].items()}
+        histograms = {}
+        for key, (counts, total, count) in after["histograms"].items():
+            old_counts, old_total, old_count = before["histograms"].get(key, [[0] * len(counts), 0.0, 0])
+            if count != old_count:
+                histograms[key] = [[c - o for c, o in zip(counts, old_counts)], total - old_total, count - old_count]
+        return {"counters": {key: value for key, value in counters.items() if value}, "histograms": histograms}
+
+    def merge(self, delta):
+        """Soma um ``delta`` vindo de outro processo (ex.: workers do enriquecimento)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            for key, value in delta["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (counts, total, count) in delta["histograms"].items():
+                state = self._histograms.get(key)
+                if state is None:
+                    state = self._histograms[key] = [[0] * len(counts), 0.0, 0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    def render(self):
+        """Todas as métricas no formato de exposição texto do Prometheus"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, (kind, help_text, buckets) in self._definitions.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in snapshot["counters"].items():
+                    if metric == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+            elif kind == "histogram":
+                for (metric, labels), (counts, total, count) in snapshot["histograms"].items():
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, n in zip(buckets, counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{self._format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_bucket{self._format_labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+            else:
                 try:
-                    # Instalar modelo leve como fallback
-                    subprocess.run([sys.executable, "-m", "spacy", "download", "pt_core_news_sm", "--quiet"], check=True)
-                    logger.info("✅ Modelo NLP leve instalado com sucesso")
-                    return "pt_core_news_sm"
-                except Exception as e3:
-                    logger.error(f"❌ Falha crítica na instalação de modelos NLP: {e3}")
-                    logger.error("❌ Sistema não pode continuar sem modelo NLP")
-                    exit(1)
-    
-    # Instalar e carregar modelo NLP
-    model_name = install_spacy_models()
-    nlp = spacy.load(model_name)
-    logger.info(f"✅ Modelo NLP carregado com sucesso: {model_name}")
-    
-    # 2. Modelo de embeddings multilíngue (captura variações globais)
-    EMBEDDING_MODEL = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    logger.info("✅ Modelo de embeddings multilíngue carregado")
-    
-    # 3. Geocodificador para identificar cidades brasileiras
-    geolocator = Nominatim(user_agent="eleva_scraper", timeout=10)
-    logger.info("✅ Geocodificador ativado")
-    
-except Exception as e:
-    logger.error(f"❌ Erro ao carregar modelos de IA: {e}")
-    exit(1)
+                    values = self._gauges[name]()
+                except Exception as e:
+                    logger.debug(f"Gauge {name} indisponível: {e}")
+                    values = {}
+                for labels, value in values.items():
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def profile(self, before):
+        """Resumo do que mudou desde ``before``: contadores e latências (p50/p90/p99 por bucket)"""
+        after = self.snapshot()
+        report = {"counters": {}, "histograms": {}}
+        for (name, labels), value in after["counters"].items():
+            delta = value - before["counters"].get((name, labels), 0)
+            if delta:
+                report["counters"][name + self._format_labels(labels)] = delta
+        for (name, labels), (counts, total, count) in after["histograms"].items():
+            old_counts, old_total, old_count = before["histograms"].get((name, labels), [[0] * len(counts), 0.0, 0])
+            n = count - old_count
+            if not n:
+                continue
+            deltas = [c - o for c, o in zip(counts, old_counts)]
+            buckets = self._definitions[name][2]
+            
+            def quantile(q):
+                # Limite superior do bucket onde cai o quantil (estimativa conservadora)
+                target, cumulative = q * n, 0
+                for bound, c in zip(buckets, deltas):
+                    cumulative += c
+                    if cumulative >= target:
+                        return bound
+                return float("inf")
+            
+            report["histograms"][name + self._format_labels(labels)] = {
+                "count": n,
+                "sum": round(total - old_total, 6),
+                "mean": round((total - old_total) / n, 6),
+                "p50": quantile(0.5), "p90": quantile(0.9), "p99": quantile(0.99)
+            }
+        return report
+
+METRICS = Metrics()
+METRICS.histogram("eleva_serpapi_request_seconds", "Latência das buscas no SerpAPI")
+METRICS.counter("eleva_serpapi_requests_total", "Buscas no SerpAPI por resultado (api, cache, erro, sem_cota)")
+METRICS.histogram("eleva_fetch_seconds", "Download da página de detalhes (todas as tentativas)")
+METRICS.counter("eleva_fetch_total", "Downloads de páginas de detalhes por resultado")
+METRICS.counter("eleva_circuit_open_total", "Aberturas do circuit breaker por domínio")
+METRICS.histogram("eleva_parse_seconds", "Extração de descrição e dados estruturados do HTML")
+METRICS.histogram("eleva_spacy_seconds", "Processamento spaCy por documento")
+METRICS.histogram("eleva_embedding_encode_seconds", "Chamadas a EMBEDDING_MODEL.encode (incluindo cache)")
+METRICS.histogram("eleva_embedding_batch_size", "Textos por chamada a EMBEDDING_MODEL.encode", buckets=SIZE_BUCKETS)
+METRICS.counter("eleva_geocode_total", "Resoluções de lugares por origem (gazetteer, cache, nominatim, miss)")
+METRICS.histogram("eleva_nominatim_seconds", "Latência das chamadas ao Nominatim")
+METRICS.histogram("eleva_storage_write_seconds", "Upserts no Supabase/PostgREST por lote")
+METRICS.counter("eleva_storage_rows_total", "Linhas gravadas por resultado (saved, error)")
+
+# 📦 REGISTRO DE RECURSOS (modelos e clientes carregados no primeiro uso)
+class LazyResource:
+    """Proxy que carrega o recurso real na primeira utilização.
+
+    Atributos e chamadas são repassados ao objeto carregado, então o código que usa
+    ``nlp(...)``, ``nlp.pipe(...)`` ou ``EMBEDDING_MODEL.encode(...)`` não muda. O
+    carregamento é protegido por lock: threads concorrentes esperam um único load.
+    """
+
+    def __init__(self, name, loader):
+        self._name = name
+        self._loader = loader
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    self._value = self._loader()
+                    logger.info(f"📦 Recurso '{self._name}' carregado em {time.perf_counter() - started:.1f}s")
+        return self._value
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+    def __setattr__(self, attr, value):
+        # Atributos do próprio proxy começam com "_"; o resto é configuração do recurso
+        if attr.startswith("_"):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self.get(), attr, value)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+class ResourceRegistry:
+    """Modelos e clientes pesados, carregados sob demanda ou pré-carregados via ``warm_up``"""
+
+    def __init__(self):
+        self._resources = OrderedDict()
+
+    def register(self, name, loader):
+        resource = LazyResource(name, loader)
+        self._resources[name] = resource
+        return resource
+
+    def get(self, name):
+        return self._resources[name].get()
+
+    def warm_up(self, names=None):
+        """Carrega os recursos indicados (todos, por padrão) antes do primeiro uso"""
+        for name in names or self._resources:
+            self.get(name)
+
+    def preload_for_fork(self, names=None):
+        """Carrega antes de criar processos filhos (fork) e congela os objetos no GC.
+
+        Com ``gc.freeze`` o coletor não toca nas páginas herdadas, preservando o
+        compartilhamento copy-on-write entre os workers.
+        """
+        self.warm_up(names)
+        gc.collect()
+        gc.freeze()
+
+    def status(self):
+        return {name: resource.loaded for name, resource in self._resources.items()}
+
+RESOURCES = ResourceRegistry()
+
+def _load_supabase():
+    from supabase import create_client
+    require_env(SUPABASE_URL=SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY=SUPABASE_SERVICE_ROLE_KEY)
+    return create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+
+supabase = RESOURCES.register("supabase", _load_supabase)
+
+def _load_postgrest():
+    from postgrest import SyncPostgrestClient
+    return SyncPostgrestClient(POSTGREST_URL)
+
+postgrest = RESOURCES.register("postgrest", _load_postgrest)
+
+# 🗃️ Cache de embeddings (LRU em memória + persistência opcional em disco)
+EMBEDDING_MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "50000"))  # Vetores mantidos em memória
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")  # Ex.: /data/embeddings (vazio = só memória)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx (int8 quantizado, CPU)
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", ".cache/onnx")  # Modelo exportado/quantizado (gerado uma vez)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # Threads de inferência (0 = padrão da biblioteca)
+EMBEDDING_MAX_SEQ_LENGTH = 128  # Mesmo limite do SentenceTransformer para este modelo
+NOMINATIM_DOMAIN = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.getenv("NOMINATIM_SCHEME", "https")
+
+class CachedEmbeddingModel:
+    """Camada de cache endereçada por conteúdo em volta do SentenceTransformer.
+
+    A chave de cada vetor é o SHA-1 de (nome do modelo, texto). Os vetores ficam
+    num LRU limitado em memória e, se ``cache_dir`` for informado, num arquivo
+    float32 append-only lido via ``np.memmap`` — assim persistem entre execuções
+    diárias. Só os textos ausentes do cache são enviados ao modelo, num único lote.
+
+    Vários processos (ex.: o pool de enriquecimento) podem compartilhar o mesmo
+    ``cache_dir``: cada gravação acontece sob uma trava de arquivo e, se outro
+    processo tiver anexado vetores, o índice é relido antes de anexar.
+    """
+
+    def __init__(self, model, model_name, max_entries=EMBEDDING_CACHE_SIZE, cache_dir=None):
+        self.model = model
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+
+        # Armazenamento em disco: vectors.f32 (linhas) + keys.txt (uma chave por linha)
+        self._disk_index = {}
+        self._disk_rows = 0
+        self._disk_vectors = None
+        self._dim = None
+        if cache_dir:
+            self._open_disk_store()
+
+    def __getattr__(self, name):
+        # Demais atributos (ex.: get_sentence_embedding_dimension) vêm do modelo original
+        return getattr(self.model, name)
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _paths(self):
+        return (
+            os.path.join(self.cache_dir, "meta.json"),
+            os.path.join(self.cache_dir, "keys.txt"),
+            os.path.join(self.cache_dir, "vectors.f32")
+        )
+
+    def _open_disk_store(self):
+        """Carrega o índice do disco e mapeia os vetores em memória (sem copiar)"""
+        meta_path, keys_path, vectors_path = self._paths()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not os.path.exists(meta_path):
+                return
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("model") != self.model_name:
+                logger.warning(f"⚠️ Cache de embeddings em {self.cache_dir} é de outro modelo; ignorando")
+                self.cache_dir = None
+                return
+            self._dim = int(meta["dim"])
+            rows = self._reload_index()
+            logger.info(f"✅ Cache de embeddings em disco carregado: {rows} vetores")
+        except Exception as e:
+            logger.warning(f"⚠️ Cache de embeddings em disco indisponível: {e}")
+            self.cache_dir = None
+
+    def _reload_index(self):
+        """Relê ``keys.txt`` e o tamanho de ``vectors.f32``; linhas sem par (escrita interrompida) são ignoradas"""
+        _, keys_path, vectors_path = self._paths()
+        keys = []
+        if os.path.exists(keys_path):
+            with open(keys_path, "r", encoding="utf-8") as f:
+                keys = [line.strip() for line in f if line.strip()]
+        rows = min(len(keys), os.path.getsize(vectors_path) // (4 * self._dim) if os.path.exists(vectors_path) else 0)
+        self._disk_index = {}
+        for i, key in enumerate(keys[:rows]):
+            self._disk_index.setdefault(key, i)
+        self._disk_rows = rows
+        self._remap(rows)
+        return rows
+
+    def _truncate_to(self, rows):
+        """Descarta sobras de uma escrita interrompida para manter chaves e vetores alinhados"""
+        _, keys_path, vectors_path = self._paths()
+        if os.path.exists(vectors_path) and os.path.getsize(vectors_path) != rows * 4 * self._dim:
+            with open(vectors_path, "r+b") as f:
+                f.truncate(rows * 4 * self._dim)
+        if os.path.exists(keys_path):
+            with open(keys_path, "r", encoding="utf-8") as f:
+                keys = [line for line in f if line.strip()]
+            if len(keys) != rows:
+                with open(keys_path, "w", encoding="utf-8") as f:
+                    f.writelines(keys[:rows])
+
+    def _file_lock(self):
+        """Trava exclusiva entre processos (no-op sem ``fcntl``)"""
+        lock_file = open(os.path.join(self.cache_dir, ".lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file  # Fechar o arquivo libera a trava
+
+    def _remap(self, rows):
+        _, _, vectors_path = self._paths()
+        self._disk_vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim)) if rows else None
+
+    def _append_to_disk(self, keys, vectors):
+        meta_path, keys_path, vectors_path = self._paths()
+        try:
+            with self._file_lock():
+                if self._dim is None:
+                    self._dim = vectors.shape[1]
+                    if not os.path.exists(meta_path):
+                        with open(meta_path, "w", encoding="utf-8") as f:
+                            json.dump({"model": self.model_name, "dim": self._dim}, f)
+                # Outro processo anexou desde a última leitura: os offsets locais estão velhos
+                if not os.path.exists(vectors_path) or os.path.getsize(vectors_path) != self._disk_rows * 4 * self._dim:
+                    self._reload_index()
+                    self._truncate_to(self._disk_rows)
+                new = [(key, vector) for key, vector in zip(keys, vectors) if key not in self._disk_index]
+                if not new:
+                    return
+                start = self._disk_rows
+                with open(vectors_path, "ab") as f:
+                    f.write(np.ascontiguousarray([vector for _, vector in new], dtype=np.float32).tobytes())
+                with open(keys_path, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{key}\n" for key, _ in new))
+                for i, (key, _) in enumerate(new):
+                    self._disk_index[key] = start + i
+                self._disk_rows = start + len(new)
+                self._remap(self._disk_rows)
+        except Exception as e:
+            logger.warning(f"⚠️ Falha ao persistir embeddings em disco: {e}")
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key):
+        vector = self._memory.get(key)
+        if vector is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return vector
+        row = self._disk_index.get(key)
+        if row is not None and self._disk_vectors is not None:
+            vector = np.array(self._disk_vectors[row])
+            self._remember(key, vector)
+            self.hits += 1
+            self.disk_hits += 1
+            return vector
+        return None
+
+    def encode(self, sentences, **kwargs):
+        """Mesma interface do SentenceTransformer.encode, com cache por texto"""
+        # Opções que alteram o vetor (ex.: normalize_embeddings) não passam pelo cache
+        if any(k not in ("batch_size", "show_progress_bar") for k in kwargs):
+            return self.model.encode(sentences, **kwargs)
+
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        METRICS.observe("eleva_embedding_batch_size", len(texts))
+        with METRICS.timer("eleva_embedding_encode_seconds"):
+            return self._encode_cached(texts, single, kwargs)
+
+    def _encode_cached(self, texts, single, kwargs):
+        keys = [self._key(text) for text in texts]
+        found = {}
+        pending = {}
+
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in pending:
+                    continue
+                vector = self._lookup(key)
+                if vector is None:
+                    pending[key] = text
+                else:
+                    found[key] = vector
+
+        if pending:
+            start = time.perf_counter()
+            encoded = np.asarray(self.model.encode(list(pending.values()), **kwargs), dtype=np.float32)
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.misses += len(pending)
+                self.encode_seconds += elapsed
+                for key, vector in zip(pending.keys(), encoded):
+                    self._remember(key, vector)
+                    found[key] = vector
+                if self.cache_dir:
+                    new_keys = [key for key in pending if key not in self._disk_index]
+                    if new_keys:
+                        self._append_to_disk(new_keys, np.vstack([found[key] for key in new_keys]))
+
+        if not texts:
+            return np.zeros((0, self._dim or 0), dtype=np.float32)
+        result = np.vstack([found[key] for key in keys])
+        return result[0] if single else result
+
+    def stats(self):
+        """Contadores de acerto/erro e tempo gasto no encoder"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self._disk_index),
+                "encode_seconds": round(self.encode_seconds, 3),
+                "estimated_seconds_saved": round(self.encode_seconds / self.misses * self.hits, 3) if self.misses else 0.0
+            }
+
+class OnnxEmbeddingModel:
+    """Encoder do SentenceTransformer exportado para ONNX Runtime com quantização int8.
+
+    Na primeira vez o modelo é exportado e quantizado dinamicamente em ``export_dir``
+    (requer ``optimum``/torch só nessa etapa); depois basta ``onnxruntime`` +
+    ``tokenizers``. Reproduz o ``encode`` do SentenceTransformer: mesmo tokenizador,
+    mesmo truncamento e mean pooling com máscara de atenção.
+    """
+
+    def __init__(self, model_name, export_dir=EMBEDDING_ONNX_DIR, threads=EMBEDDING_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+        
+        self.model_name = model_name
+        self.export_dir = os.path.join(export_dir, model_name)
+        model_path = os.path.join(self.export_dir, "model_quantized.onnx")
+        if not os.path.exists(model_path):
+            self._export()
+        
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.export_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_SEQ_LENGTH)
+        pad_token = "<pad>" if self.tokenizer.token_to_id("<pad>") is not None else "[PAD]"
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token), pad_token=pad_token)
+        self._dim = None
+        logger.info(f"✅ Embeddings via ONNX Runtime int8 ({threads or 'padrão'} threads)")
+
+    def _export(self):
+        """Exporta o modelo do Hugging Face para ONNX e aplica quantização int8 dinâmica"""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+        
+        hub_id = self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+        logger.info(f"⚙️ Exportando {hub_id} para ONNX int8 em {self.export_dir}...")
+        model = ORTModelForFeatureExtraction.from_pretrained(hub_id, export=True)
+        model.save_pretrained(self.export_dir)
+        AutoTokenizer.from_pretrained(hub_id).save_pretrained(self.export_dir)
+        quantizer = ORTQuantizer.from_pretrained(model)
+        quantizer.quantize(save_dir=self.export_dir, quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False))
+
+    def get_sentence_embedding_dimension(self):
+        if self._dim is None:
+            self._dim = self.encode(["dimensão"]).shape[1]
+        return self._dim
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, normalize_embeddings=False, **kwargs):
+        """Mesma interface do SentenceTransformer.encode (devolve ``np.ndarray`` float32)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self._dim or 0), dtype=np.float32)
+        
+        # Ordenar por tamanho reduz padding dentro de cada lote
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        result = [None] * len(texts)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in idx])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+            }
+            token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            for i, vector in zip(idx, pooled):
+                result[i] = vector
+        
+        embeddings = np.vstack(result).astype(np.float32)
+        if normalize_embeddings:
+            embeddings = normalize_rows(embeddings)
+        self._dim = embeddings.shape[1]
+        return embeddings[0] if single else embeddings
+
+# 🧠 MODELOS DE IA (carregados no primeiro uso, com fallback)
+NLP_MODELS = ("pt_core_news_lg", "pt_core_news_sm")  # Em ordem de preferência
+
+def _load_nlp():
+    """Carrega o melhor modelo spaCy disponível; baixa o leve se nenhum estiver instalado"""
+    import spacy
+    model_name = None
+    for candidate in NLP_MODELS:
+        try:
+            nlp_model = spacy.load(candidate)
+            model_name = candidate
+            break
+        except Exception as e:
+            logger.warning(f"⚠️ Modelo {candidate} não disponível: {e}")
+    if model_name is None:
+        model_name = NLP_MODELS[-1]
+        logger.warning(f"⚠️ Instalando {model_name}...")
+        subprocess.run([sys.executable, "-m", "spacy", "download", model_name, "--quiet"], check=True)
+        nlp_model = spacy.load(model_name)
+    # Só usamos entidades (NER): desligar tagger/parser/lematizador economiza CPU
+    nlp_model.select_pipes(enable=[pipe for pipe in ("tok2vec", "ner") if pipe in nlp_model.pipe_names])
+    logger.info(f"✅ Modelo NLP carregado com sucesso: {model_name} (componentes: {', '.join(nlp_model.pipe_names)})")
+    return nlp_model
+
+def load_embedding_backend(backend=None):
+    """Encoder cru (sem cache) do backend escolhido: ``torch`` ou ``onnx``"""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx":
+        return OnnxEmbeddingModel(EMBEDDING_MODEL_NAME, threads=EMBEDDING_THREADS)
+    if backend != "torch":
+        raise ValueError(f"EMBEDDING_BACKEND desconhecido: {backend}")
+    from sentence_transformers import SentenceTransformer
+    if EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def _load_embedding_model():
+    """Modelo de embeddings multilíngue (captura variações globais), com cache"""
+    # Vetores int8 diferem levemente dos float32: cada backend tem seu espaço de cache
+    cache_name = EMBEDDING_MODEL_NAME if EMBEDDING_BACKEND == "torch" else f"{EMBEDDING_MODEL_NAME}:{EMBEDDING_BACKEND}-int8"
+    return CachedEmbeddingModel(
+        load_embedding_backend(),
+        cache_name,
+        cache_dir=EMBEDDING_CACHE_DIR
+    )
+
+def _load_geolocator():
+    """Geocodificador para identificar cidades brasileiras"""
+    return Nominatim(user_agent="eleva_scraper", timeout=10, domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+
+nlp = RESOURCES.register("nlp", _load_nlp)
+EMBEDDING_MODEL = RESOURCES.register("embeddings", _load_embedding_model)
+geolocator = RESOURCES.register("geocoder", _load_geolocator)
+
+METRICS.gauge(
+    "eleva_embedding_cache_hit_ratio", "Fração de textos atendidos pelo cache de embeddings",
+    lambda: {(): EMBEDDING_MODEL.stats()["hit_rate"]} if EMBEDDING_MODEL.loaded else {}
+)
+METRICS.gauge(
+    "eleva_embedding_cache_entries", "Vetores no cache de embeddings por camada",
+    lambda: {(("tier", "memory"),): EMBEDDING_MODEL.stats()["memory_entries"], (("tier", "disk"),): EMBEDDING_MODEL.stats()["disk_entries"]} if EMBEDDING_MODEL.loaded else {}
+)
+
+def warm_up_models():
+    """Gancho de aquecimento: modelos e matrizes de protótipos prontos antes do primeiro pedido"""
+    RESOURCES.warm_up(["nlp", "embeddings"])
+    warm_up_prototypes()
 
 # ⚙️ Configurações do coletor (OTIMIZADO PARA PLANO PAGO)
 MAX_VAGAS_TOTAIS = 200  # Limite aumentado para plano pago
 DELAY_ENTRE_REQUISICOES = 2.5  # Reduzido para plano pago com proxy
 MAX_RETRIES = 5  # Aumentado para sites problemáticos
 RETRY_DELAY = 3  # Segundos entre tentativas
+CIRCUITO_FALHAS = int(os.getenv("CIRCUITO_FALHAS", "3"))  # Falhas seguidas que abrem o circuito do domínio
+CIRCUITO_BLOQUEIOS = int(os.getenv("CIRCUITO_BLOQUEIOS", "2"))  # Respostas 403/429 seguidas que abrem o circuito
+CIRCUITO_PAUSA_SEGUNDOS = float(os.getenv("CIRCUITO_PAUSA_SEGUNDOS", "600"))  # Tempo com o domínio suspenso
+MAX_FETCH_CONCURRENCY = int(os.getenv("MAX_FETCH_CONCURRENCY", "8"))  # Downloads simultâneos (global)
+MIN_INTERVALO_POR_DOMINIO = float(os.getenv("MIN_INTERVALO_POR_DOMINIO", str(DELAY_ENTRE_REQUISICOES)))  # Segundos entre requisições ao mesmo host
+MAX_RETRY_AFTER = 120  # Teto (segundos) para respeitar Retry-After em 429/503
+SERPAPI_CONCURRENCY = int(os.getenv("SERPAPI_CONCURRENCY", "4"))  # Fontes buscadas em paralelo
+SERPAPI_MAX_PAGINAS_POR_FONTE = int(os.getenv("SERPAPI_MAX_PAGINAS_POR_FONTE", "3"))  # Páginas de 20 resultados
+SERPAPI_MAX_REQUISICOES = int(os.getenv("SERPAPI_MAX_REQUISICOES", "45"))  # Orçamento global de cota por execução
+SERPAPI_CACHE_DIR = os.getenv("SERPAPI_CACHE_DIR", ".cache/serpapi")  # Vazio = sem cache em disco
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search.json")  # Sobrescrito no benchmark offline
+GAZETTEER_PATH = os.getenv("GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "municipios_br.csv"))
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", ".cache/geocode.sqlite")
+GEOCODE_NEGATIVE_TTL_DIAS = 30  # Respostas "não encontrado" expiram após N dias
+NOMINATIM_MAX_CHAMADAS_POR_TEXTO = 3  # Teto de chamadas de rede por descrição
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "32"))  # Descrições por lote no nlp.pipe
+NLP_N_PROCESS = int(os.getenv("NLP_N_PROCESS", "1"))  # Processos do nlp.pipe (>1 em hosts multi-core)
+EMBEDDING_FORMAT = os.getenv("EMBEDDING_FORMAT", "json")  # json | pgvector | float16 | int8 (formato das colunas de embedding)
+EMBEDDING_SHARD_DIR = os.getenv("EMBEDDING_SHARD_DIR")  # Shards .npy memory-mapped com os vetores gravados (vazio = desativado)
+EMBEDDING_SHARD_ROWS = int(os.getenv("EMBEDDING_SHARD_ROWS", "100000"))  # Linhas por shard
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", ".cache/vector_index")  # Índice local para /match (vazio = desativado)
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "exact")  # exact (matmul) | ivf (aproximado)
+VECTOR_INDEX_LISTS = int(os.getenv("VECTOR_INDEX_LISTS", "0"))  # Listas IVF (0 = √n)
+VECTOR_INDEX_PROBE = int(os.getenv("VECTOR_INDEX_PROBE", "8"))  # Listas IVF visitadas por consulta
+VECTOR_INDEX_SAVE_SECONDS = float(os.getenv("VECTOR_INDEX_SAVE_SECONDS", "30"))  # Intervalo mínimo entre gravações em disco
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "50"))  # Linhas por upsert
+POSTGREST_URL = os.getenv("POSTGREST_URL")  # Ex.: http://localhost:3000 (PostgREST local para testes)
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", ".cache/crawl_state.sqlite")
+CRAWL_REVISITAR_APOS_DIAS = int(os.getenv("CRAWL_REVISITAR_APOS_DIAS", "7"))  # URLs mais novas que isso nem são baixadas
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", ".cache/dedup.sqlite")  # Índice de quase-duplicatas (vazio = desativado)
+DEDUP_LIMIAR = float(os.getenv("DEDUP_LIMIAR", "0.6"))  # Jaccard estimado (MinHash) para considerar duplicata
+DEDUP_CONFIRMAR_EMBEDDING = os.getenv("DEDUP_CONFIRMAR_EMBEDDING", "1") == "1"  # Confirmar casos limítrofes por cosseno
+DEDUP_TTL_DIAS = int(os.getenv("DEDUP_TTL_DIAS", "30"))  # Vagas mais antigas que isso não contam como original
+# Gravar todas as URLs da vaga em vagas_lovable.source_urls; exige antes
+# "ALTER TABLE vagas_lovable ADD COLUMN IF NOT EXISTS source_urls text[]"
+SALVAR_SOURCE_URLS = os.getenv("SALVAR_SOURCE_URLS", "0") == "1"
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", ".cache/archive")  # Respostas brutas comprimidas (vazio = desativado)
+ARCHIVE_RETENCAO_DIAS = int(os.getenv("ARCHIVE_RETENCAO_DIAS", "14"))  # Coletas mais antigas saem do arquivo (0 = manter tudo)
+REPLAY_DATE = os.getenv("REPLAY_DATE")  # "latest" ou AAAA-MM-DD: roda a coleta só a partir do arquivo
+HTML_PARSER_BACKEND = os.getenv("HTML_PARSER_BACKEND", "auto")  # auto | selectolax | lxml | bs4
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))  # Itens em espera entre estágios (backpressure)
+PIPELINE_PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", "2"))  # Threads de parse de HTML
+PIPELINE_FLUSH_SECONDS = float(os.getenv("PIPELINE_FLUSH_SECONDS", "3"))  # Tempo máximo de uma vaga no buffer de gravação
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "1"))  # Processos de enriquecimento (1 = na própria thread do pipeline)
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "16"))  # Vagas por lote enviado a um processo
+TORCH_THREADS_POR_WORKER = int(os.getenv("TORCH_THREADS_POR_WORKER", "0"))  # 0 = núcleos / processos
+SCRAPE_JOBS_MAX_PARALLEL = int(os.getenv("SCRAPE_JOBS_MAX_PARALLEL", "1"))  # Coletas simultâneas via API (1 = em série)
+SCRAPE_JOBS_MAX_PENDING = int(os.getenv("SCRAPE_JOBS_MAX_PENDING", "10"))  # Coletas na fila antes de responder 429
+SCRAPE_JOBS_HISTORY = int(os.getenv("SCRAPE_JOBS_HISTORY", "50"))  # Execuções finalizadas mantidas para consulta
+SCRAPE_ON_STARTUP = os.getenv("SCRAPE_ON_STARTUP", "1") == "1"  # Enfileirar uma coleta padrão ao subir o servidor
 
 # 🌐 Fontes de vagas com detecção automática de relevância
 SOURCES_BRASIL = [
@@ -126,6 +846,380 @@ SOURCES_BRASIL = [
     "site:pageexecutive.com brazil OR brasil"
 ]
 
+# 🧭 Protótipos semânticos de referência (exemplos por rótulo)
+SENIORITY_LEVELS = {
+    "estagio": ["estágio", "estagiário", "trainee", "aprendiz", "jovem aprendiz"],
+    "junior": ["júnior", "jr", "junior", "assistente", "auxiliar"],
+    "pleno": ["pleno", "analista", "consultor", "especialista"],
+    "senior": ["sênior", "sr", "senior", "analista sênior", "especialista sênior"],
+    "gerente": ["gerente", "manager", "supervisor", "coordenador", "líder"],
+    "diretor": ["diretor", "director", "head of", "vp", "vice-presidente"],
+    "c_level": ["ceo", "cto", "cfo", "coo", "chief", "presidente", "sócio"]
+}
+
+AREAS = {
+    "tecnologia": ["desenvolvedor", "software", "python", "dados", "ti", "tecnologia"],
+    "vendas": ["vendedor", "vendas", "comercial", "account", "hunter", "sales"],
+    "marketing": ["marketing", "comunicação", "mídia", "digital", "brand", "growth"],
+    "financeiro": ["financeiro", "contábil", "controladoria", "tesouraria", "investimentos"],
+    "recursos_humanos": ["rh", "recursos humanos", "talentos", "people", "gente"],
+    "produto": ["produto", "product", "ux", "design", "product manager"],
+    "juridico": ["jurídico", "advogado", "direito", "legal", "compliance"],
+    "operacoes": ["operações", "logística", "produção", "qualidade", "processos"]
+}
+
+SKILL_CATEGORIES = {
+    "hard_skills": ["python", "sql", "machine learning", "data analysis", "aws"],
+    "soft_skills": ["liderança", "comunicação", "negociação", "resolução de problemas"],
+    "tools": ["powerpoint", "excel", "salesforce", "sap", "tableau"],
+    "business": ["gestão financeira", "estratégia", "m&a", "planejamento"]
+}
+
+def normalize_rows(matrix):
+    """Normaliza vetores (linhas) para norma L2 unitária, tolerando vetores nulos"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class PrototypeClassifier:
+    """Classificador por protótipos: cada rótulo vira um vetor médio pré-computado.
+
+    Os exemplos de cada rótulo são codificados uma única vez (no primeiro uso ou
+    via ``warm_up``) e guardados numa matriz L2-normalizada ``(n_rótulos, dim)``.
+    Classificar um texto custa um ``encode`` e um produto matriz-vetor; um lote de
+    textos custa um ``encode`` em lote e um produto matriz-matriz.
+    """
+
+    def __init__(self, name, examples_by_label, threshold, default):
+        self.name = name
+        self.labels = list(examples_by_label.keys())
+        self.examples_by_label = examples_by_label
+        self.threshold = threshold
+        self.default = default
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self.warm_up()
+        return self._matrix
+
+    def build_matrix(self, model):
+        """Matriz de protótipos calculada com um encoder qualquer (ex.: outro backend)"""
+        all_examples = [ex for label in self.labels for ex in self.examples_by_label[label]]
+        embeddings = np.asarray(model.encode(all_examples), dtype=np.float32)
+
+        prototypes = []
+        start = 0
+        for label in self.labels:
+            end = start + len(self.examples_by_label[label])
+            prototypes.append(embeddings[start:end].mean(axis=0))
+            start = end
+        return normalize_rows(np.vstack(prototypes))
+
+    def warm_up(self):
+        """Codifica todos os exemplos num único lote e monta a matriz de protótipos"""
+        self._matrix = self.build_matrix(EMBEDDING_MODEL)
+        logger.info(f"✅ Protótipos '{self.name}' pré-computados ({len(self.labels)} rótulos)")
+        return self._matrix
+
+    def scores(self, embeddings):
+        """Similaridade de cosseno entre embeddings ``(n, dim)`` e cada protótipo"""
+        return normalize_rows(embeddings) @ self.matrix.T
+
+    def pick(self, row):
+        """Rótulo de maior similaridade, ou o padrão se ficar abaixo do limiar"""
+        best = int(np.argmax(row))
+        return self.labels[best] if row[best] > self.threshold else self.default
+
+# Registro de protótipos (calculados sob demanda, uma vez por processo)
+SENIORITY_PROTOTYPES = PrototypeClassifier("senioridade", SENIORITY_LEVELS, threshold=0.3, default="pleno")
+AREA_PROTOTYPES = PrototypeClassifier("área", AREAS, threshold=0.35, default="operacoes")
+SKILL_CATEGORY_PROTOTYPES = PrototypeClassifier("categoria de skill", SKILL_CATEGORIES, threshold=0.4, default="hard_skills")
+
+def warm_up_prototypes():
+    """Pré-computa todas as matrizes de protótipos (útil no startup)"""
+    for classifier in (SENIORITY_PROTOTYPES, AREA_PROTOTYPES, SKILL_CATEGORY_PROTOTYPES):
+        classifier.warm_up()
+
+EMBEDDING_FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embedding_fixtures.json")
+
+def check_embedding_backend(candidate="onnx", reference="torch", fixtures_path=EMBEDDING_FIXTURES_PATH, min_cosine=0.98):
+    """Compara dois backends de embeddings num conjunto fixo de vagas.
+
+    Mede a concordância de cosseno entre os vetores de cada vaga e confere se os
+    rótulos de senioridade e área são idênticos. Devolve um relatório com ``ok``.
+    """
+    with open(fixtures_path, "r", encoding="utf-8") as f:
+        fixtures = json.load(f)
+    contexts = [f"{item['title']} {item['text']}".lower()[:300] for item in fixtures]
+    
+    labels = {}
+    vectors = {}
+    for backend in (reference, candidate):
+        model = load_embedding_backend(backend)
+        vectors[backend] = normalize_rows(model.encode(contexts))
+        labels[backend] = [
+            [classifier.pick(row) for row in vectors[backend] @ classifier.build_matrix(model).T]
+            for classifier in (SENIORITY_PROTOTYPES, AREA_PROTOTYPES)
+        ]
+    
+    cosines = np.sum(vectors[reference] * vectors[candidate], axis=1)
+    mismatches = [
+        {"title": item["title"], reference: [labels[reference][0][i], labels[reference][1][i]], candidate: [labels[candidate][0][i], labels[candidate][1][i]]}
+        for i, item in enumerate(fixtures)
+        if labels[reference][0][i] != labels[candidate][0][i] or labels[reference][1][i] != labels[candidate][1][i]
+    ]
+    report = {
+        "fixtures": len(fixtures),
+        "cosine_mean": round(float(cosines.mean()), 4),
+        "cosine_min": round(float(cosines.min()), 4),
+        "label_mismatches": mismatches,
+        "ok": bool(cosines.min() >= min_cosine and not mismatches)
+    }
+    logger.info(f"🔬 {candidate} vs {reference}: cosseno médio {report['cosine_mean']}, mínimo {report['cosine_min']}, {len(mismatches)} rótulos divergentes")
+    return report
+
+# 🧩 Referências para validação e extração de skills
+SKILL_REFERENCE_TERMS = [
+    "python", "javascript", "sql", "cloud", "ia", "machine learning",  # Tecnologia
+    "gestão", "liderança", "estratégia", "finanças", "marketing"         # Negócios
+]
+
+SKILL_PATTERNS = [
+    re.compile(r'(?i)\b(experi[êe]ncia\s+em\s+)([\w\s]+?)(?=\.|\,|$)'),
+    re.compile(r'(?i)\b(dom[ií]nio\s+em\s+)([\w\s]+?)(?=\.|\,|$)'),
+    re.compile(r'(?i)\b(conhecimento\s+em\s+)([\w\s]+?)(?=\.|\,|$)'),
+    re.compile(r'(?i)\b(habilidade\s+em\s+)([\w\s]+?)(?=\.|\,|$)')
+]
+
+# 🗺️ GEOCODIFICAÇÃO OFFLINE (gazetteer brasileiro + cache SQLite + Nominatim)
+UF_NOMES = {
+    "AC": "Acre", "AL": "Alagoas", "AP": "Amapá", "AM": "Amazonas", "BA": "Bahia",
+    "CE": "Ceará", "DF": "Distrito Federal", "ES": "Espírito Santo", "GO": "Goiás",
+    "MA": "Maranhão", "MT": "Mato Grosso", "MS": "Mato Grosso do Sul", "MG": "Minas Gerais",
+    "PA": "Pará", "PB": "Paraíba", "PR": "Paraná", "PE": "Pernambuco", "PI": "Piauí",
+    "RJ": "Rio de Janeiro", "RN": "Rio Grande do Norte", "RS": "Rio Grande do Sul",
+    "RO": "Rondônia", "RR": "Roraima", "SC": "Santa Catarina", "SP": "São Paulo",
+    "SE": "Sergipe", "TO": "Tocantins"
+}
+
+# Nomes de lugares que também são palavras comuns/sobrenomes: exigem confirmação
+LUGARES_AMBIGUOS = {
+    "natal", "serra", "salto", "alvorada", "paulista", "santos", "colombo", "toledo",
+    "franca", "santana", "patos", "vitoria", "americana", "palmas", "caxias", "juazeiro",
+    "crato", "itu", "sao jose", "santa maria", "rio grande", "trindade", "lages",
+    "para"  # Estado do Pará x preposição "para"
+}
+
+GeoLocation = namedtuple("GeoLocation", ["name", "state", "uf", "latitude", "longitude", "address", "source"])
+
+def fold_text(text):
+    """Minúsculas e sem acentos, para comparar nomes de lugares"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+def _tokens(text):
+    return re.findall(r"\w+", fold_text(text))
+
+class BrazilGazetteer:
+    """Gazetteer offline de municípios e estados brasileiros.
+
+    Os nomes viram uma trie de tokens (autômato multi-padrão): ``scan`` percorre o
+    texto uma única vez e encontra todas as menções, sempre em fronteira de palavra
+    e preferindo o nome mais longo ("São José dos Campos" antes de "São José").
+    """
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self._trie = {}
+        self._by_name = {}
+        self._max_len = 1
+        self.capital_by_uf = {}
+        self._load(path)
+
+    def _add(self, name, location, kind, confident):
+        tokens = _tokens(name)
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node["\0"] = (location, kind, confident)
+        self._by_name.setdefault(" ".join(tokens), (location, kind, confident))
+        self._max_len = max(self._max_len, len(tokens))
+
+    def _load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        except OSError as e:
+            logger.warning(f"⚠️ Gazetteer de municípios indisponível ({path}): {e}")
+            rows = []
+        
+        for row in rows:
+            uf = row["uf"].strip().upper()
+            name = row["nome"].strip()
+            location = GeoLocation(name, UF_NOMES.get(uf, uf), uf, None, None, f"{name}, {UF_NOMES.get(uf, uf)}, Brasil", "gazetteer")
+            folded = " ".join(_tokens(name))
+            is_capital = row.get("capital", "0").strip() == "1"
+            # Capitais e nomes compostos são inequívocos; nomes simples precisam de contexto
+            confident = folded not in LUGARES_AMBIGUOS and (is_capital or len(folded.split()) > 1)
+            self._add(name, location, "city", confident)
+            if is_capital:
+                self.capital_by_uf[uf] = location
+        
+        for uf, state in UF_NOMES.items():
+            capital = self.capital_by_uf.get(uf)
+            location = GeoLocation(state, state, uf, None, None, f"{state}, Brasil", "gazetteer")
+            if capital is None or fold_text(capital.name) != fold_text(state):
+                self._add(state, location, "state", " ".join(_tokens(state)) not in LUGARES_AMBIGUOS)
+        
+        logger.info(f"✅ Gazetteer offline carregado: {len(rows)} municípios, {len(UF_NOMES)} estados")
+
+    def lookup(self, name):
+        """Busca exata (sem acentos) de um nome de cidade ou estado"""
+        entry = self._by_name.get(" ".join(_tokens(name)))
+        return entry[0] if entry else None
+
+    def scan(self, text):
+        """Todas as menções (posição, localização, tipo, confiante, confirmada) numa passada"""
+        tokens = _tokens(text)
+        matches = []
+        i = 0
+        while i < len(tokens):
+            node = self._trie
+            best = None
+            for j in range(i, min(i + self._max_len, len(tokens))):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                if "\0" in node:
+                    best = (j + 1, node["\0"])
+            if best is None:
+                i += 1
+                continue
+            end, (location, kind, confident) = best
+            # Confirmação por contexto: UF ou nome do estado logo depois ("Campinas - SP")
+            following = " ".join(tokens[end:end + 4])
+            confirmed = location.uf.lower() in tokens[end:end + 2] or (kind == "city" and fold_text(location.state) in following)
+            matches.append((i, location, kind, confident, confirmed))
+            i = end
+        return matches
+
+    def default(self):
+        return self.capital_by_uf.get("SP") or GeoLocation("São Paulo", "São Paulo", "SP", None, None, "São Paulo, São Paulo, Brasil", "gazetteer")
+
+class GeocodeCache:
+    """Cache persistente (SQLite) de geocodificações, incluindo respostas negativas"""
+
+    def __init__(self, path=GEOCODE_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " query TEXT PRIMARY KEY, found INTEGER, name TEXT, state TEXT, uf TEXT,"
+                " latitude REAL, longitude REAL, address TEXT, updated_at TEXT)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Cache de geocodificação indisponível ({path}): {e}")
+            self._conn = None
+
+    def get(self, query):
+        """Retorna (encontrado_no_cache, GeoLocation ou None)"""
+        if self._conn is None:
+            return False, None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT found, name, state, uf, latitude, longitude, address, updated_at FROM geocode WHERE query = ?",
+                (query,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        found, name, state, uf, lat, lon, address, updated_at = row
+        if not found:
+            # Negativas expiram para permitir nova tentativa no futuro
+            if datetime.utcnow() - datetime.fromisoformat(updated_at) > timedelta(days=GEOCODE_NEGATIVE_TTL_DIAS):
+                return False, None
+            return True, None
+        return True, GeoLocation(name, state, uf, lat, lon, address, "cache")
+
+    def put(self, query, location):
+        if self._conn is None:
+            return
+        values = (query, 1, *location[:6], datetime.utcnow().isoformat()) if location else (query, 0, None, None, None, None, None, None, datetime.utcnow().isoformat())
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+            self._conn.commit()
+
+class BrazilGeocoder:
+    """Resolve nomes de lugares: gazetteer → cache SQLite → Nominatim (1 req/s)"""
+
+    def __init__(self, gazetteer, cache):
+        self.gazetteer = gazetteer
+        self.cache = cache
+        self._nominatim = None
+        self.min_delay = 1  # Em N processos, N segundos cada: 1 req/s no total
+        self.gazetteer_hits = 0
+        self.cache_hits = 0
+        self.network_calls = 0
+
+    def _nominatim_geocode(self, query):
+        # Política de uso do Nominatim: no máximo 1 requisição por segundo
+        if self._nominatim is None:
+            self._nominatim = RateLimiter(geolocator.geocode, min_delay_seconds=self.min_delay, max_retries=1, swallow_exceptions=False)
+        self.network_calls += 1
+        with METRICS.timer("eleva_nominatim_seconds"):
+            return self._nominatim(query, exactly_one=True, addressdetails=True, country_codes="br")
+
+    def geocode(self, name, allow_network=True):
+        """GeoLocation brasileira para ``name`` ou None"""
+        location = self.gazetteer.lookup(name)
+        if location:
+            self.gazetteer_hits += 1
+            METRICS.inc("eleva_geocode_total", source="gazetteer")
+            return location
+        
+        key = fold_text(name.strip())
+        hit, location = self.cache.get(key)
+        if hit:
+            self.cache_hits += 1
+            METRICS.inc("eleva_geocode_total", source="cache")
+            return location
+        if not allow_network:
+            METRICS.inc("eleva_geocode_total", source="miss")
+            return None
+        
+        try:
+            result = self._nominatim_geocode(f"{name}, Brazil")
+        except Exception as e:
+            logger.debug(f"Erro ao geocodificar {name}: {e}")
+            METRICS.inc("eleva_geocode_total", source="erro")
+            return None
+        
+        location = None
+        address = (result.raw.get("address", {}) if result else {})
+        if result and address.get("country_code") == "br":
+            uf = address.get("ISO3166-2-lvl4", "").replace("BR-", "")
+            state = address.get("state", UF_NOMES.get(uf, ""))
+            if uf not in UF_NOMES:
+                uf = next((k for k, v in UF_NOMES.items() if fold_text(v) == fold_text(state)), "")
+            location = GeoLocation(name.strip(), state, uf, result.latitude, result.longitude, result.address, "nominatim")
+        METRICS.inc("eleva_geocode_total", source="nominatim" if location else "miss")
+        self.cache.put(key, location)
+        return location
+
+    def stats(self):
+        return {"gazetteer_hits": self.gazetteer_hits, "cache_hits": self.cache_hits, "network_calls": self.network_calls}
+
+# Gazetteer e cache SQLite só são abertos no primeiro uso (importar o módulo não cria arquivos)
+GAZETTEER = RESOURCES.register("gazetteer", BrazilGazetteer)
+GEOCODER = RESOURCES.register("geocode", lambda: BrazilGeocoder(GAZETTEER.get(), GeocodeCache()))
+
 # 🤖 ONTOLOGIA DINÂMICA (auto-aprendizagem)
 class DynamicOntology:
     """Sistema que aprende novas habilidades e conceitos automaticamente"""
@@ -134,63 +1228,67 @@ class DynamicOntology:
         self.skill_clusters = {}  # Grupo skills semanticamente similares
         self.city_cache = {}      # Cache de cidades já identificadas
         self.role_mappings = {}   # Mapeamento inteligente de cargos
+        self._reference_embeddings = None  # Matriz de termos de referência (lazy)
     
-    def extract_skills_intelligently(self, text):
+    def extract_skills_intelligently(self, text, doc=None, features=None):
         """Extrai skills usando NLP + embeddings (sem listas manuais)"""
-        doc = nlp(text.lower())
-        skills = []
+        if doc is None:
+            with METRICS.timer("eleva_spacy_seconds"):
+                doc = nlp(text)
         
         # 1. Detectar entidades como habilidades
-        for ent in doc.ents:
-            if ent.label_ in ["ORG", "PRODUCT", "WORK_OF_ART"]:
-                # Verificar se é uma skill válida usando similaridade semântica
-                if self._is_valid_skill(ent.text):
-                    skills.append({
-                        "name": ent.text.title(),
-                        "normalized": self._normalize_skill(ent.text),
-                        "category": self._classify_skill_category(ent.text),
-                        "proficiency_level": self._detect_proficiency(ent.text, text),
-                        "importance_weight": self._calculate_importance(ent.text, text)
-                    })
-        
-        # 2. Detectar padrões de habilidades usando regras inteligentes
-        skill_patterns = [
-            r'(?i)\b(experi[êe]ncia\s+em\s+)([\w\s]+?)(?=\.|\,|$)',
-            r'(?i)\b(dom[ií]nio\s+em\s+)([\w\s]+?)(?=\.|\,|$)',
-            r'(?i)\b(conhecimento\s+em\s+)([\w\s]+?)(?=\.|\,|$)',
-            r'(?i)\b(habilidade\s+em\s+)([\w\s]+?)(?=\.|\,|$)'
+        candidates = [
+            (ent.text.lower(), None) for ent in doc.ents
+            if ent.label_ in ["ORG", "PRODUCT", "WORK_OF_ART"]
         ]
         
-        for pattern in skill_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
+        # 2. Detectar padrões de habilidades usando regras inteligentes
+        for pattern in SKILL_PATTERNS:
+            for match in pattern.findall(text):
                 skill_name = match[1].strip()
-                if skill_name and self._is_valid_skill(skill_name):
-                    skills.append({
-                        "name": skill_name.title(),
-                        "normalized": self._normalize_skill(skill_name),
-                        "category": self._classify_skill_category(skill_name),
-                        "proficiency_level": self._detect_proficiency(skill_name, text),
-                        "importance_weight": 85
-                    })
+                if skill_name:
+                    candidates.append((skill_name, 85))
         
-        return self._remove_duplicates(skills)
-    
-    def _is_valid_skill(self, skill_text):
-        """Verifica se é uma skill real usando embeddings"""
-        # Skills muito curtas ou genéricas são descartadas
-        if len(skill_text) < 3 or skill_text in ["e", "de", "com", "para", "em"]:
-            return False
+        # 3. Validar todas as candidatas com um único encode em lote
+        candidates = [(name, weight) for name, weight in candidates if self._passes_basic_filter(name)]
+        if not candidates:
+            return []
+        embeddings = EMBEDDING_MODEL.encode([name for name, _ in candidates])
+        valid = self._valid_skill_mask(embeddings)
+        categories = [SKILL_CATEGORY_PROTOTYPES.pick(row) for row in SKILL_CATEGORY_PROTOTYPES.scores(embeddings)]
         
-        # Verificar similaridade com termos conhecidos
-        tech_terms = ["python", "javascript", "sql", "cloud", "ia", "machine learning"]
-        business_terms = ["gestão", "liderança", "estratégia", "finanças", "marketing"]
+        # Proficiência e importância dependem só do contexto: uma varredura por texto
+        features = features or TEXT_FEATURES.scan(text)
+        proficiency = features["proficiency"]
+        importance = features["importance"]
         
-        # Usar embeddings para similaridade semântica
-        if any(self._semantic_similarity(skill_text, term) > 0.6 for term in tech_terms + business_terms):
-            return True
+        skills = []
+        for i, (name, weight) in enumerate(candidates):
+            if not valid[i]:
+                continue
+            skills.append({
+                "name": name.title(),
+                "normalized": self._normalize_skill(name),
+                "category": categories[i],
+                "proficiency_level": proficiency,
+                "importance_weight": weight if weight is not None else importance
+            })
         
-        return False
+        return self._remove_duplicates(skills)
+    
+    def _passes_basic_filter(self, skill_text):
+        """Skills muito curtas ou genéricas são descartadas"""
+        return len(skill_text) >= 3 and skill_text not in ["e", "de", "com", "para", "em"]
+    
+    def _valid_skill_mask(self, embeddings):
+        """Similaridade (em lote) das candidatas com a matriz de termos de referência"""
+        return (normalize_rows(embeddings) @ self._reference_matrix().T).max(axis=1) > 0.6
+    
+    def _reference_matrix(self):
+        # Termos conhecidos (tecnologia + negócios) codificados uma única vez
+        if self._reference_embeddings is None:
+            self._reference_embeddings = normalize_rows(EMBEDDING_MODEL.encode(SKILL_REFERENCE_TERMS))
+        return self._reference_embeddings
     
     def _normalize_skill(self, skill_text):
         """Normaliza skills usando similaridade semântica"""
@@ -208,127 +1306,63 @@ class DynamicOntology:
         
         return skill_text.lower().replace(" ", "_")
     
-    def _classify_skill_category(self, skill_text):
-        """Classifica automaticamente usando embeddings"""
-        # Embeddings de categorias de referência
-        categories = {
-            "hard_skills": ["python", "sql", "machine learning", "data analysis", "aws"],
-            "soft_skills": ["liderança", "comunicação", "negociação", "resolução de problemas"],
-            "tools": ["powerpoint", "excel", "salesforce", "sap", "tableau"],
-            "business": ["gestão financeira", "estratégia", "m&a", "planejamento"]
-        }
-        
-        skill_embedding = EMBEDDING_MODEL.encode([skill_text])[0]
-        best_category = "hard_skills"
-        best_score = 0
-        
-        for category, examples in categories.items():
-            category_embedding = EMBEDDING_MODEL.encode(examples).mean(axis=0)
-            similarity = np.dot(skill_embedding, category_embedding) / (np.linalg.norm(skill_embedding) * np.linalg.norm(category_embedding))
-            
-            if similarity > best_score:
-                best_score = similarity
-                best_category = category
-        
-        return best_category if best_score > 0.4 else "hard_skills"
-    
-    def _detect_proficiency(self, skill_text, context):
-        """Detecta nível de proficiência usando contexto"""
-        context_lower = context.lower()
-        
-        # Níveis com base em palavras-chave
-        if any(kw in context_lower for kw in ["especialista", "expert", "avançado", "sênior"]):
-            return 5
-        elif any(kw in context_lower for kw in ["experiente", "domínio", "proficiente", "avançado"]):
-            return 4
-        elif any(kw in context_lower for kw in ["competente", "intermediário", "bom conhecimento"]):
-            return 3
-        elif any(kw in context_lower for kw in ["básico", "iniciante", "conhecimentos"]):
-            return 2
-        return 3  # Default intermediário
-    
-    def _calculate_importance(self, skill_text, context):
-        """Calcula importância usando análise de contexto"""
-        context_lower = context.lower()
-        
-        # Palavras que indicam importância
-        critical_words = ["essencial", "obrigatório", "crítico", "fundamental", "requisito", "indispensável"]
-        important_words = ["importante", "desejável", "preferencial", "diferencial", "valioso"]
-        
-        if any(kw in context_lower for kw in critical_words):
-            return 95
-        elif any(kw in context_lower for kw in important_words):
-            return 80
-        return 70
-    
-    def _semantic_similarity(self, text1, text2):
-        """Calcula similaridade semântica entre textos"""
-        embeddings = EMBEDDING_MODEL.encode([text1, text2])
-        return np.dot(embeddings[0], embeddings[1]) / (np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1]))
-    
     def _remove_duplicates(self, skills):
         """Remove skills duplicadas usando similaridade semântica"""
-        unique_skills = []
-        seen = []
-        
-        for skill in skills:
-            is_duplicate = False
-            for seen_skill in seen:
-                if self._semantic_similarity(skill["normalized"], seen_skill) > 0.85:
-                    is_duplicate = True
-                    break
-            
-            if not is_duplicate:
-                unique_skills.append(skill)
-                seen.append(skill["normalized"])
+        if not skills:
+            return []
         
-        return unique_skills
+        # Matriz de cosseno entre todas as skills normalizadas (um encode, um produto)
+        embeddings = normalize_rows(EMBEDDING_MODEL.encode([skill["normalized"] for skill in skills]))
+        similarity = embeddings @ embeddings.T
+        
+        # Uma skill é duplicada se for parecida com alguma skill mantida antes dela
+        kept = []
+        for i in range(len(skills)):
+            if not kept or similarity[i, kept].max() <= 0.85:
+                kept.append(i)
+        
+        return [skills[i] for i in kept]
     
-    def extract_cities_from_text(self, text):
+    def extract_cities_from_text(self, text, doc=None):
         """Extrai cidades usando geocodificação inteligente"""
-        # Primeiro, verificar cache para performance
-        for city, location in self.city_cache.items():
-            if city in text.lower():
-                return city, location
-        
-        # Extrair entidades geográficas usando NLP
-        doc = nlp(text)
-        cities = []
-        
-        for ent in doc.ents:
-            if ent.label_ in ["GPE", "LOC"]:  # Geopolitical entity ou Location
-                city_name = ent.text.strip()
-                
-                # Verificar se é uma cidade brasileira
-                try:
-                    location = geolocator.geocode(f"{city_name}, Brazil", exactly_one=True)
-                    if location and "Brazil" in location.address:
-                        cities.append((city_name, location))
-                        # Armazenar no cache
-                        self.city_cache[city_name.lower()] = location
-                except Exception as e:
-                    logger.debug(f"Erro ao geocodificar {city_name}: {e}")
-                    continue
+        # 1. Gazetteer offline: uma passada pelo texto, sem rede
+        matches = GAZETTEER.scan(text)
+        for _, location, kind, confident, confirmed in matches:
+            if kind == "city" and (confident or confirmed):
+                return location.name, location
         
-        # Retornar a cidade mais provável (primeira encontrada)
-        if cities:
-            return cities[0]
+        # 2. Extrair entidades geográficas usando NLP (reaproveita o Doc compartilhado)
+        if doc is None:
+            with METRICS.timer("eleva_spacy_seconds"):
+                doc = nlp(text)
+        entities = [ent.text.strip() for ent in doc.ents if ent.label_ in ["GPE", "LOC"]]  # Geopolitical entity ou Location
         
-        # Fallback para cidades brasileiras conhecidas
-        brazilian_cities = [
-            "são paulo", "rio de janeiro", "brasília", "belo horizonte", "porto alegre",
-            "curitiba", "salvador", "recife", "fortaleza", "goiânia", "manaus", "belém"
-        ]
+        # Menções ambíguas do gazetteer confirmadas pelo NER ("Natal" como GPE)
+        entity_keys = {fold_text(entity) for entity in entities}
+        for _, location, kind, _, _ in matches:
+            if kind == "city" and fold_text(location.name) in entity_keys:
+                return location.name, location
         
-        for city in brazilian_cities:
-            if city in text.lower():
-                try:
-                    location = geolocator.geocode(f"{city}, Brazil")
-                    return city, location
-                except:
-                    continue
+        # 3. Entidades fora do gazetteer: memória → SQLite → Nominatim (com teto de chamadas)
+        network_budget = NOMINATIM_MAX_CHAMADAS_POR_TEXTO
+        for city_name in entities:
+            key = fold_text(city_name)
+            if key in self.city_cache:
+                location = self.city_cache[key]
+            else:
+                calls_before = GEOCODER.network_calls
+                location = GEOCODER.geocode(city_name, allow_network=network_budget > 0)
+                network_budget -= GEOCODER.network_calls - calls_before
+                self.city_cache[key] = location
+            if location:
+                return city_name, location
         
-        return "São Paulo", geolocator.geocode("São Paulo, Brazil")  # Default seguro
+        # 4. Estado mencionado sem cidade
+        for _, location, kind, confident, confirmed in matches:
+            if kind == "state" and (confident or confirmed):
+                return location.name, location
+        
+        return "São Paulo", GAZETTEER.default()  # Default seguro (sem rede)
 
 # Instância da ontologia dinâmica
 ONTOLOGY = DynamicOntology()
@@ -342,7 +1376,14 @@ def get_proxy_session():
     session.verify = ssl_context
     
     # Configuração para evitar SSL errors (crítico para sites como LinkedIn)
-    session.mount('https://', requests.adapters.HTTPAdapter(max_retries=MAX_RETRIES))
+    # Pool dimensionado para os downloads concorrentes
+    # Sem retries no adaptador: quem repete é o laço de download, que respeita o
+    # intervalo por domínio e o circuit breaker (senão as tentativas se multiplicam)
+    session.mount('https://', requests.adapters.HTTPAdapter(
+        max_retries=0,
+        pool_connections=MAX_FETCH_CONCURRENCY,
+        pool_maxsize=MAX_FETCH_CONCURRENCY
+    ))
     
     if SCRAPERAPI_KEY:
         # Estratégia SeekOut: rotação inteligente de proxies
@@ -368,342 +1409,2483 @@ def get_proxy_session():
     
     return session
 
-def is_vaga_brasil(text):
-    """Detecção inteligente de vagas brasileiras usando NLP"""
-    text_lower = text.lower()
-    
-    # 1. Palavras-chave positivas
-    palavras_brasil = ["brasil", "brazil", "são paulo", "rio de janeiro", "brasília", "sp", "rj", "df"]
-    positivo = sum(1 for palavra in palavras_brasil if palavra in text_lower)
-    
-    # 2. Palavras-chave negativas (internacionais)
-    palavras_internacionais = ["united states", "new york", "london", "germany", "france", "canada", "australia", "usa", "uk", "europe"]
-    negativo = sum(1 for palavra in palavras_internacionais if palavra in text_lower)
-    
-    # 3. Análise semântica usando embeddings
-    brasil_embedding = EMBEDDING_MODEL.encode(["brasil"])[0]
-    text_embedding = EMBEDDING_MODEL.encode([text_lower[:200]])[0]  # Primeiros 200 caracteres
+# 🌍 Palavras-chave geográficas usadas no filtro de vagas brasileiras
+PALAVRAS_BRASIL = ["brasil", "brazil", "são paulo", "rio de janeiro", "brasília", "sp", "rj", "df"]
+PALAVRAS_INTERNACIONAIS = ["united states", "new york", "london", "germany", "france", "canada", "australia", "usa", "uk", "europe"]
+
+# 🔤 Heurísticas de texto: palavras-chave e padrões num único regex compilado
+# (característica, rótulo, palavra inteira?, palavras) — em ordem de prioridade dentro
+# de cada característica. Palavra inteira: "sp" não casa dentro de "especialista";
+# senão só o início é ancorado, para aceitar flexões ("requisito" → "requisitos").
+TEXT_KEYWORDS = [
+    ("geo", "br", True, PALAVRAS_BRASIL),
+    ("geo", "intl", True, PALAVRAS_INTERNACIONAIS),
+    ("work_model", "remote", False, ["remoto", "remote", "home office"]),
+    ("work_model", "onsite", False, ["presencial", "on-site", "escritório"]),
+    ("work_model", "hybrid", False, ["híbrido", "hibrido", "hybrid"]),
+    ("currency", "USD", True, ["usd", "dólar", "dólares"]),
+    ("currency", "EUR", True, ["eur", "euro", "euros"]),
+    ("contract", "PJ", True, ["pj", "pessoa jurídica", "pessoa física"]),
+    ("contract", "Estágio", False, ["estágio", "trainee"]),
+    ("proficiency", 5, False, ["especialista", "expert", "avançado", "sênior"]),
+    ("proficiency", 4, False, ["experiente", "domínio", "proficiente"]),
+    ("proficiency", 3, False, ["competente", "intermediário", "bom conhecimento"]),
+    ("proficiency", 2, False, ["básico", "iniciante", "conhecimentos"]),
+    ("importance", 95, False, ["essencial", "obrigatório", "crítico", "fundamental", "requisito", "indispensável"]),
+    ("importance", 80, False, ["importante", "desejável", "preferencial", "diferencial", "valioso"]),
+]
+TEXT_FEATURE_DEFAULTS = {"work_model": None, "currency": "BRL", "contract": "CLT", "proficiency": 3, "importance": 70}
+
+# Faixas salariais, em ordem de prioridade ("salário de R$..." e "faixa salarial: R$..."
+# são casos particulares da primeira)
+SALARY_RANGE_PATTERNS = [
+    r"R\$\s*(?P<range0_min>[\d\.,]+)[\s\-]+(?P<range0_max>[\d\.,]+)",  # R$ 5.000 - 8.000
+    r"entre\s+(?P<range1_min>[\d\.,]+)\s+e\s+(?P<range1_max>[\d\.,]+)\s+reais",  # entre 5.000 e 8.000 reais
+    r"(?P<range2_min>[\d\.,]+)\s+a\s+(?P<range2_max>[\d\.,]+)\s+mil",  # 5 a 8 mil
+]
+SALARY_SINGLE_PATTERN = r"(?-i:R)\$(?=\s*(?P<single>[\d\.,]+))"  # R$ 5.000 (sem consumir o número)
+EXPERIENCE_PATTERN = r"(?P<exp>(?P<exp_plus>\d{1,2})\s*\+\s*anos|(?:mínim[oa]|pelo\s+menos)\s+(?:de\s+)?(?P<exp_min>\d{1,2})\s+anos)"
+
+def _trie_regex(words):
+    """Alternação em forma de trie: prefixos comuns compartilhados, casamento mais longo"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
     
-    similarity = np.dot(brasil_embedding, text_embedding) / (np.linalg.norm(brasil_embedding) * np.linalg.norm(text_embedding))
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
     
-    # Decisão inteligente
+    return build(trie)
+
+def _parse_brl_amount(value):
+    return float(value.replace(".", "").replace(",", "."))
+
+class TextFeatureMatcher:
+    """Todas as heurísticas de palavras-chave e padrões numa única passada pelo texto.
+
+    Palavras-chave viram duas alternações em trie (palavra inteira e prefixo) e, com
+    os padrões de salário e experiência, formam um único regex compilado uma vez. O
+    custo por descrição é uma varredura, independente de quantas palavras existirem.
+    ``scan`` devolve o registro de características da descrição.
+    """
+
+    def __init__(self, keywords=TEXT_KEYWORDS, defaults=TEXT_FEATURE_DEFAULTS):
+        self.defaults = defaults
+        self.priority = {}
+        self._keywords = {"word": {}, "prefix": {}}
+        for feature, label, whole_word, words in keywords:
+            if label not in self.priority.setdefault(feature, []):
+                self.priority[feature].append(label)
+            for word in words:
+                self._keywords["word" if whole_word else "prefix"].setdefault(word.lower(), []).append((feature, label))
+        
+        alternatives = [f"(?P<range{i}>{pattern})" for i, pattern in enumerate(SALARY_RANGE_PATTERNS)]
+        alternatives += [SALARY_SINGLE_PATTERN, EXPERIENCE_PATTERN]
+        alternatives.append(rf"(?<!\w)(?P<word>{_trie_regex(self._keywords['word'])})(?!\w)")
+        alternatives.append(rf"(?<!\w)(?P<prefix>{_trie_regex(self._keywords['prefix'])})")
+        self.regex = re.compile("|".join(alternatives), re.IGNORECASE)
+        self.range_count = len(SALARY_RANGE_PATTERNS)
+
+    def scan(self, text):
+        """Registro de características de ``text`` (uma única varredura)"""
+        matches = {}
+        ranges = {}
+        single = None
+        years = []
+        for m in self.regex.finditer(text or ""):
+            kind = m.lastgroup
+            if kind in ("word", "prefix"):
+                keyword = m.group(kind).lower()
+                for feature, label in self._keywords[kind].get(keyword, ()):
+                    matches.setdefault(feature, {}).setdefault(label, set()).add(keyword)
+            elif kind == "exp":
+                years.append(int(m.group("exp_plus") or m.group("exp_min")))
+            elif kind == "single":
+                single = single or m.group("single")
+            else:
+                ranges.setdefault(kind, (m.group(f"{kind}_min"), m.group(f"{kind}_max")))
+        
+        features = {
+            feature: next((label for label in self.priority[feature] if label in matches.get(feature, {})), default)
+            for feature, default in self.defaults.items()
+        }
+        geo = matches.get("geo", {})
+        features["geo_br"] = len(geo.get("br", ()))
+        features["geo_intl"] = len(geo.get("intl", ()))
+        features["salary"] = self._salary(ranges, single)
+        features["experience_years_min"] = min(years) if years else 2
+        features["matches"] = {feature: {label: sorted(words) for label, words in labels.items()} for feature, labels in matches.items()}
+        return features
+
+    def _salary(self, ranges, single):
+        for i in range(self.range_count):
+            if f"range{i}" not in ranges:
+                continue
+            try:
+                min_val, max_val = (_parse_brl_amount(v) for v in ranges[f"range{i}"])
+            except ValueError:
+                continue
+            # Ajustar para milhares se necessário (provavelmente está em milhares)
+            if min_val < 10000:
+                min_val *= 1000
+                max_val *= 1000
+            return {"min": int(min_val), "max": int(max_val), "disclosed": True}
+        
+        # Fallback para valor único: estimar faixa
+        if single:
+            try:
+                val = _parse_brl_amount(single)
+                if val < 10000:
+                    val *= 1000
+                return {"min": int(val * 0.8), "max": int(val * 1.2), "disclosed": True}
+            except ValueError:
+                pass
+        return {"min": None, "max": None, "disclosed": False}
+
+TEXT_FEATURES = TextFeatureMatcher()
+
+def _geo_keyword_counts(text):
+    """Conta palavras-chave brasileiras (positivas) e internacionais (negativas), palavra inteira"""
+    features = TEXT_FEATURES.scan(text)
+    return features["geo_br"], features["geo_intl"]
+
+def _geo_decision(positivo, negativo, similarity):
+    """Decisão inteligente combinando palavras-chave e similaridade com 'brasil'"""
     if positivo >= 2 or (positivo >= 1 and similarity > 0.3):
         return True
     if negativo >= 2:
         return False
     return similarity > 0.25
 
-def detect_seniority_with_ai(text, title):
-    """Detecção de senioridade usando IA em vez de regras"""
-    # Combinar título e descrição para contexto completo
-    context = f"{title} {text}".lower()
-    
-    # Embeddings de referência para níveis de senioridade
-    seniority_levels = {
-        "estagio": ["estágio", "estagiário", "trainee", "aprendiz", "jovem aprendiz"],
-        "junior": ["júnior", "jr", "junior", "assistente", "auxiliar"],
-        "pleno": ["pleno", "analista", "consultor", "especialista"],
-        "senior": ["sênior", "sr", "senior", "analista sênior", "especialista sênior"],
-        "gerente": ["gerente", "manager", "supervisor", "coordenador", "líder"],
-        "diretor": ["diretor", "director", "head of", "vp", "vice-presidente"],
-        "c_level": ["ceo", "cto", "cfo", "coo", "chief", "presidente", "sócio"]
-    }
+def filter_serp_results(organic_results, query_base):
+    """Filtra uma página inteira de resultados do SerpAPI de uma só vez.
+
+    Títulos e textos geográficos de todos os resultados são codificados num único
+    ``encode`` em lote; os scores geográfico e de relevância saem de produtos
+    matriciais. Retorna ``(link, title, snippet)`` apenas dos resultados aprovados,
+    na ordem original, para que só eles tenham a página de detalhes baixada.
+    """
+    candidates = []
+    for result in organic_results:
+        link = result.get("link", "")
+        title = result.get("title", "Vaga sem título")
+        snippet = result.get("snippet", "")
+        
+        # Filtros de segurança
+        if not link or len(link) < 10 or "google.com" in link or "url?" in link:
+            continue
+        candidates.append((link, title, snippet))
     
-    # Gerar embeddings para o contexto
-    context_embedding = EMBEDDING_MODEL.encode([context[:300]])[0]  # Primeiros 300 caracteres
-    
-    # Calcular similaridade com cada nível
-    best_match = "pleno"
-    best_score = 0
-    
-    for level, examples in seniority_levels.items():
-        level_embedding = EMBEDDING_MODEL.encode(examples).mean(axis=0)
-        similarity = np.dot(context_embedding, level_embedding) / (np.linalg.norm(context_embedding) * np.linalg.norm(level_embedding))
-        
-        if similarity > best_score and similarity > 0.3:
-            best_score = similarity
-            best_match = level
-    
-    return best_match
-
-def detect_area_with_ai(text, title):
-    """Classificação de área usando similaridade semântica"""
-    context = f"{title} {text}".lower()
-    context_embedding = EMBEDDING_MODEL.encode([context[:300]])[0]
-    
-    areas = {
-        "tecnologia": ["desenvolvedor", "software", "python", "dados", "ti", "tecnologia"],
-        "vendas": ["vendedor", "vendas", "comercial", "account", "hunter", "sales"],
-        "marketing": ["marketing", "comunicação", "mídia", "digital", "brand", "growth"],
-        "financeiro": ["financeiro", "contábil", "controladoria", "tesouraria", "investimentos"],
-        "recursos_humanos": ["rh", "recursos humanos", "talentos", "people", "gente"],
-        "produto": ["produto", "product", "ux", "design", "product manager"],
-        "juridico": ["jurídico", "advogado", "direito", "legal", "compliance"],
-        "operacoes": ["operações", "logística", "produção", "qualidade", "processos"]
-    }
+    if not candidates:
+        return []
     
-    best_area = "operacoes"
-    best_score = 0
+    geo_texts = [f"{title} {snippet} {link}".lower() for link, title, snippet in candidates]
+    titles = [title for _, title, _ in candidates]
     
-    for area, keywords in areas.items():
-        area_embedding = EMBEDDING_MODEL.encode(keywords).mean(axis=0)
-        similarity = np.dot(context_embedding, area_embedding) / (np.linalg.norm(context_embedding) * np.linalg.norm(area_embedding))
+    # Um único lote: textos geográficos + títulos + referências ("brasil" e a query)
+    n = len(candidates)
+    embeddings = normalize_rows(EMBEDDING_MODEL.encode([t[:200] for t in geo_texts] + titles + ["brasil", query_base]))
+    geo_scores = embeddings[:n] @ embeddings[2 * n]
+    relevance_scores = embeddings[n:2 * n] @ embeddings[2 * n + 1]
+    
+    approved = []
+    for i, (link, title, snippet) in enumerate(candidates):
+        # Filtro geográfico inteligente
+        positivo, negativo = _geo_keyword_counts(geo_texts[i])
+        if not _geo_decision(positivo, negativo, geo_scores[i]):
+            logger.info(f"🌍 Ignorando vaga internacional (IA): {title[:50]}...")
+            continue
+        
+        # Filtro de relevância usando similaridade semântica
+        if relevance_scores[i] < 0.2:
+            logger.info(f"🔍 Ignorando vaga irrelevante (score: {relevance_scores[i]:.2f}): {title[:50]}...")
+            continue
         
-        if similarity > best_score and similarity > 0.35:
-            best_score = similarity
-            best_area = area
+        approved.append((link, title, snippet))
     
-    return best_area
+    return approved
 
-def extract_salary_intelligently(text):
-    """Extração inteligente de salário usando padrões e NLP"""
-    result = {
-        "min": None,
-        "max": None,
-        "currency": "BRL",
-        "disclosed": False,
-        "type": "CLT"
+def detect_seniority_and_area_batch(jobs):
+    """Classifica senioridade e área de vários (descrição, título) com um único encode"""
+    contexts = [f"{title} {text}".lower()[:300] for text, title in jobs]
+    if not contexts:
+        return []
+    embeddings = EMBEDDING_MODEL.encode(contexts)
+    seniorities = [SENIORITY_PROTOTYPES.pick(row) for row in SENIORITY_PROTOTYPES.scores(embeddings)]
+    areas = [AREA_PROTOTYPES.pick(row) for row in AREA_PROTOTYPES.scores(embeddings)]
+    return list(zip(seniorities, areas))
+
+def extract_salary_intelligently(text, features=None):
+    """Extração inteligente de salário usando padrões e NLP (``features``: ``TEXT_FEATURES.scan`` já feito)"""
+    features = features or TEXT_FEATURES.scan(text)
+    salary = features["salary"]
+    return {
+        "min": salary["min"],
+        "max": salary["max"],
+        "currency": features["currency"],
+        "disclosed": salary["disclosed"],
+        "type": features["contract"]
     }
+
+# 🗄️ Arquivo de respostas HTTP (comprimido, endereçado por conteúdo) e modo replay
+class ArchivedResponse:
+    """Resposta lida do arquivo, com a mesma interface usada de ``requests.Response``"""
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.ok = status_code < 400
+
+    @property
+    def encoding(self):
+        match = re.search(r"charset=([\w\-]+)", self.headers.get("Content-Type", ""), re.IGNORECASE)
+        return match.group(1) if match else "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+def archive_key(url, params=None):
+    """Chave estável de uma requisição (sem a api_key, que nunca é arquivada)"""
+    prepared = requests.Request("GET", url, params=params).prepare().url
+    parts = urllib.parse.urlsplit(prepared)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k != "api_key"]
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, urllib.parse.urlencode(query), ""))
+
+class ResponseArchive:
+    """Arquivo local de respostas brutas (JSON do SERP e HTML das vagas).
+
+    Os corpos ficam em ``blobs/<sha256>`` comprimidos com zstd (se ``zstandard``
+    estiver instalado) ou gzip, e são deduplicados pelo hash. Um índice SQLite
+    liga (chave da requisição, data da coleta) ao blob, ao status e aos cabeçalhos.
+    Coletas com mais de ``retention_days`` dias são removidas por ``prune``.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR, retention_days=ARCHIVE_RETENCAO_DIAS):
+        self.root = root
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn = None
+        if not root:
+            return
+        try:
+            os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT, fetch_date TEXT, status INTEGER, headers TEXT, blob TEXT, codec TEXT, fetched_at TEXT,"
+                " PRIMARY KEY (key, fetch_date))"
+            )
+            self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Arquivo de respostas indisponível ({root}): {e}")
+            self._conn = None
+
+    @property
+    def enabled(self):
+        return self._conn is not None
+
+    def _blob_path(self, digest, codec):
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.{codec}")
+
+    def store(self, key, status, headers, content):
+        if not self.enabled:
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        codec = "zst" if zstandard else "gz"
+        path = self._blob_path(digest, codec)
+        try:
+            data = None
+            if not os.path.exists(path):
+                data = zstandard.ZstdCompressor(level=10).compress(content) if zstandard else gzip.compress(content, compresslevel=6)
+            now = datetime.now()
+            kept_headers = {k: v for k, v in headers.items() if k.lower() in ("content-type", "etag", "last-modified")}
+            with self._lock:
+                # Conferido de novo sob o lock: ``prune`` pode ter removido o blob nesse meio-tempo
+                if not os.path.exists(path):
+                    if data is None:
+                        data = zstandard.ZstdCompressor(level=10).compress(content) if zstandard else gzip.compress(content, compresslevel=6)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, now.strftime("%Y-%m-%d"), status, json.dumps(kept_headers), digest, codec, now.isoformat())
+                )
+                self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Falha ao arquivar resposta de {key}: {e}")
+
+    def prune(self):
+        """Remove coletas além da retenção e os blobs que ficaram sem referência"""
+        if not self.enabled or self.retention_days <= 0:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        try:
+            with self._lock:
+                removed = self._conn.execute("DELETE FROM responses WHERE fetch_date < ?", (cutoff,)).rowcount
+                self._conn.commit()
+                if not removed:
+                    return 0
+                kept = {f"{digest}.{codec}" for digest, codec in self._conn.execute("SELECT DISTINCT blob, codec FROM responses")}
+                blobs_dir = os.path.join(self.root, "blobs")
+                for prefix in os.listdir(blobs_dir):
+                    prefix_dir = os.path.join(blobs_dir, prefix)
+                    for name in os.listdir(prefix_dir):
+                        # Blobs são deduplicados entre dias: só sai o que nenhuma coleta retida usa
+                        if name not in kept and not name.endswith(".tmp"):
+                            os.remove(os.path.join(prefix_dir, name))
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"⚠️ Falha ao limpar o arquivo de respostas: {e}")
+            return 0
+        logger.info(f"🧹 Arquivo de respostas: {removed} respostas com mais de {self.retention_days} dias removidas")
+        return removed
+
+    def latest_date(self):
+        """Data de coleta mais recente presente no arquivo (AAAA-MM-DD) ou None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(fetch_date) FROM responses").fetchone()
+        return row[0] if row else None
+
+    def load(self, key, fetch_date="latest"):
+        """Resposta arquivada para ``key`` (na data pedida, ou a mais recente até ela)"""
+        if not self.enabled:
+            return None
+        sql = "SELECT status, headers, blob, codec FROM responses WHERE key = ?"
+        args = [key]
+        if fetch_date and fetch_date != "latest":
+            sql += " AND fetch_date <= ?"
+            args.append(fetch_date)
+        with self._lock:
+            row = self._conn.execute(sql + " ORDER BY fetch_date DESC LIMIT 1", args).fetchone()
+        if row is None:
+            return None
+        status, headers, digest, codec = row
+        with open(self._blob_path(digest, codec), "rb") as f:
+            data = f.read()
+        if codec == "zst":
+            if not zstandard:
+                logger.warning(f"⚠️ Blob zstd sem o pacote zstandard instalado: {key}")
+                return None
+            content = zstandard.ZstdDecompressor().decompress(data)
+        else:
+            content = gzip.decompress(data)
+        return ArchivedResponse(key, status, json.loads(headers), content)
+
+class ArchivingSession:
+    """Sessão que delega ao ``requests`` e grava no arquivo cada resposta 200"""
+
+    def __init__(self, session, archive):
+        self.session = session
+        self.archive = archive
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def get(self, url, params=None, **kwargs):
+        res = self.session.get(url, params=params, **kwargs)
+        if res.status_code == 200:
+            self.archive.store(archive_key(url, params), res.status_code, res.headers, res.content)
+        return res
+
+class ReplaySession:
+    """Sessão offline: responde a partir do arquivo; o que não foi arquivado vira 404"""
+
+    def __init__(self, archive, fetch_date="latest"):
+        self.archive = archive
+        self.fetch_date = fetch_date
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, params=None, **kwargs):
+        key = archive_key(url, params)
+        res = self.archive.load(key, self.fetch_date)
+        if res is None:
+            self.misses += 1
+            return ArchivedResponse(key, 404, {}, b'{"error": "not archived"}')
+        self.hits += 1
+        return res
+
+ARCHIVE = RESOURCES.register("archive", ResponseArchive)
+
+# 🚦 Politeness por domínio (intervalo mínimo entre requisições ao mesmo host)
+class DomainRateLimiter:
+    """Agenda requisições por host: hosts diferentes não esperam uns pelos outros.
+
+    Cada host tem um "próximo horário livre"; ``wait`` reserva o slot sob lock e
+    dorme fora dele, então só as threads do mesmo domínio ficam em fila.
+    ``defer`` empurra o host para frente (ex.: ``Retry-After`` em 429/503).
+    """
+
+    def __init__(self, min_interval=MIN_INTERVALO_POR_DOMINIO):
+        self.min_interval = min_interval
+        self._next_allowed = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, host, seconds):
+        with self._lock:
+            target = time.monotonic() + seconds
+            self._next_allowed[host] = max(self._next_allowed.get(host, 0), target)
+
+# 🔌 Circuit breaker por domínio (site fora do ar ou bloqueando não consome a coleta)
+STATUS_BLOQUEIO = {403, 429}
+STATUS_DEFINITIVOS = {400, 401, 404, 410}  # Não adianta repetir; não indicam problema no site
+
+class CircuitPermit:
+    """Autorização de ``DomainCircuitBreaker.allow``; ``probe`` marca o dono do teste meio-aberto"""
+
+    __slots__ = ("host", "probe")
+
+    def __init__(self, host, probe=False):
+        self.host = host
+        self.probe = probe
+
+class DomainCircuitBreaker:
+    """Suspende um domínio após falhas ou bloqueios seguidos.
+
+    Com ``failure_threshold`` falhas (timeout, erro de conexão, 5xx) ou
+    ``block_threshold`` bloqueios (403/429) seguidos o circuito abre, e as URLs
+    restantes do domínio são puladas sem requisição durante ``cooldown`` segundos.
+    Depois da pausa uma única requisição de teste passa (meio-aberto): sucesso
+    fecha o circuito, nova falha reabre. Só quem recebeu a ``CircuitPermit`` do
+    teste decide: downloads comuns ainda em voo não fecham, reabrem nem liberam
+    o circuito de um domínio suspenso.
+    """
+
+    def __init__(self, failure_threshold=CIRCUITO_FALHAS, block_threshold=CIRCUITO_BLOQUEIOS, cooldown=CIRCUITO_PAUSA_SEGUNDOS):
+        self.failure_threshold = max(1, failure_threshold)
+        self.block_threshold = max(1, block_threshold)
+        self.cooldown = cooldown
+        self._failures = {}
+        self._blocks = {}
+        self._open_until = {}
+        self._probing = {}  # host → CircuitPermit do teste meio-aberto em curso
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.skipped = 0
+
+    def allow(self, host):
+        """``CircuitPermit`` para baixar de ``host``, ou None enquanto o circuito estiver
+        aberto (ou já houver um teste em curso)"""
+        with self._lock:
+            until = self._open_until.get(host)
+            if until is None:
+                return CircuitPermit(host)
+            if time.monotonic() >= until and host not in self._probing:
+                permit = self._probing[host] = CircuitPermit(host, probe=True)
+                return permit
+            self.skipped += 1
+            return None
+
+    def is_open(self, host):
+        with self._lock:
+            return host in self._open_until
+
+    def _owns_probe(self, host, permit):
+        return permit is not None and self._probing.get(host) is permit
+
+    def record_success(self, host, permit=None):
+        with self._lock:
+            if host in self._open_until and not self._owns_probe(host, permit):
+                return  # Resposta de um download anterior à abertura: quem decide é o teste
+            self._failures.pop(host, None)
+            self._blocks.pop(host, None)
+            self._probing.pop(host, None)
+            if self._open_until.pop(host, None) is not None:
+                logger.info(f"🔌 Circuito fechado para {host}")
+
+    def release(self, host, permit):
+        """Encerra um teste meio-aberto sem veredito (o circuito segue aberto até o próximo teste)"""
+        with self._lock:
+            if self._owns_probe(host, permit):
+                del self._probing[host]
+
+    def record_failure(self, host, blocked=False, permit=None):
+        with self._lock:
+            if host in self._open_until:
+                if not self._owns_probe(host, permit):
+                    return  # Já suspenso: só a falha do próprio teste reabre
+                del self._probing[host]
+            else:
+                counts, threshold = (self._blocks, self.block_threshold) if blocked else (self._failures, self.failure_threshold)
+                counts[host] = counts.get(host, 0) + 1
+                if counts[host] < threshold:
+                    return
+                counts[host] = 0
+                self.opened += 1
+                METRICS.inc("eleva_circuit_open_total")
+            self._open_until[host] = time.monotonic() + self.cooldown
+        logger.warning(f"🔌 Circuito aberto para {host}: {'bloqueios' if blocked else 'falhas'} seguidos, pausa de {self.cooldown:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            return {"opened": self.opened, "skipped": self.skipped, "open_domains": sorted(self._open_until)}
+
+def get_domain(url):
+    """Host normalizado (sem 'www.') usado como chave de politeness"""
+    host = urllib.parse.urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+# Parâmetros de rastreamento que não mudam a vaga (ignorados na URL canônica)
+TRACKING_PARAMS = {"gclid", "fbclid", "trk", "trackingid", "refid", "lipi"}
+
+def canonicalize_url(url):
+    """URL canônica: host minúsculo sem 'www.', sem fragmento, sem parâmetros de rastreamento"""
+    parts = urllib.parse.urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = sorted(
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit(("https", host, path, urllib.parse.urlencode(query), ""))
+
+def stable_job_id(url):
+    """ID determinístico (igual entre processos e execuções) a partir da URL canônica"""
+    return f"eleva_{hashlib.sha256(canonicalize_url(url).encode('utf-8')).hexdigest()[:32]}"
+
+def parse_retry_after(value, default):
+    """Interpreta o cabeçalho Retry-After (segundos ou data HTTP), limitado a MAX_RETRY_AFTER"""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return default
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+# 🧾 Estado incremental da coleta (URLs já vistas, validadores HTTP e hash do conteúdo)
+class CrawlState:
+    """Memória entre execuções, em SQLite, indexada pela URL canônica.
+
+    URLs vistas há menos de ``revisit_after`` nem são baixadas; as mais antigas são
+    revalidadas com ``If-None-Match``/``If-Modified-Since``. Se o servidor responder
+    304, ou se o hash do corpo não mudou, a vaga pula todo o processamento de NLP.
+    O pipeline só grava o estado de uma página nova/alterada depois que a vaga foi
+    salva no banco: se o enriquecimento ou o upsert falhar, ela é baixada de novo.
+    """
+
+    def __init__(self, path=CRAWL_STATE_PATH, revisit_after=timedelta(days=CRAWL_REVISITAR_APOS_DIAS)):
+        self.path = path
+        self.revisit_after = revisit_after
+        self._lock = threading.Lock()
+        self._conn = None
+        self.skipped_recent = 0
+        self.not_modified = 0
+        self.unchanged = 0
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawl_state ("
+                " url TEXT PRIMARY KEY, last_fetch TEXT, etag TEXT, last_modified TEXT, content_hash TEXT)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Estado incremental indisponível ({path}): {e}")
+            self._conn = None
+
+    def _get(self, url):
+        if self._conn is None:
+            return None
+        with self._lock:
+            return self._conn.execute(
+                "SELECT last_fetch, etag, last_modified, content_hash FROM crawl_state WHERE url = ?",
+                (canonicalize_url(url),)
+            ).fetchone()
+
+    def plan(self, url):
+        """Decide antes do download: ``(baixar?, cabeçalhos condicionais)``"""
+        row = self._get(url)
+        if row is None:
+            return True, {}
+        last_fetch, etag, last_modified, _ = row
+        if datetime.utcnow() - datetime.fromisoformat(last_fetch) < self.revisit_after:
+            self.skipped_recent += 1
+            return False, {}
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return True, headers
+
+    def record(self, url, etag, last_modified, content_hash):
+        if self._conn is None:
+            return
+        values = (canonicalize_url(url), datetime.utcnow().isoformat(), etag, last_modified, content_hash)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?, ?)", values)
+            self._conn.commit()
+
+    def touch(self, url):
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute("UPDATE crawl_state SET last_fetch = ? WHERE url = ?", (datetime.utcnow().isoformat(), canonicalize_url(url)))
+            self._conn.commit()
+
+    def is_changed(self, link, res, pending=None):
+        """True se a página é nova ou mudou; False para 304/corpo idêntico.
+
+        O estado de uma página nova vai para ``pending[link]`` (a gravar com
+        ``record`` após salvar a vaga) ou, sem ``pending``, é gravado na hora.
+        """
+        if res is None:
+            return True
+        if res.status_code == 304:
+            self.not_modified += 1
+            self.touch(link)
+            logger.info(f"♻️ Vaga sem alterações (304): {link}")
+            return False
+        content_hash = hashlib.sha256(res.content).hexdigest()
+        row = self._get(link)
+        if row is not None and row[3] == content_hash:
+            self.unchanged += 1
+            self.touch(link)
+            logger.info(f"♻️ Vaga sem alterações (mesmo conteúdo): {link}")
+            return False
+        state = (res.headers.get("ETag"), res.headers.get("Last-Modified"), content_hash)
+        if pending is None:
+            self.record(link, *state)
+        else:
+            pending[link] = state
+        return True
+
+    def stats(self):
+        return {"skipped_recent": self.skipped_recent, "not_modified": self.not_modified, "unchanged": self.unchanged}
+
+CRAWL_STATE = RESOURCES.register("crawl_state", CrawlState)
+
+# 🧬 Quase-duplicatas entre fontes (MinHash + LSH sobre título e snippet)
+DEDUP_RUIDO = {"linkedin", "indeed", "glassdoor", "gupy", "vagas", "vaga", "com", "br", "www", "jobs", "job", "emprego", "empregos"}
+MINHASH_PRIMO = (1 << 61) - 1
+
+class JobDedupIndex:
+    """Índice persistente de vagas já vistas, para colapsar cópias da mesma vaga.
+
+    A mesma vaga aparece no LinkedIn, Indeed, Glassdoor e na Gupy da empresa. Cada
+    vaga vira uma assinatura MinHash (``num_perm`` permutações sobre pares de
+    palavras de título + snippet + empresa normalizados), dividida em ``bands``
+    faixas para busca LSH. Um candidato cujo Jaccard estimado passe de ``threshold``
+    é duplicata da vaga canônica; entre o limiar e ``strong`` a decisão é confirmada
+    pela similaridade dos embeddings. Tudo fica em SQLite: reposts de execuções
+    anteriores também são detectados, e cada canônica guarda todas as URLs de origem.
+
+    Com ``run_id``, uma canônica nova é provisória (``status`` = ID da execução)
+    até ``confirm`` — chamado quando a vaga é gravada. Se o download dela falhar,
+    ``fallback`` promove a próxima URL de origem; provisórias de execuções que não
+    confirmaram são descartadas ao reaparecer, então a vaga nunca se perde.
+    """
+
+    def __init__(self, path=DEDUP_INDEX_PATH, num_perm=64, bands=16, threshold=DEDUP_LIMIAR, strong=0.85,
+                 confirm_with_embeddings=DEDUP_CONFIRMAR_EMBEDDING, min_cosine=0.9, ttl=timedelta(days=DEDUP_TTL_DIAS)):
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.strong = strong
+        self.confirm_with_embeddings = confirm_with_embeddings
+        self.min_cosine = min_cosine
+        self.ttl = ttl
+        rng = random.Random(20260101)  # Semente fixa: assinaturas comparáveis entre execuções
+        self._permutations = [(rng.randrange(1, MINHASH_PRIMO), rng.randrange(0, MINHASH_PRIMO)) for _ in range(num_perm)]
+        self._lock = threading.Lock()
+        self._conn = None
+        self.duplicates = 0
+        self.canonicals = 0
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS dedup_jobs ("
+                " canonical_url TEXT PRIMARY KEY, text TEXT, signature BLOB, first_seen TEXT, last_seen TEXT,"
+                " status TEXT DEFAULT 'confirmed');"
+                "CREATE TABLE IF NOT EXISTS dedup_bands ("
+                " band INTEGER, bucket TEXT, canonical_url TEXT, PRIMARY KEY (band, bucket, canonical_url));"
+                "CREATE TABLE IF NOT EXISTS dedup_sources ("
+                " url TEXT PRIMARY KEY, canonical_url TEXT, first_seen TEXT);"
+                "CREATE INDEX IF NOT EXISTS dedup_sources_canonical ON dedup_sources (canonical_url);"
+            )
+            try:
+                # Índices criados antes do status provisório: tudo o que existe já foi gravado
+                self._conn.execute("ALTER TABLE dedup_jobs ADD COLUMN status TEXT DEFAULT 'confirmed'")
+            except sqlite3.OperationalError:
+                pass
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Índice de duplicatas indisponível ({path}): {e}")
+            self._conn = None
+
+    @property
+    def enabled(self):
+        return self._conn is not None
+
+    @staticmethod
+    def normalize(title, snippet="", company=""):
+        """Texto comparável: sem acentos, pontuação, nomes de portais e sufixos de SERP"""
+        tokens = [t for t in _tokens(fold_text(f"{title} {company} {snippet}")) if t not in DEDUP_RUIDO]
+        return " ".join(tokens)
+
+    def signature(self, text):
+        """Assinatura MinHash (``num_perm`` inteiros) dos pares de palavras do texto"""
+        words = text.split()
+        shingles = {" ".join(words[i:i + 2]) for i in range(max(1, len(words) - 1))} or {""}
+        hashes = [int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest(), "little") & MINHASH_PRIMO for sh in shingles]
+        # (a·h + b) mod p em inteiros do Python: sem estouro de 64 bits
+        return np.array([min((a * h + b) % MINHASH_PRIMO for h in hashes) for a, b in self._permutations], dtype=np.uint64)
+
+    def _buckets(self, signature):
+        return [
+            (band, hashlib.sha1(signature[band * self.rows:(band + 1) * self.rows].tobytes()).hexdigest()[:16])
+            for band in range(self.bands)
+        ]
+
+    def _confirm(self, text, other_text):
+        embeddings = normalize_rows(EMBEDDING_MODEL.encode([text, other_text]))
+        return float(embeddings[0] @ embeddings[1]) >= self.min_cosine
+
+    def _drop(self, canonical):
+        for table in ("dedup_bands", "dedup_sources", "dedup_jobs"):
+            self._conn.execute(f"DELETE FROM {table} WHERE canonical_url = ?", (canonical,))
+
+    def check(self, url, title, snippet="", company="", run_id=None):
+        """Registra a vaga e devolve a URL canônica se ela for duplicata de outra (senão None)"""
+        if self._conn is None:
+            return None
+        url = canonicalize_url(url)
+        now = datetime.now(timezone.utc)
+        cutoff = (now - self.ttl).isoformat()
+        text = self.normalize(title, snippet, company)
+        status = run_id or "confirmed"
+        
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT s.canonical_url, j.status FROM dedup_sources s LEFT JOIN dedup_jobs j ON j.canonical_url = s.canonical_url"
+                " WHERE s.url = ?", (url,)
+            ).fetchone()
+            if row is not None and row[1] not in ("confirmed", status):
+                # Canônica provisória de uma execução que não chegou a gravá-la: reavaliar do zero
+                self._drop(row[0])
+                row = None
+            if row is not None:
+                # URL já conhecida: continua sendo canônica ou cópia de quem já era
+                self._conn.execute("UPDATE dedup_jobs SET last_seen = ? WHERE canonical_url = ?", (now.isoformat(), row[0]))
+                self._conn.commit()
+                if row[0] == url:
+                    return None
+                self.duplicates += 1
+                return row[0]
+            
+            signature = self.signature(text)
+            buckets = self._buckets(signature)
+            candidates = set()
+            for band, bucket in buckets:
+                candidates.update(r[0] for r in self._conn.execute(
+                    "SELECT b.canonical_url FROM dedup_bands b JOIN dedup_jobs j ON j.canonical_url = b.canonical_url"
+                    " WHERE b.band = ? AND b.bucket = ? AND j.last_seen >= ? AND j.status IN ('confirmed', ?)",
+                    (band, bucket, cutoff, status)
+                ))
+            
+            best_url, best_score, best_text = None, 0.0, None
+            for candidate in candidates:
+                other_text, other_blob = self._conn.execute(
+                    "SELECT text, signature FROM dedup_jobs WHERE canonical_url = ?", (candidate,)
+                ).fetchone()
+                score = float(np.mean(np.frombuffer(other_blob, dtype=np.uint64) == signature))
+                if score > best_score:
+                    best_url, best_score, best_text = candidate, score, other_text
+        
+        is_duplicate = best_url is not None and best_score >= self.threshold
+        if is_duplicate and best_score < self.strong and self.confirm_with_embeddings:
+            is_duplicate = self._confirm(text, best_text)
+        
+        with self._lock:
+            if is_duplicate:
+                self.duplicates += 1
+                self._conn.execute("INSERT OR IGNORE INTO dedup_sources VALUES (?, ?, ?)", (url, best_url, now.isoformat()))
+                self._conn.execute("UPDATE dedup_jobs SET last_seen = ? WHERE canonical_url = ?", (now.isoformat(), best_url))
+            else:
+                self.canonicals += 1
+                self._conn.execute("INSERT OR REPLACE INTO dedup_jobs VALUES (?, ?, ?, ?, ?, ?)",
+                                   (url, text, signature.tobytes(), now.isoformat(), now.isoformat(), status))
+                self._conn.executemany("INSERT OR IGNORE INTO dedup_bands VALUES (?, ?, ?)",
+                                       [(band, bucket, url) for band, bucket in buckets])
+                self._conn.execute("INSERT OR IGNORE INTO dedup_sources VALUES (?, ?, ?)", (url, url, now.isoformat()))
+            self._conn.commit()
+        return best_url if is_duplicate else None
+
+    def confirm(self, url):
+        """Torna oficial a canônica de ``url`` (a vaga foi gravada ou já estava no banco)"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "UPDATE dedup_jobs SET status = 'confirmed' WHERE canonical_url = "
+                "(SELECT canonical_url FROM dedup_sources WHERE url = ?)", (canonicalize_url(url),)
+            )
+            self._conn.commit()
+
+    def fallback(self, url):
+        """A canônica provisória ``url`` falhou: promove a próxima URL de origem e a devolve.
+
+        Sem outra fonte, a canônica é removida (cópias vistas depois entram como
+        vagas novas). Canônicas já confirmadas não são alteradas.
+        """
+        if self._conn is None:
+            return None
+        url = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM dedup_jobs WHERE canonical_url = ?", (url,)).fetchone()
+            if row is None or row[0] == "confirmed":
+                return None
+            alternate = self._conn.execute(
+                "SELECT url FROM dedup_sources WHERE canonical_url = ? AND url != ? ORDER BY first_seen LIMIT 1", (url, url)
+            ).fetchone()
+            if alternate is None:
+                self._drop(url)
+            else:
+                alternate = alternate[0]
+                self._conn.execute("DELETE FROM dedup_sources WHERE url = ?", (url,))
+                for table in ("dedup_jobs", "dedup_bands", "dedup_sources"):
+                    self._conn.execute(f"UPDATE {table} SET canonical_url = ? WHERE canonical_url = ?", (alternate, url))
+                self.duplicates -= 1
+            self._conn.commit()
+        return alternate
+
+    def sources(self, url):
+        """Todas as URLs de origem conhecidas da vaga canônica de ``url``"""
+        if self._conn is None:
+            return [url]
+        url = canonicalize_url(url)
+        with self._lock:
+            row = self._conn.execute("SELECT canonical_url FROM dedup_sources WHERE url = ?", (url,)).fetchone()
+            canonical = row[0] if row else url
+            rows = self._conn.execute(
+                "SELECT url FROM dedup_sources WHERE canonical_url = ? ORDER BY first_seen", (canonical,)
+            ).fetchall()
+        return [r[0] for r in rows] or [url]
+
+    def prune(self):
+        """Remove vagas canônicas (e suas faixas/cópias) não vistas há mais de ``ttl``"""
+        if self._conn is None:
+            return 0
+        cutoff = (datetime.now(timezone.utc) - self.ttl).isoformat()
+        with self._lock:
+            stale = [r[0] for r in self._conn.execute("SELECT canonical_url FROM dedup_jobs WHERE last_seen < ?", (cutoff,))]
+            for table in ("dedup_bands", "dedup_sources", "dedup_jobs"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE canonical_url = ?", [(u,) for u in stale])
+            self._conn.commit()
+        return len(stale)
+
+    def stats(self):
+        return {"duplicates": self.duplicates, "canonicals": self.canonicals}
+
+DEDUP_INDEX = RESOURCES.register("dedup_index", JobDedupIndex)
+
+def fetch_job_page(url, session, limiter=None, headers=None, max_retries=MAX_RETRIES, breaker=None, permit=None):
+    """Baixa a página da vaga respeitando o intervalo por domínio; retorna a resposta ou None
+
+    ``headers`` permite GETs condicionais; nesse caso um 304 também é devolvido.
+    Com ``breaker``, cada resultado alimenta o circuito do domínio e as tentativas
+    param assim que ele abre; ``permit`` é a autorização devolvida por
+    ``breaker.allow`` (a do teste meio-aberto fecha ou reabre o circuito).
+    """
+    try:
+        with METRICS.timer("eleva_fetch_seconds"):
+            res = _fetch_with_retries(url, session, limiter, headers, max_retries, breaker, permit)
+    finally:
+        if breaker and permit is not None and permit.probe:
+            breaker.release(permit.host, permit)  # Nenhum teste meio-aberto fica pendurado
+    METRICS.inc("eleva_fetch_total", result="falha" if res is None else str(res.status_code))
+    return res
+
+def _fetch_with_retries(url, session, limiter, headers, max_retries, breaker=None, permit=None):
+    limiter = limiter or DomainRateLimiter()
+    host = get_domain(url)
     
-    # 1. Detectar moeda
-    if "USD" in text or "dólar" in text.lower():
-        result["currency"] = "USD"
-    elif "EUR" in text or "euro" in text.lower():
-        result["currency"] = "EUR"
-    
-    # 2. Detectar tipo
-    if "PJ" in text or "pessoa jurídica" in text.lower() or "pessoa física" in text.lower():
-        result["type"] = "PJ"
-    elif "estágio" in text.lower() or "trainee" in text.lower():
-        result["type"] = "Estágio"
-    
-    # 3. Padrões complexos de extração
-    patterns = [
-        r'R\$\s*([\d\.,]+)[\s\-]+([\d\.,]+)',  # R$ 5.000 - 8.000
-        r'salário\s+de\s+R\$\s*([\d\.,]+)[\s\-]+([\d\.,]+)',  # salário de R$ 5.000 - 8.000
-        r'entre\s+([\d\.,]+)\s+e\s+([\d\.,]+)\s+reais',  # entre 5.000 e 8.000 reais
-        r'([\d\.,]+)\s+a\s+([\d\.,]+)\s+mil',  # 5 a 8 mil
-        r'faixa salarial:\s*R\$\s*([\d\.,]+)[\s\-]+([\d\.,]+)'
-    ]
+    for tentativa in range(max_retries):
+        if tentativa and breaker and breaker.is_open(host):
+            logger.warning(f"🔌 Domínio {host} suspenso: desistindo de {url}")
+            return None
+        limiter.wait(host)
+        backoff = RETRY_DELAY * (tentativa + 1)
+        try:
+            res = session.get(url, timeout=15, headers=headers)
+            if res.status_code == 200 or (headers and res.status_code == 304):
+                if breaker:
+                    breaker.record_success(host, permit)
+                return res
+            logger.warning(f"Tentativa {tentativa+1} falhou com status {res.status_code} para {url}")
+            if res.status_code in STATUS_DEFINITIVOS:
+                if breaker:
+                    breaker.record_success(host, permit)  # O site respondeu: o problema é só esta vaga
+                return None  # Vaga removida ou inexistente: repetir não muda nada
+            if breaker:
+                breaker.record_failure(host, blocked=res.status_code in STATUS_BLOQUEIO, permit=permit)
+            if res.status_code in (429, 503):
+                backoff = parse_retry_after(res.headers.get("Retry-After"), backoff)
+        except Exception as e:
+            logger.warning(f"Tentativa {tentativa+1} falhou para {url}: {e}")
+            if breaker:
+                breaker.record_failure(host, permit=permit)
+        # Backoff só do domínio afetado: as demais threads seguem livres
+        limiter.defer(host, backoff)
     
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            try:
-                min_val = float(matches[0][0].replace(".", "").replace(",", "."))
-                max_val = float(matches[0][1].replace(".", "").replace(",", "."))
-                
-                # Ajustar para milhares se necessário
-                if min_val < 10000:  # Provavelmente está em milhares
-                    min_val *= 1000
-                    max_val *= 1000
-                
-                result["min"] = int(min_val)
-                result["max"] = int(max_val)
-                result["disclosed"] = True
-                return result
-            except (ValueError, IndexError):
+    logger.error(f"❌ Todas as tentativas falharam para {url}")
+    return None
+
+# 🧱 Extração de HTML: backend plugável (selectolax → lxml → BeautifulSoup)
+TAGS_IGNORADAS = {"script", "style", "noscript", "template", "svg", "nav", "footer", "header", "aside", "form", "iframe"}
+TAGS_CANDIDATAS = {"div", "article", "section", "main", "td"}
+PISTAS_POSITIVAS = re.compile(r"descri|job|vaga|vacanc|posting|content|detail", re.IGNORECASE)
+PISTAS_NEGATIVAS = re.compile(r"comment|related|similar|sidebar|share|cookie|banner|menu|recomend", re.IGNORECASE)
+
+def decode_html(res):
+    """Decodifica os bytes crus com o charset declarado (cabeçalho ou <meta>), sem adivinhação lenta"""
+    charset = None
+    match = re.search(r"charset=[\"']?([\w\-]+)", res.headers.get("Content-Type", ""), re.IGNORECASE)
+    if match:
+        charset = match.group(1)
+    else:
+        meta = re.search(rb"<meta[^>]+charset=[\"']?([\w\-]+)", res.content[:4096], re.IGNORECASE)
+        if meta:
+            charset = meta.group(1).decode("ascii", errors="ignore")
+    try:
+        codecs.lookup(charset or "utf-8")
+    except LookupError:
+        charset = None
+    charset = charset or "utf-8"
+    return res.content.decode(charset, errors="replace"), charset
+
+def _lxml_children(node):
+    if node.text:
+        yield "text", node.text
+    for child in node:
+        if isinstance(child.tag, str):
+            yield "el", child
+        if child.tail:
+            yield "text", child.tail
+
+def _lxml_info(node):
+    return node.tag.lower(), f"{node.get('class', '')} {node.get('id', '')}"
+
+def _selectolax_children(node):
+    for child in node.iter(include_text=True):
+        if child.tag == "-text":
+            yield "text", child.text(deep=False)
+        elif not child.tag.startswith(("-", "_")):  # Comentários etc.
+            yield "el", child
+
+def _selectolax_info(node):
+    attrs = node.attributes or {}
+    return node.tag.lower(), f"{attrs.get('class') or ''} {attrs.get('id') or ''}"
+
+def find_main_content(root, children, info):
+    """Conteúdo principal numa única passada pela árvore (pontuação por densidade de texto).
+
+    A travessia é iterativa e grava os trechos de texto em ordem; cada elemento
+    guarda só o intervalo (início, fim) dos seus trechos, e somas acumuladas dão o
+    total de texto e de texto em links de qualquer subárvore em O(1). O melhor
+    candidato é o bloco com mais texto "útil" (fora de links) por elemento interno,
+    ajustado por pistas de classe/id. Retorna ``(texto_principal, texto_completo)``.
+    """
+    fragments = []
+    cum_text = [0]
+    cum_link = [0]
+    element_count = 0
+    link_depth = 0
+    best_score, best_span = 0.0, None
+    
+    stack = [("enter", root)]
+    while stack:
+        action, item = stack.pop()
+        if action == "text":
+            fragment = item.strip()
+            if fragment:
+                fragments.append(fragment)
+                cum_text.append(cum_text[-1] + len(fragment))
+                cum_link.append(cum_link[-1] + (len(fragment) if link_depth else 0))
+        elif action == "enter":
+            tag, hints = info(item)
+            if tag in TAGS_IGNORADAS:
                 continue
+            element_count += 1
+            if tag == "a":
+                link_depth += 1
+            stack.append(("exit", (item, tag, hints, len(fragments), element_count)))
+            stack.extend(reversed([("enter" if kind == "el" else "text", value) for kind, value in children(item)]))
+        else:
+            node, tag, hints, start, count_at_enter = item
+            if tag == "a":
+                link_depth -= 1
+            if tag not in TAGS_CANDIDATAS:
+                continue
+            end = len(fragments)
+            text_len = cum_text[end] - cum_text[start]
+            if text_len <= 200:  # Conteúdo significativo
+                continue
+            useful = text_len - (cum_link[end] - cum_link[start])
+            score = useful / math.sqrt(1 + element_count - count_at_enter)
+            if tag in ("article", "main"):
+                score *= 1.3
+            if PISTAS_POSITIVAS.search(hints):
+                score *= 1.5
+            if PISTAS_NEGATIVAS.search(hints):
+                score *= 0.3
+            if score > best_score:
+                best_score, best_span = score, (start, end)
     
-    # 4. Fallback para valor único
-    fallback_pattern = r'R\$\s*([\d\.,]+)'
-    match = re.search(fallback_pattern, text)
-    if match:
+    full_text = "".join(fragments)
+    if best_span is None:
+        return "", full_text
+    return "".join(fragments[best_span[0]:best_span[1]]), full_text
+
+def _extract_with_beautifulsoup(html):
+    """Backend de reserva: estratégia original por lista de seletores"""
+    soup = BeautifulSoup(html, "lxml" if lxml_html is not None else "html.parser")
+    
+    # Estratégia Beamery: identificar conteúdo principal automaticamente
+    descricao = ""
+    main_content_selectors = [
+        "div.description", "div.job-description", "div.vacancy-description", "article",
+        "section.description", "div.job-details", "div.content", "main"
+    ]
+    
+    for selector in main_content_selectors:
+        elements = soup.select(selector)
+        if elements:
+            descricao = "\n".join([elem.get_text(strip=True) for elem in elements])
+            if len(descricao) > 200:  # Conteúdo significativo
+                break
+    
+    if not descricao:
+        descricao = soup.get_text(strip=True)[:2000]  # Fallback para todo o texto
+    
+    return descricao
+
+def html_parser_backend():
+    """Backend efetivo segundo HTML_PARSER_BACKEND e os pacotes instalados"""
+    available = {"selectolax": SelectolaxParser is not None, "lxml": lxml_html is not None, "bs4": True}
+    if HTML_PARSER_BACKEND in available and available[HTML_PARSER_BACKEND]:
+        return HTML_PARSER_BACKEND
+    return next(name for name in ("selectolax", "lxml", "bs4") if available[name])
+
+# 🏷️ Dados estruturados (schema.org/JobPosting em JSON-LD ou microdata)
+JSON_LD_SCRIPT = re.compile(r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL)
+CONTRATOS_SCHEMA = {"INTERN": "Estágio", "CONTRACTOR": "PJ", "FULL_TIME": "CLT", "PART_TIME": "CLT", "TEMPORARY": "CLT"}
+SALARIO_MENSAL_POR_UNIDADE = {"HOUR": 220, "DAY": 22, "WEEK": 4.33, "MONTH": 1, "YEAR": 1 / 12}
+
+def _html_to_text(fragment):
+    """Descrições do JSON-LD costumam vir em HTML: converter para texto simples"""
+    if "<" not in fragment:
+        return html_module.unescape(fragment).strip()
+    return BeautifulSoup(fragment, "lxml" if lxml_html is not None else "html.parser").get_text(" ", strip=True)
+
+def _iter_json_ld(html):
+    """Objetos JSON-LD da página (achatando listas e @graph)"""
+    for match in JSON_LD_SCRIPT.finditer(html):
         try:
-            val = float(match.group(1).replace(".", "").replace(",", "."))
-            if val < 10000:
-                val *= 1000
-            
-            result["min"] = int(val * 0.8)  # Estimar faixa
-            result["max"] = int(val * 1.2)
-            result["disclosed"] = True
+            data = json.loads(match.group(1).strip())
         except ValueError:
-            pass
+            continue
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                yield item
+                if "@graph" in item:
+                    stack.append(item["@graph"])
+
+def _is_job_posting(item):
+    kind = item.get("@type") or item.get("type")
+    kinds = kind if isinstance(kind, list) else [kind]
+    return "JobPosting" in kinds
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def _to_number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(".", "").replace(",", ".")) if "," in str(value) else float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _salary_from_schema(base_salary):
+    """baseSalary (MonetaryAmount) no formato de ``extract_salary_intelligently`` (valores mensais)"""
+    base_salary = _first(base_salary)
+    if not isinstance(base_salary, dict):
+        return None
+    value = base_salary.get("value")
+    if isinstance(value, dict):
+        low = _to_number(value.get("minValue", value.get("value")))
+        high = _to_number(value.get("maxValue", value.get("value")))
+        unit = str(value.get("unitText") or base_salary.get("unitText") or "MONTH").upper()
+    else:
+        low = high = _to_number(value)
+        unit = str(base_salary.get("unitText") or "MONTH").upper()
+    if low is None and high is None:
+        return None
+    factor = SALARIO_MENSAL_POR_UNIDADE.get(unit, 1)
+    low, high = low if low is not None else high, high if high is not None else low
+    return {
+        "min": int(low * factor),
+        "max": int(high * factor),
+        "currency": (base_salary.get("currency") or "BRL").upper(),
+        "disclosed": True,
+        "type": "CLT"
+    }
+
+def parse_job_posting(item):
+    """Campos do pipeline a partir de um objeto JobPosting (só os que estiverem presentes)"""
+    result = {}
+    if item.get("title"):
+        result["cargo"] = _html_to_text(str(item["title"]))
+    organization = _first(item.get("hiringOrganization"))
+    if isinstance(organization, dict) and organization.get("name"):
+        result["empresa"] = str(organization["name"]).strip()
+    elif isinstance(organization, str) and organization.strip():
+        result["empresa"] = organization.strip()
+    if item.get("description"):
+        result["descricao"] = _html_to_text(str(item["description"]))
+    if re.match(r"\d{4}-\d{2}-\d{2}", str(item.get("datePosted") or "")):
+        result["data_publicacao"] = str(item["datePosted"])[:10]
+    
+    location = _first(item.get("jobLocation"))
+    address = location.get("address") if isinstance(location, dict) else None
+    address = _first(address)
+    if isinstance(address, dict):
+        country = str(_first(address.get("addressCountry")) or "")
+        if isinstance(_first(address.get("addressCountry")), dict):
+            country = _first(address.get("addressCountry")).get("name", "")
+        if not country or fold_text(country) in ("br", "bra", "brasil", "brazil"):
+            if address.get("addressLocality"):
+                result["cidade"] = str(address["addressLocality"]).strip()
+            region = str(address.get("addressRegion") or "").strip()
+            if region.upper() in UF_NOMES:
+                result["uf"] = region.upper()
+            elif region:
+                result["uf"] = next((uf for uf, name in UF_NOMES.items() if fold_text(name) == fold_text(region)), None)
+    
+    location_type = str(_first(item.get("jobLocationType")) or "").upper()
+    if location_type == "TELECOMMUTE":
+        result["modalidade"] = "remote"
     
+    salary = _salary_from_schema(item.get("baseSalary"))
+    if salary:
+        result["salario"] = salary
+    employment = _first(item.get("employmentType"))
+    if employment and str(employment).upper() in CONTRATOS_SCHEMA:
+        result["contrato"] = CONTRATOS_SCHEMA[str(employment).upper()]
     return result
 
-def scrape_job_details(url, session):
-    """Scraping inteligente com detecção automática de conteúdo"""
+def _microdata_job_posting(html):
+    """JobPosting em microdata (itemprop), convertido para o mesmo formato do JSON-LD"""
+    if "schema.org/JobPosting" not in html or lxml_html is None:
+        return None
+    tree = lxml_html.document_fromstring(html)
+    scopes = tree.xpath('//*[@itemscope][contains(@itemtype, "schema.org/JobPosting")]')
+    if not scopes:
+        return None
+    
+    def props(scope):
+        item = {}
+        for node in scope.xpath('.//*[@itemprop]'):
+            # Só propriedades deste escopo (não de itens aninhados)
+            parent = node.getparent()
+            while parent is not None and parent is not scope and parent.get("itemscope") is None:
+                parent = parent.getparent()
+            if parent is not scope:
+                continue
+            name = node.get("itemprop")
+            if node.get("itemscope") is not None:
+                item[name] = props(node)
+            else:
+                item[name] = node.get("content") or node.get("datetime") or node.text_content().strip()
+        return item
+    
+    item = props(scopes[0])
+    item["@type"] = "JobPosting"
+    return item
+
+# Registro de extratores por domínio: cada um recebe o JobPosting bruto e devolve os campos
+STRUCTURED_EXTRACTORS = {}
+
+def register_extractor(*domains):
+    """Decorador: associa um extrator de JobPosting a um ou mais domínios (e subdomínios)"""
+    def decorator(func):
+        for domain in domains:
+            STRUCTURED_EXTRACTORS[domain] = func
+        return func
+    return decorator
+
+def get_structured_extractor(url):
+    host = get_domain(url)
+    while host:
+        if host in STRUCTURED_EXTRACTORS:
+            return STRUCTURED_EXTRACTORS[host]
+        host = host.partition(".")[2]
+    return parse_job_posting
+
+@register_extractor("linkedin.com")
+def _linkedin_job_posting(item):
+    # LinkedIn escapa o HTML da descrição duas vezes (&amp;lt;p&amp;gt;)
+    if isinstance(item.get("description"), str):
+        item = dict(item, description=html_module.unescape(item["description"]))
+    return parse_job_posting(item)
+
+@register_extractor("gupy.io", "gupy.com.br", "vagas.com.br", "br.indeed.com", "indeed.com", "glassdoor.com.br", "glassdoor.com")
+def _standard_job_posting(item):
+    return parse_job_posting(item)
+
+def extract_structured_job(url, html):
+    """Campos do JobPosting embutido na página (JSON-LD primeiro, microdata como reserva)"""
+    posting = next((item for item in _iter_json_ld(html) if _is_job_posting(item)), None)
+    if posting is None:
+        posting = _microdata_job_posting(html)
+    if posting is None:
+        return None
     try:
-        time.sleep(DELAY_ENTRE_REQUISICOES)
-        
-        for tentativa in range(MAX_RETRIES):
+        return get_structured_extractor(url)(posting) or None
+    except Exception as e:
+        logger.debug(f"JobPosting inválido em {url}: {e}")
+        return None
+
+def _extract_main_text(res, html, charset):
+    """Texto principal via backend configurado (heurística de densidade de texto)"""
+    backend = html_parser_backend()
+    if backend == "lxml":
+        tree = lxml_html.document_fromstring(res.content, parser=lxml_html.HTMLParser(encoding=charset))
+        root = tree.find("body") if tree.find("body") is not None else tree
+        descricao, full_text = find_main_content(root, _lxml_children, _lxml_info)
+    elif backend == "selectolax":
+        tree = SelectolaxParser(html)
+        root = tree.body or tree.root
+        descricao, full_text = find_main_content(root, _selectolax_children, _selectolax_info) if root else ("", "")
+    else:
+        return _extract_with_beautifulsoup(html)
+    
+    return descricao or full_text[:2000]  # Fallback para todo o texto
+
+def extract_job_page(url, res):
+    """Descrição + campos estruturados (JSON-LD/microdata) da página da vaga.
+
+    Retorna ``(descricao, structured)``; ``structured`` é None quando a página não
+    traz um ``JobPosting``. Se o JSON-LD tiver a descrição, a heurística de HTML
+    nem roda.
+    """
+    with METRICS.timer("eleva_parse_seconds"):
+        return _extract_job_page(url, res)
+
+def _extract_job_page(url, res):
+    html, charset = decode_html(res)
+    structured = extract_structured_job(url, html)
+    if structured and structured.get("descricao"):
+        return structured["descricao"], structured
+    return _extract_main_text(res, html, charset), structured
+
+def truncate_description(descricao):
+    """Versão armazenada (e analisada pelo NLP) da descrição"""
+    return descricao[:2500] + "..." if len(descricao) > 2500 else descricao
+
+def analyze_job_description(descricao, doc=None, structured=None):
+    """Cidade, modalidade e salário a partir da descrição (``doc``: parse spaCy já pronto).
+
+    Campos vindos de ``structured`` (JSON-LD) têm prioridade e dispensam as etapas
+    caras correspondentes: NER/geocodificação para a cidade e regex para o salário.
+    Todas as heurísticas leem a mesma versão truncada que é gravada e passa pelo
+    spaCy, então os campos derivados podem ser refeitos a partir do registro salvo.
+    """
+    structured = structured or {}
+    descricao = truncate_description(descricao)
+    
+    # 1. Extrair cidade (dados estruturados primeiro, ontologia dinâmica como reserva)
+    if structured.get("cidade"):
+        city = structured["cidade"]
+        location = GAZETTEER.lookup(city)
+        uf = structured.get("uf") or (location.uf if location else None)
+    else:
+        city, location = ONTOLOGY.extract_cities_from_text(descricao, doc=doc)
+        uf = location.uf if location else None
+    
+    # 2. Detectar modalidade (jobLocationType=TELECOMMUTE já resolve)
+    features = TEXT_FEATURES.scan(descricao)
+    modalidade = structured.get("modalidade") or features["work_model"] or "Não informado"
+    
+    # 3. Extrair salário (baseSalary estruturado ou padrões no texto)
+    salary_info = structured.get("salario") or extract_salary_intelligently(descricao, features)
+    if structured.get("contrato"):
+        salary_info["type"] = structured["contrato"]
+    
+    details = {
+        "descricao_completa": descricao,
+        "salario": salary_info,
+        "modalidade": modalidade,
+        "cidade": city,
+        "estado": uf or "SP",
+        "features": features
+    }
+    # Campos que só existem nos dados estruturados
+    for field in ("cargo", "empresa", "data_publicacao"):
+        if structured.get(field):
+            details[field] = structured[field]
+    return details
+
+def build_job_record(link, title, details, data_publicacao, doc=None, labels=None):
+    """Enriquece os detalhes de uma vaga com skills, senioridade e área
+
+    ``labels``: ``(senioridade, área)`` já classificados em lote; sem isso, a vaga
+    é classificada sozinha (um encode para os dois rótulos).
+    """
+    # Heurísticas de texto numa única varredura, compartilhada com a extração de skills
+    features = details.get("features") or TEXT_FEATURES.scan(details["descricao_completa"])
+    
+    # Extrair skills usando ontologia dinâmica (reaproveitando o parse spaCy, se houver)
+    skills = ONTOLOGY.extract_skills_intelligently(details["descricao_completa"], doc=doc, features=features)
+    
+    # Título e empresa do JSON-LD, quando houver, são mais limpos que o título do SERP
+    title = details.get("cargo") or title
+    
+    # Detectar senioridade e área usando IA (mesmo contexto, mesmo embedding)
+    seniority_level, area = labels or detect_seniority_and_area_batch([(details["descricao_completa"], title)])[0]
+    
+    # Montar registro completo
+    return {
+        "cargo": title.strip()[:100],
+        "empresa": details.get("empresa") or "Não informado",
+        "salario_info": details["salario"],
+        "modalidade": details["modalidade"],
+        "data_publicacao": details.get("data_publicacao") or data_publicacao,
+        "cidade": details["cidade"],
+        "estado": details["estado"],
+        "pais": "Brasil",
+        "source_url": link[:255],
+        "descricao_completa": details["descricao_completa"],
+        "skills_required": skills,
+        "seniority_level": seniority_level,
+        "area": area,
+        "experience_years_min": features["experience_years_min"],
+        "quality_score": len(skills) * 0.1 + (1 if details["salario"]["disclosed"] else 0) * 0.3
+    }
+
+def parse_fetched_jobs(fetched):
+    """Estágio de parse: ``(link, título, resposta)`` → ``(link, título, falhou, descrição, estruturados)``.
+
+    A descrição vem como exceção quando o HTML não pôde ser processado.
+    """
+    for link, title, res in fetched:
+        if res is None:
+            yield link, title, True, None, None  # Download falhou: nada a extrair
+            continue
+        try:
+            descricao, structured = extract_job_page(link, res)
+        except Exception as e:
+            descricao, structured = e, None
+        yield link, title, False, descricao, structured
+
+def enrich_parsed_jobs(parsed, data_publicacao):
+    """Estágio de enriquecimento: um único parse spaCy por vaga, em lotes via ``nlp.pipe``.
+
+    Cada descrição é analisada uma vez só (apenas NER) e o mesmo ``Doc`` alimenta a
+    extração de skills e de cidades. Gera ``(link, job_record)`` — ``job_record`` é
+    None quando o download/parse falhou ou o enriquecimento falha; nesses casos
+    nenhum registro de aviso ("Erro ao coletar…") é montado nem passa pelo spaCy.
+    
+    As vagas são agrupadas em lotes de ``NLP_BATCH_SIZE`` antes do ``nlp.pipe``:
+    assim o histograma do spaCy mede só o processamento, e não a espera pela fila
+    de downloads.
+    """
+    parsed = iter(parsed)
+    while True:
+        chunk = list(itertools.islice(parsed, NLP_BATCH_SIZE))
+        if not chunk:
+            return
+        yield from _enrich_chunk(chunk, data_publicacao)
+
+def _enrich_chunk(chunk, data_publicacao):
+    valid = []
+    for link, title, failed, descricao, structured in chunk:
+        if failed or isinstance(descricao, Exception):
+            logger.error(f"❌ Vaga descartada, sem descrição válida: {link} ({descricao if not failed else 'download falhou'})")
+            yield link, None
+            continue
+        valid.append((truncate_description(descricao), (link, title, descricao, structured)))
+    
+    analyzed = []
+    for doc, (link, title, payload, structured) in METRICS.time_iter("eleva_spacy_seconds", nlp.pipe(valid, as_tuples=True, batch_size=NLP_BATCH_SIZE, n_process=NLP_N_PROCESS)):
+        try:
+            analyzed.append((link, title, doc, analyze_job_description(payload, doc=doc, structured=structured)))
+        except Exception as e:
+            logger.error(f"❌ Erro ao enriquecer vaga {link}: {e}")
+            yield link, None
+    
+    # Senioridade e área do lote inteiro com um único encode
+    try:
+        labels = detect_seniority_and_area_batch([(details["descricao_completa"], details.get("cargo") or title) for _, title, _, details in analyzed])
+    except Exception as e:
+        logger.error(f"❌ Erro ao classificar senioridade/área do lote: {e}")
+        labels = [None] * len(analyzed)
+    for (link, title, doc, details), job_labels in zip(analyzed, labels):
+        try:
+            yield link, build_job_record(link, title, details, data_publicacao, doc=doc, labels=job_labels)
+        except Exception as e:
+            logger.error(f"❌ Erro ao enriquecer vaga {link}: {e}")
+            yield link, None
+
+# ⚙️ PROCESSOS DE ENRIQUECIMENTO
+def _init_enrichment_worker(torch_threads, workers):
+    """Inicializa um processo: modelos carregados uma vez, threads do torch limitadas"""
+    global NLP_N_PROCESS, EMBEDDING_THREADS
+    NLP_N_PROCESS = 1  # O paralelismo já vem dos processos
+    EMBEDDING_THREADS = torch_threads  # Aplicado ao carregar o encoder (torch ou ONNX)
+    GEOCODER.min_delay = workers
+    warm_up_models()
+
+def _enrichment_counts():
+    """Contadores do geocodificador e do cache de embeddings deste processo (só dos já carregados)"""
+    counts = {}
+    if GEOCODER.loaded:
+        counts.update({f"geocode_{k}": v for k, v in GEOCODER.stats().items()})
+    if EMBEDDING_MODEL.loaded:
+        stats = EMBEDDING_MODEL.stats()
+        counts.update({f"embeddings_{k}": stats[k] for k in ("hits", "disk_hits", "misses", "encode_seconds")})
+    return counts
+
+def _enrich_batch(batch, data_publicacao, embed):
+    """Roda num processo do pool: ``[(link, título, falhou, descrição, estruturados)]`` →
+    ``([(link, job_record, linha_para_o_banco)], delta de METRICS, delta dos contadores)``
+
+    As métricas do processo filho não chegam sozinhas ao ``/metrics`` do pai: o delta
+    do lote volta junto com as linhas e é somado lá.
+    """
+    metrics_before = METRICS.snapshot()
+    counts_before = _enrichment_counts()
+    results = []
+    for link, job_record in enrich_parsed_jobs(batch, data_publicacao):
+        row = None
+        if job_record is not None and embed:
             try:
-                res = session.get(url, timeout=15)
-                if res.status_code == 200:
-                    break
-                logger.warning(f"Tentativa {tentativa+1} falhou com status {res.status_code} para {url}")
-                time.sleep(RETRY_DELAY * (tentativa + 1))
+                row = process_job_for_lovable(job_record)
             except Exception as e:
-                logger.warning(f"Tentativa {tentativa+1} falhou para {url}: {e}")
-                time.sleep(RETRY_DELAY * (tentativa + 1))
-        else:
-            logger.error(f"❌ Todas as tentativas falharam para {url}")
-            return {
-                "descricao_completa": f"Erro ao coletar detalhes da vaga em {url}",
-                "salario": "Não informado",
-                "modalidade": "Não informado",
-                "cidade": "São Paulo",
-                "estado": "SP"
-            }
+                logger.error(f"❌ Erro ao preparar vaga inteligente '{job_record.get('cargo', 'Sem título')[:30]}...': {e}")
+        results.append((link, job_record, row))
+    counts = {k: v - counts_before.get(k, 0) for k, v in _enrichment_counts().items()}
+    return results, METRICS.delta(metrics_before), counts
+
+class EnrichmentExecutor:
+    """Pool de processos para spaCy + embeddings, fora do GIL do processo principal.
+
+    Cada processo carrega ``nlp`` e ``EMBEDDING_MODEL`` uma única vez e recebe lotes de
+    vagas já parseadas. Com ``spawn`` nenhum estado do torch é herdado por fork, e o
+    número de threads do torch por processo é limitado para não disputar núcleos.
+    """
+
+    def __init__(self, workers=ENRICH_WORKERS, torch_threads=TORCH_THREADS_POR_WORKER, batch_size=ENRICH_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // self.workers)
+        self.batch_size = max(1, batch_size)
+        self.counts = {}  # Contadores somados dos processos (geocode_*, embeddings_*)
+        self._pool = None
+
+    def __enter__(self):
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_enrichment_worker,
+            initargs=(self.torch_threads, self.workers)
+        )
+        logger.info(f"⚙️ Enriquecimento em {self.workers} processos ({self.torch_threads} threads do torch cada)")
+        return self
+
+    def __exit__(self, *exc):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    def _submit(self, batch, data_publicacao, embed):
+        # Exceções de parsers nativos nem sempre são serializáveis: enviar só a mensagem
+        batch = [(link, title, failed, RuntimeError(str(d)) if isinstance(d, Exception) else d, structured)
+                 for link, title, failed, d, structured in batch]
+        return self._pool.submit(_enrich_batch, batch, data_publicacao, embed)
+
+    def _collect(self, future):
+        results, metrics_delta, counts = future.result()
+        METRICS.merge(metrics_delta)
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+        return results
+
+    def map(self, parsed, data_publicacao, embed=True):
+        """Gera ``(link, job_record, linha)`` na ordem de entrada, com no máximo 2 lotes por processo em voo"""
+        pending = []
+        batch = []
+        for item in parsed:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                pending.append(self._submit(batch, data_publicacao, embed))
+                batch = []
+            while len(pending) >= self.workers * 2:
+                yield from self._collect(pending.pop(0))
+        if batch:
+            pending.append(self._submit(batch, data_publicacao, embed))
+        for future in pending:
+            yield from self._collect(future)
+
+# 🔎 Cliente SerpAPI (fan-out paralelo, paginação, cache diário e controle de cota)
+class SerpApiClient:
+    """Cliente do SerpAPI com sessão HTTP compartilhada e cache em disco.
+
+    As buscas de cada fonte rodam em paralelo e seguem a paginação até acabar o
+    orçamento por fonte (``max_pages_per_source``) ou o global da execução
+    (``max_requests``). Respostas são gravadas em ``cache_dir/<data>/<sha1>.json``
+    com chave (query, página, data), então reexecuções no mesmo dia não gastam cota.
+    """
+
+    ENDPOINT = SERPAPI_URL
+    PAGE_SIZE = 20
+
+    def __init__(self, api_key, cache_dir=SERPAPI_CACHE_DIR, max_pages_per_source=SERPAPI_MAX_PAGINAS_POR_FONTE,
+                 max_requests=SERPAPI_MAX_REQUISICOES, max_workers=SERPAPI_CONCURRENCY, session=None):
+        self.api_key = api_key
+        self.cache_dir = cache_dir
+        self.max_pages_per_source = max_pages_per_source
+        self.max_requests = max_requests
+        self.max_workers = max_workers
+        self.requests_made = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self._lock = threading.Lock()
         
-        soup = BeautifulSoup(res.text, "html.parser")
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(
+                max_retries=3, pool_connections=max_workers, pool_maxsize=max_workers
+            ))
+        self.session = session
+
+    def _cache_path(self, query, start):
+        day = datetime.now().strftime("%Y-%m-%d")
+        key = hashlib.sha1(json.dumps([query, start, self.PAGE_SIZE], ensure_ascii=False).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, day, f"{key}.json")
+
+    def _read_cache(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, path, data):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Falha ao gravar cache do SerpAPI: {e}")
+
+    def _reserve_request(self):
+        with self._lock:
+            if self.requests_made >= self.max_requests:
+                return False
+            self.requests_made += 1
+            return True
+
+    def search_page(self, query, start=0):
+        """Uma página de resultados (cache do dia primeiro, depois a API)"""
+        path = self._cache_path(query, start) if self.cache_dir else None
+        if path:
+            cached = self._read_cache(path)
+            if cached is not None:
+                with self._lock:
+                    self.cache_hits += 1
+                METRICS.inc("eleva_serpapi_requests_total", result="cache")
+                return cached
         
-        # Estratégia Beamery: identificar conteúdo principal automaticamente
-        descricao = ""
-        main_content_selectors = [
-            "div.description", "div.job-description", "div.vacancy-description", "article",
-            "section.description", "div.job-details", "div.content", "main"
-        ]
+        if not self._reserve_request():
+            logger.warning(f"⚠️ Orçamento de {self.max_requests} buscas SerpAPI esgotado nesta execução")
+            METRICS.inc("eleva_serpapi_requests_total", result="sem_cota")
+            return None
         
-        for selector in main_content_selectors:
-            elements = soup.select(selector)
-            if elements:
-                descricao = "\n".join([elem.get_text(strip=True) for elem in elements])
-                if len(descricao) > 200:  # Conteúdo significativo
-                    break
+        params = {"q": query, "hl": "pt-BR", "num": self.PAGE_SIZE, "start": start, "api_key": self.api_key}
+        with METRICS.timer("eleva_serpapi_request_seconds"):
+            res = self.session.get(self.ENDPOINT, params=params, timeout=20)
+            data = res.json()
+        METRICS.inc("eleva_serpapi_requests_total", result="erro" if "error" in data else "api")
+        if "error" in data:
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"⚠️ SerpAPI retornou erro para '{query}': {data['error']}")
+        elif path:
+            self._write_cache(path, data)
+        return data
+
+    def search(self, query):
+        """Todas as páginas de uma fonte, respeitando os orçamentos; retorna a lista de páginas
+
+        Um erro numa página encerra a paginação, mas as páginas anteriores (já
+        pagas) continuam valendo.
+        """
+        pages = []
+        for page in range(self.max_pages_per_source):
+            try:
+                data = self.search_page(query, start=page * self.PAGE_SIZE)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                METRICS.inc("eleva_serpapi_requests_total", result="erro")
+                logger.error(f"❌ Erro na busca do Google/SerpAPI para {query} (página {page + 1}): {e}; mantendo {len(pages)} páginas")
+                break
+            if not data or not data.get("organic_results"):
+                break
+            pages.append(data["organic_results"])
+            # Sem próxima página ou página incompleta: fim dos resultados
+            if "next" not in data.get("serpapi_pagination", {}) or len(data["organic_results"]) < self.PAGE_SIZE:
+                break
+        return pages
+
+    def search_many(self, queries):
+        """Busca várias fontes em paralelo; gera ``(query, páginas)`` na ordem de entrada"""
+        def safe_search(query):
+            try:
+                return self.search(query)
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                logger.error(f"❌ Erro na busca do Google/SerpAPI para {query}: {e}")
+                return []
         
-        if not descricao:
-            descricao = soup.get_text(strip=True)[:2000]  # Fallback para todo o texto
-        
-        # 1. Extrair cidade usando a ontologia dinâmica
-        city, location = ONTOLOGY.extract_cities_from_text(descricao)
-        
-        # 2. Detectar modalidade usando NLP
-        modalidade = "Não informado"
-        if "remoto" in descricao.lower() or "remote" in descricao.lower() or "home office" in descricao.lower():
-            modalidade = "remote"
-        elif "presencial" in descricao.lower() or "on-site" in descricao.lower() or "escritório" in descricao.lower():
-            modalidade = "onsite"
-        elif "híbrido" in descricao.lower() or "hibrido" in descricao.lower() or "hybrid" in descricao.lower():
-            modalidade = "hybrid"
-        
-        # 3. Extrair salário usando IA
-        salary_info = extract_salary_intelligently(descricao)
-        
-        return {
-            "descricao_completa": descricao[:2500] + "..." if len(descricao) > 2500 else descricao,
-            "salario": salary_info,
-            "modalidade": modalidade,
-            "cidade": city,
-            "estado": location.address.split(",")[-2].strip() if location and location.address else "SP"
-        }
-    
-    except Exception as e:
-        logger.error(f"❌ Erro ao coletar detalhes da vaga {url}: {e}")
-        return {
-            "descricao_completa": f"Erro durante a coleta: {str(e)}",
-            "salario": {"min": None, "max": None, "currency": "BRL", "disclosed": False, "type": "CLT"},
-            "modalidade": "Não informado",
-            "cidade": "São Paulo",
-            "estado": "SP"
-        }
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = [(query, executor.submit(safe_search, query)) for query in queries]
+            try:
+                for query, future in futures:
+                    yield query, future.result()
+            finally:
+                # Consumidor parou (ex.: limite de vagas): não gastar cota com o resto
+                for _, future in futures:
+                    future.cancel()
 
-def scrape_google_jobs(query_base, days_back=1):
-    """Coleta inteligente com detecção automática de relevância"""
-    all_jobs = []
-    yesterday = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
-    
-    session = get_proxy_session()
-    
-    logger.info("🌍 INICIANDO COLETA INTELIGENTE COM IA AUTONOMA")
-    logger.info(f"🔍 Fontes configuradas: {len(SOURCES_BRASIL)} sites")
-    
-    for source_query in SOURCES_BRASIL:
-        if len(all_jobs) >= MAX_VAGAS_TOTAIS:
-            logger.info(f"🎯 Limite total de {MAX_VAGAS_TOTAIS} vagas atingido")
-            break
+    def stats(self):
+        """Consumo de cota da execução atual"""
+        with self._lock:
+            return {
+                "requests": self.requests_made,
+                "cache_hits": self.cache_hits,
+                "errors": self.errors,
+                "budget_remaining": max(self.max_requests - self.requests_made, 0)
+            }
+
+# 🏭 PIPELINE EM ESTÁGIOS (busca → download → parse → enriquecimento → embeddings → gravação)
+_STOP = object()  # Sentinela de fim de fluxo entre estágios
+
+class ScrapePipeline:
+    """Coleta em fluxo contínuo, com filas limitadas entre os estágios.
+
+    Cada estágio roda em suas próprias threads (a concorrência é configurável por
+    estágio) e conversa com o próximo por uma ``queue.Queue(maxsize)``: quando um
+    estágio lento enche a fila, os anteriores bloqueiam (backpressure), então a
+    memória não cresce com ``max_jobs``. A thread chamadora é o consumidor final:
+    grava em lotes pequenos (por tamanho ou por tempo) ou, com ``collect=True``,
+    apenas devolve os registros enriquecidos.
+
+    Com ``replay_date`` ("latest" ou "AAAA-MM-DD") nada sai para a rede: SERP e
+    páginas vêm do arquivo de respostas, sem cota, politeness nem estado incremental.
+    """
+
+    def __init__(self, query_base, days_back=1, replay_date=None, sources=None, max_jobs=MAX_VAGAS_TOTAIS,
+                 collect=False, client=None, queue_size=PIPELINE_QUEUE_SIZE, fetch_workers=MAX_FETCH_CONCURRENCY,
+                 parse_workers=PIPELINE_PARSE_WORKERS, enrich_workers=ENRICH_WORKERS, batch_size=SUPABASE_BATCH_SIZE,
+                 flush_seconds=PIPELINE_FLUSH_SECONDS):
+        self.query_base = query_base
+        self.days_back = days_back
+        self.replay_date = replay_date
+        self.sources = sources or SOURCES_BRASIL
+        self.max_jobs = max_jobs
+        self.collect = collect
+        self.client = client
+        self.queue_size = queue_size
+        self.fetch_workers = max(1, fetch_workers)
+        self.parse_workers = max(1, parse_workers)
+        self.enrich_workers = max(1, enrich_workers)
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
         
-        search_query = f'{query_base} {source_query} after:{yesterday}'
-        logger.info(f"🔍 Buscando no Google (via SerpAPI): {search_query}")
+        self._lock = threading.Lock()
+        self.counters = {
+            "searched": 0, "queued": 0, "duplicates": 0, "fetched": 0, "failed": 0, "circuit_skipped": 0,
+            "unchanged": 0, "parsed": 0, "enriched": 0, "embedded": 0, "saved": 0, "errors": 0
+        }
+        self.failed = []  # Registros de falha: {"url", "title", "reason"} (fora do NLP e do banco)
+        self._crawl_pending = {}  # link → validadores HTTP/hash, gravados só depois do upsert
+        self._links_by_id = {}  # external_id → link baixado
+        self._duplicate_links = {}  # URL canônica de uma cópia pulada → (link, título), para fallback
+        self.worker_counts = {}  # Geocodificação/cache de embeddings nos processos do pool (ENRICH_WORKERS > 1)
+        self.skills_count = 0
+        self.cities = set()
+        self.areas = set()
+        self.results = []
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        """Cópia consistente dos contadores por estágio (para acompanhar a execução)"""
+        with self._lock:
+            return {
+                **self.counters,
+                "skills": self.skills_count,
+                "cities": len(self.cities),
+                "areas": len(self.areas)
+            }
+
+    def _setup(self):
+        reference_date = datetime.now()
+        if self.replay_date:
+            # As queries do SERP embutem a data: reconstruí-las como no dia arquivado
+            archived_day = ARCHIVE.latest_date() if self.replay_date == "latest" else self.replay_date
+            if archived_day:
+                reference_date = datetime.strptime(archived_day, "%Y-%m-%d")
+        self.yesterday = (reference_date - timedelta(days=self.days_back)).strftime("%Y-%m-%d")
         
-        try:
-            url = f"https://serpapi.com/search.json?q={urllib.parse.quote(search_query)}&hl=pt-BR&num=20&api_key={SERPAPI_KEY}"
-            res = requests.get(url, timeout=20)
-            data = res.json()
+        if self.replay_date:
+            self.session = ReplaySession(ARCHIVE, self.replay_date)
+            self.serpapi = SerpApiClient(SERPAPI_KEY, cache_dir=None, session=self.session)
+            self.limiter, self.max_retries, self.crawl_state = DomainRateLimiter(min_interval=0), 1, None
+            self.dedup = None
+            self.breaker = None
+            logger.info(f"📼 MODO REPLAY: respostas do arquivo {ARCHIVE.root} ({self.replay_date})")
+        else:
+            require_env(SERPAPI_KEY=SERPAPI_KEY)
+            self.session = get_proxy_session()
+            serp_session = None
+            if ARCHIVE.enabled:
+                ARCHIVE.prune()
+                self.session = ArchivingSession(self.session, ARCHIVE)
+                serp_session = ArchivingSession(requests.Session(), ARCHIVE)
+            self.serpapi = SerpApiClient(SERPAPI_KEY, session=serp_session)
+            self.limiter, self.max_retries, self.crawl_state = DomainRateLimiter(), MAX_RETRIES, CRAWL_STATE
+            self.breaker = DomainCircuitBreaker()
+            self.dedup = DEDUP_INDEX if DEDUP_INDEX.enabled else None
+            self.run_id = uuid.uuid4().hex
+            if self.dedup:
+                self.dedup.prune()
+
+    # --- Estágios (cada um consome um iterador e gera itens para o próximo) ---
+
+    def _search_stage(self, _):
+        """Busca no SerpAPI e filtra; gera ``(link, título, cabeçalhos condicionais)``"""
+        seen_links = set()
+        queued = 0
+        search_queries = [f'{self.query_base} {source_query} after:{self.yesterday}' for source_query in self.sources]
+        for search_query, pages in self.serpapi.search_many(search_queries):
+            if queued >= self.max_jobs:
+                logger.info(f"🎯 Limite total de {self.max_jobs} vagas atingido")
+                break
             
-            if "organic_results" not in data:
+            self._count("searched")
+            logger.info(f"🔍 Resultados do Google (via SerpAPI): {search_query} ({len(pages)} páginas)")
+            if not pages:
                 logger.warning(f"⚠️ Nenhum resultado para: {search_query}")
                 continue
             
-            # Processar resultados com filtragem inteligente
-            for result in data["organic_results"]:
-                link = result.get("link", "")
-                title = result.get("title", "Vaga sem título")
-                snippet = result.get("snippet", "")
-                
-                # Filtros de segurança
-                if not link or len(link) < 10 or "google.com" in link or "url?" in link:
-                    continue
-                
-                # Filtro geográfico inteligente
-                if not is_vaga_brasil(title + " " + snippet + " " + link):
-                    logger.info(f"🌍 Ignorando vaga internacional (IA): {title[:50]}...")
+            # Processar resultados com filtragem inteligente (página inteira em lote)
+            for organic_results in pages:
+                for link, title, snippet in filter_serp_results(organic_results, self.query_base):
+                    if link in seen_links or queued >= self.max_jobs:
+                        continue
+                    seen_links.add(link)
+                    
+                    # Mesma vaga em outra fonte (ou repost): não baixar nem gastar o limite
+                    canonical = self.dedup.check(link, title, snippet, run_id=self.run_id) if self.dedup else None
+                    if canonical:
+                        self._count("duplicates")
+                        with self._lock:
+                            self._duplicate_links[canonicalize_url(link)] = (link, title)
+                        logger.info(f"🧬 Vaga duplicada de {canonical}: {title[:50]}...")
+                        continue
+                    
+                    # Estado incremental: pular URLs coletadas recentemente
+                    should_fetch, conditional_headers = self.crawl_state.plan(link) if self.crawl_state else (True, {})
+                    if not should_fetch:
+                        continue
+                    queued += 1
+                    self._count("queued")
+                    yield link, title, conditional_headers or None
+        
+        quota = self.serpapi.stats()
+        logger.info(f"📊 Cota SerpAPI nesta execução: {quota['requests']} buscas, {quota['cache_hits']} do cache, {quota['errors']} erros")
+
+    def _record_failed(self, link, title, reason, counter="failed"):
+        self._count(counter)
+        with self._lock:
+            self.failed.append({"url": link, "title": title, "reason": reason})
+
+    def _fetch_or_fail(self, link, title, headers):
+        host = get_domain(link)
+        permit = self.breaker.allow(host) if self.breaker else None
+        if self.breaker and permit is None:
+            logger.info(f"🔌 Pulando {link}: circuito aberto para {host}")
+            self._record_failed(link, title, f"circuito aberto para {host}", counter="circuit_skipped")
+            return None
+        res = fetch_job_page(link, self.session, self.limiter, headers, self.max_retries, self.breaker, permit)
+        self._count("fetched")
+        if res is None:
+            self._record_failed(link, title, "download falhou")
+        return res
+
+    def _alternate_source(self, link):
+        """Próxima fonte da mesma vaga quando a canônica falha (cópias já puladas na busca)"""
+        alternate = self.dedup.fallback(link) if self.dedup else None
+        if alternate is None:
+            return None
+        with self._lock:
+            return self._duplicate_links.pop(alternate, (alternate, "Vaga sem título"))
+
+    def _fetch_stage(self, items):
+        """Downloads concorrentes, com intervalo mínimo por domínio.
+
+        Domínios com o circuito aberto são pulados sem requisição; downloads que
+        falham viram registros de falha e não seguem para parse/NLP/banco. Se a
+        URL canônica de uma vaga falhar, a próxima fonte da mesma vaga é tentada.
+        """
+        for link, title, headers in items:
+            res = self._fetch_or_fail(link, title, headers)
+            while res is None:
+                alternate = self._alternate_source(link)
+                if alternate is None:
+                    break
+                logger.info(f"🧬 {link} falhou; tentando outra fonte da mesma vaga: {alternate[0]}")
+                link, title = alternate
+                res = self._fetch_or_fail(link, title, None)
+            if res is None:
+                continue
+            if self.crawl_state and not self.crawl_state.is_changed(link, res, self._crawl_pending):
+                self._count("unchanged")  # 304 ou corpo idêntico: sem NLP
+                if self.dedup:
+                    self.dedup.confirm(link)  # Já está no banco desde a última coleta
+                continue
+            yield link, title, res
+
+    def _parse_stage(self, items):
+        for item in parse_fetched_jobs(items):
+            self._count("parsed")
+            yield item
+
+    def _record_enriched(self, job_record, link):
+        # Vaga canônica: todas as URLs onde a mesma vaga foi vista até agora
+        job_record["source_urls"] = self.dedup.sources(job_record["source_url"]) if self.dedup else [job_record["source_url"]]
+        self._count("enriched")
+        with self._lock:
+            self._links_by_id[stable_job_id(job_record["source_url"])] = link
+            self.skills_count += len(job_record["skills_required"])
+            self.cities.add(job_record["cidade"])
+            self.areas.add(job_record["area"])
+        logger.info(f"✅ Coletada vaga inteligente: {job_record['cargo'][:50]}... (Skills: {len(job_record['skills_required'])}, Score: {job_record['quality_score']:.1f}/1.0)")
+
+    def _enrich_stage(self, items):
+        for link, job_record in enrich_parsed_jobs(items, self.yesterday):
+            if job_record is None:
+                self._count("errors")
+                continue
+            self._record_enriched(job_record, link)
+            yield job_record
+
+    def _pooled_enrich_stage(self, items):
+        """Enriquecimento + embeddings num pool de processos (substitui os dois estágios)"""
+        with EnrichmentExecutor(self.enrich_workers) as executor:
+            self.worker_counts = executor.counts
+            for link, job_record, row in executor.map(items, self.yesterday, embed=not self.collect):
+                if job_record is None or (row is None and not self.collect):
+                    self._count("errors")
                     continue
-                
-                # Filtro de relevância usando similaridade semântica
-                query_embedding = EMBEDDING_MODEL.encode([query_base])[0]
-                title_embedding = EMBEDDING_MODEL.encode([title])[0]
-                
-                similarity = np.dot(query_embedding, title_embedding) / (np.linalg.norm(query_embedding) * np.linalg.norm(title_embedding))
-                
-                if similarity < 0.2:
-                    logger.info(f"🔍 Ignorando vaga irrelevante (score: {similarity:.2f}): {title[:50]}...")
+                self._record_enriched(job_record, link)
+                if self.collect:
+                    yield job_record
+                else:
+                    # A linha foi montada no processo filho, antes de o índice de
+                    # duplicatas (que vive aqui) informar as demais fontes da vaga
+                    if "source_urls" in row:
+                        row["source_urls"] = job_record["source_urls"]
+                    self._count("embedded")
+                    yield row
+
+    def _embed_stage(self, records):
+        for job_record in records:
+            try:
+                processed = process_job_for_lovable(job_record)
+            except Exception as e:
+                logger.error(f"❌ Erro ao preparar vaga inteligente '{job_record.get('cargo', 'Sem título')[:30]}...': {e}")
+                self._count("errors")
+                continue
+            self._count("embedded")
+            yield processed
+
+    # --- Infraestrutura de filas e threads ---
+
+    def _iter_queue(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            yield item
+
+    def _start_stage(self, name, handler, in_q, out_q, workers, downstream_workers):
+        """Inicia ``workers`` threads que aplicam ``handler`` à fila de entrada.
+
+        O último worker a terminar envia uma sentinela por worker do estágio seguinte.
+        """
+        remaining = [workers]
+        
+        def worker():
+            items = self._iter_queue(in_q) if in_q is not None else iter(())
+            try:
+                for item in handler(items):
+                    out_q.put(item)
+            except Exception as e:
+                logger.error(f"❌ Falha no estágio '{name}': {e}")
+                self._count("errors")
+                # Drenar a entrada para não travar os estágios anteriores
+                for _ in items:
+                    pass
+            finally:
+                with self._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    for _ in range(downstream_workers):
+                        out_q.put(_STOP)
+        
+        threads = [threading.Thread(target=worker, name=f"pipeline-{name}-{i}", daemon=True) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def _on_saved(self, rows):
+        """Pós-gravação: índices locais e, só agora, o estado incremental e a canônica de cada vaga"""
+        index_saved_rows(rows)
+        with self._lock:
+            links = [self._links_by_id.pop(row["external_id"], None) for row in rows]
+            states = [(link, self._crawl_pending.pop(link, None)) for link in links if link]
+        for link, state in states:
+            if state and self.crawl_state:
+                self.crawl_state.record(link, *state)
+            if self.dedup:
+                self.dedup.confirm(link)
+
+    def _consume(self, q):
+        """Consumidor final: coleta os registros ou grava em lotes por tamanho/tempo"""
+        if self.collect:
+            self.results.extend(self._iter_queue(q))
+            return
+        
+        writer = BatchUpsertWriter(self.client or get_storage_client(), batch_size=self.batch_size, on_saved=self._on_saved)
+        pending = {}
+        first_pending_at = None
+        
+        def flush():
+            saved_before = writer.saved_count
+            writer.write(list(pending.values()))
+            self._count("saved", writer.saved_count - saved_before)
+            pending.clear()
+        
+        while True:
+            timeout = None if first_pending_at is None else max(0.0, first_pending_at + self.flush_seconds - time.monotonic())
+            try:
+                item = q.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                # Mesma URL canônica no mesmo lote quebraria o upsert: manter a última
+                pending[item["external_id"]] = item
+                first_pending_at = first_pending_at or time.monotonic()
+            if pending and (len(pending) >= self.batch_size or time.monotonic() - first_pending_at >= self.flush_seconds):
+                flush()
+                first_pending_at = None
+        if pending:
+            flush()
+        with self._lock:
+            self.counters["errors"] += writer.errors_count
+
+    def run(self):
+        """Executa a coleta completa; retorna os contadores por estágio"""
+        self._setup()
+        logger.info("🌍 INICIANDO COLETA INTELIGENTE COM IA AUTONOMA")
+        logger.info(f"🔍 Fontes configuradas: {len(self.sources)} sites")
+        
+        stages = [
+            ("search", self._search_stage, 1),
+            ("fetch", self._fetch_stage, self.fetch_workers),
+            ("parse", self._parse_stage, self.parse_workers),
+        ]
+        if self.enrich_workers > 1:
+            stages.append(("enrich", self._pooled_enrich_stage, 1))
+        else:
+            stages.append(("enrich", self._enrich_stage, 1))  # spaCy + geocodificação (1 req/s): um worker
+            if not self.collect:
+                stages.append(("embed", self._embed_stage, 1))
+        
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        threads = []
+        for i, (name, handler, workers) in enumerate(stages):
+            downstream = stages[i + 1][2] if i + 1 < len(stages) else 1
+            threads += self._start_stage(name, handler, queues[i - 1] if i else None, queues[i], workers, downstream)
+        
+        self._consume(queues[-1])
+        for thread in threads:
+            thread.join()
+        
+        if self.crawl_state:
+            crawl_stats = self.crawl_state.stats()
+            logger.info(f"♻️ Coleta incremental: {crawl_stats['skipped_recent']} URLs recentes puladas, {crawl_stats['not_modified']} respostas 304, {crawl_stats['unchanged']} páginas sem alteração")
+        logger.info(f"✅ COLETA FINALIZADA: {self.counters['enriched']} vagas INTELIGENTES coletadas, {self.counters['saved']} salvas")
+        if self.failed:
+            circuit = self.breaker.stats() if self.breaker else {"opened": 0, "open_domains": []}
+            logger.warning(f"🔌 {self.counters['failed']} downloads falharam e {self.counters['circuit_skipped']} URLs foram puladas "
+                           f"({circuit['opened']} circuitos abertos: {', '.join(circuit['open_domains']) or 'nenhum'})")
+        return dict(self.counters)
+
+# 🧮 CODIFICAÇÃO COMPACTA DE VETORES (colunas de embedding e shards locais)
+def encode_vector(vector, fmt=EMBEDDING_FORMAT):
+    """Serializa um vetor para a coluna do banco.
+
+    - ``json``: lista JSON de floats (formato legado, ~8 KB para 384 dimensões)
+    - ``pgvector``: literal ``[x,y,...]`` com 6 dígitos significativos (coluna ``vector``)
+    - ``float16``: ``"f16:"`` + base64 dos bytes float16 (~1 KB)
+    - ``int8``: ``"i8:<escala>:"`` + base64 dos bytes int8; valor = int8 × escala (~0,5 KB)
+    """
+    if vector is None:
+        return None
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    if fmt == "json":
+        return json.dumps(vector.tolist())
+    if fmt == "pgvector":
+        return "[" + ",".join(format(float(x), ".6g") for x in vector) + "]"
+    if fmt == "float16":
+        return "f16:" + base64.b64encode(vector.astype("<f2").tobytes()).decode("ascii")
+    if fmt == "int8":
+        peak = float(np.abs(vector).max()) if vector.size else 0.0
+        scale = peak / 127 if peak else 1.0
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return f"i8:{scale:.9g}:" + base64.b64encode(quantized.tobytes()).decode("ascii")
+    raise ValueError(f"EMBEDDING_FORMAT desconhecido: {fmt}")
+
+def decode_vector_bytes(buffer, dtype="<f2"):
+    """Visão NumPy sobre bytes já em memória (ex.: coluna ``bytea``), sem cópia"""
+    return np.frombuffer(buffer, dtype=dtype)
+
+def decode_vector(value, dequantize=True):
+    """Vetor a partir de qualquer formato de ``encode_vector`` (ou lista já decodificada).
+
+    float16/int8 viram uma visão direta sobre os bytes do base64 (sem cópia extra);
+    com ``dequantize=False`` o int8 volta como ``(vetor_int8, escala)``.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return np.asarray(value, dtype=np.float32)
+    if value.startswith("f16:"):
+        return decode_vector_bytes(base64.b64decode(value[4:]), "<f2")
+    if value.startswith("i8:"):
+        _, scale, payload = value.split(":", 2)
+        quantized = decode_vector_bytes(base64.b64decode(payload), np.int8)
+        if not dequantize:
+            return quantized, float(scale)
+        return quantized.astype(np.float32) * np.float32(scale)
+    # json e pgvector compartilham a sintaxe de lista
+    return np.asarray(json.loads(value), dtype=np.float32)
+
+class VectorShardWriter:
+    """Vetores gravados em shards ``.npy`` memory-mapped, com o ID da linha ao lado.
+
+    Cada shard é um ``shard-NNNNN.npy`` pré-alocado com ``rows_per_shard`` linhas
+    (via ``np.lib.format.open_memmap``) e um ``shard-NNNNN.ids`` com um ID por linha;
+    o número de linhas válidas é o de IDs, que só é escrito depois do vetor. Leitores
+    abrem os shards com ``mmap_mode="r"`` (ver ``load_vector_shards``) sem copiar nada.
+    """
+
+    def __init__(self, directory, dim=None, dtype="<f2", rows_per_shard=EMBEDDING_SHARD_ROWS):
+        self.directory = directory
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.rows_per_shard = rows_per_shard
+        self._lock = threading.Lock()
+        self._shard = None
+        self._array = None
+        self._rows = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, shard):
+        base = os.path.join(self.directory, f"shard-{shard:05d}")
+        return base + ".npy", base + ".ids"
+
+    def _open_last(self):
+        shards = sorted(name for name in os.listdir(self.directory) if name.endswith(".npy"))
+        shard = int(shards[-1][6:11]) if shards else 0
+        self._open(shard)
+
+    def _open(self, shard):
+        vectors_path, ids_path = self._paths(shard)
+        if os.path.exists(vectors_path):
+            self._array = np.lib.format.open_memmap(vectors_path, mode="r+")
+            self.dim = self._array.shape[1]
+            with open(ids_path, "r", encoding="utf-8") as f:
+                self._rows = min(sum(1 for _ in f), self._array.shape[0])
+        else:
+            self._array = np.lib.format.open_memmap(vectors_path, mode="w+", dtype=self.dtype, shape=(self.rows_per_shard, self.dim))
+            self._rows = 0
+        self._shard = shard
+
+    def append(self, row_ids, vectors):
+        """Acrescenta vetores ``(n, dim)`` com seus IDs; abre um novo shard quando o atual enche"""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if self._array is None:
+                self._open_last()
+            start = 0
+            while start < len(row_ids):
+                if self._rows >= self._array.shape[0]:
+                    self._array.flush()
+                    self._open(self._shard + 1)
+                take = min(len(row_ids) - start, self._array.shape[0] - self._rows)
+                self._array[self._rows:self._rows + take] = vectors[start:start + take]
+                self._array.flush()
+                _, ids_path = self._paths(self._shard)
+                with open(ids_path, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{row_id}\n" for row_id in row_ids[start:start + take]))
+                self._rows += take
+                start += take
+
+def load_vector_shards(directory):
+    """Gera ``(ids, vetores)`` de cada shard; os vetores são visões memory-mapped (sem cópia)"""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(n for n in os.listdir(directory) if n.endswith(".npy")):
+        vectors = np.load(os.path.join(directory, name), mmap_mode="r")
+        with open(os.path.join(directory, name[:-4] + ".ids"), "r", encoding="utf-8") as f:
+            ids = [line.rstrip("\n") for line in f]
+        rows = min(len(ids), vectors.shape[0])
+        yield ids[:rows], vectors[:rows]
+
+class EmbeddingShards:
+    """Shards de descrição e de skills, alimentados pelas linhas efetivamente gravadas"""
+
+    def __init__(self, directory=EMBEDDING_SHARD_DIR):
+        self.directory = directory
+        self._writers = {}
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def append_rows(self, rows):
+        if not self.enabled:
+            return
+        for column in ("embedding", "skills_embedding"):
+            pairs = [(row["external_id"], decode_vector(row.get(column))) for row in rows if row.get(column)]
+            if not pairs:
+                continue
+            writer = self._writers.get(column)
+            if writer is None:
+                writer = self._writers[column] = VectorShardWriter(os.path.join(self.directory, column))
+            try:
+                writer.append([row_id for row_id, _ in pairs], np.vstack([vector for _, vector in pairs]))
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao gravar vetores no shard local ({column}): {e}")
+
+EMBEDDING_SHARDS = EmbeddingShards()
+
+# 🎯 ÍNDICE VETORIAL LOCAL (top-k para /match)
+MATCH_FILTROS = ("area", "seniority_level", "city", "work_model")
+MATCH_CAMPOS = ("title", "company_name", "city", "state", "work_model", "area", "seniority_level", "source_url")
+
+class VectorIndex:
+    """Índice vetorial em memória, atualizado a cada lote gravado e persistido em disco.
+
+    ``exact`` é o baseline: um produto matriz-vetor sobre todos os vetores (L2
+    normalizados, então o produto é o cosseno). ``ivf`` agrupa os vetores em
+    ``√n`` listas por k-means esférico e, na consulta, só pontua as
+    ``n_probe`` listas mais próximas; as listas são retreinadas quando o índice
+    dobra de tamanho. Filtros (área, senioridade, cidade, modelo de trabalho) usam
+    índices invertidos e restringem as linhas antes da pontuação.
+    """
+
+    MIN_IVF_ROWS = 1000  # Abaixo disso a busca exata já é instantânea
+
+    def __init__(self, directory, mode=VECTOR_INDEX_MODE, n_lists=VECTOR_INDEX_LISTS, n_probe=VECTOR_INDEX_PROBE,
+                 save_interval=VECTOR_INDEX_SAVE_SECONDS):
+        self.directory = directory
+        self.mode = mode
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.save_interval = save_interval
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._vectors = None
+        self._count = 0
+        self._ids = []
+        self._rows = {}
+        self._meta = []
+        self._inverted = {field: {} for field in MATCH_FILTROS}
+        self._centroids = None
+        self._assignments = None
+        self._trained_rows = 0
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def __len__(self):
+        self._ensure_loaded()
+        return self._count
+
+    # --- Persistência ---
+
+    def _paths(self):
+        return (os.path.join(self.directory, "vectors.npy"), os.path.join(self.directory, "meta.json"),
+                os.path.join(self.directory, "centroids.npy"))
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            vectors_path, meta_path, centroids_path = self._paths()
+            if not os.path.exists(meta_path):
+                return
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                vectors = np.load(vectors_path)
+                self._grow(len(meta["ids"]), vectors.shape[1])
+                for row_id, row_meta, vector in zip(meta["ids"], meta["meta"], vectors):
+                    self._put(row_id, vector, row_meta)
+                if os.path.exists(centroids_path) and self.mode == "ivf":
+                    self._set_centroids(np.load(centroids_path), meta.get("trained_rows", self._count))
+                self._dirty = False
+                logger.info(f"✅ Índice vetorial carregado de {self.directory}: {self._count} vagas")
+            except Exception as e:
+                logger.warning(f"⚠️ Índice vetorial em {self.directory} ilegível ({e}); recomeçando vazio")
+                self._reset()
+                self._loaded = True
+
+    def save(self, force=True):
+        """Grava vetores, metadados e centróides (escrita atômica via arquivo temporário)"""
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_save < self.save_interval):
+                return
+            vectors_path, meta_path, centroids_path = self._paths()
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                np.save(vectors_path + ".tmp.npy", self._vectors[:self._count])
+                os.replace(vectors_path + ".tmp.npy", vectors_path)
+                if self._centroids is not None:
+                    np.save(centroids_path + ".tmp.npy", self._centroids)
+                    os.replace(centroids_path + ".tmp.npy", centroids_path)
+                with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump({"ids": self._ids, "meta": self._meta, "trained_rows": self._trained_rows}, f, ensure_ascii=False)
+                os.replace(meta_path + ".tmp", meta_path)
+                self._dirty = False
+                self._last_save = time.monotonic()
+            except OSError as e:
+                logger.warning(f"⚠️ Falha ao salvar índice vetorial: {e}")
+
+    # --- Escrita ---
+
+    def _grow(self, needed, dim):
+        if self._vectors is None:
+            self._vectors = np.zeros((max(1024, needed), dim), dtype=np.float32)
+            self._assignments = np.full(self._vectors.shape[0], -1, dtype=np.int32)
+        elif needed > self._vectors.shape[0]:
+            capacity = max(needed, self._vectors.shape[0] * 2)
+            self._vectors = np.resize(self._vectors, (capacity, dim))
+            self._assignments = np.resize(self._assignments, capacity)
+
+    def _put(self, row_id, vector, meta):
+        row = self._rows.get(row_id)
+        if row is None:
+            row = self._count
+            self._grow(row + 1, len(vector))
+            self._rows[row_id] = row
+            self._ids.append(row_id)
+            self._meta.append(meta)
+            self._count += 1
+        else:
+            for field in MATCH_FILTROS:
+                self._inverted[field].get(fold_text(str(self._meta[row].get(field) or "")), set()).discard(row)
+            self._meta[row] = meta
+        self._vectors[row] = normalize_rows(vector)[0]
+        for field in MATCH_FILTROS:
+            self._inverted[field].setdefault(fold_text(str(meta.get(field) or "")), set()).add(row)
+        if self._centroids is not None:
+            self._assignments[row] = int(np.argmax(self._centroids @ self._vectors[row]))
+
+    def add(self, row_ids, vectors, metas):
+        """Insere (ou atualiza, pelo ID) vetores com seus metadados"""
+        self._ensure_loaded()
+        with self._lock:
+            for row_id, vector, meta in zip(row_ids, vectors, metas):
+                self._put(row_id, np.asarray(vector, dtype=np.float32), meta)
+            self._dirty = True
+            if self.mode == "ivf" and self._count >= self.MIN_IVF_ROWS and self._count >= 2 * self._trained_rows:
+                self.train()
+        self.save(force=False)
+
+    # --- IVF ---
+
+    def _set_centroids(self, centroids, trained_rows):
+        self._centroids = normalize_rows(centroids)
+        self._trained_rows = trained_rows
+        for start in range(0, self._count, 65536):
+            chunk = self._vectors[start:min(self._count, start + 65536)]
+            self._assignments[start:start + len(chunk)] = np.argmax(chunk @ self._centroids.T, axis=1)
+
+    def train(self, iterations=10):
+        """k-means esférico sobre os vetores atuais; redistribui todas as linhas nas listas"""
+        with self._lock:
+            n_lists = self.n_lists or int(math.sqrt(self._count))
+            n_lists = max(1, min(n_lists, self._count))
+            rng = np.random.default_rng(0)
+            vectors = self._vectors[:self._count]
+            sample = vectors[rng.choice(self._count, size=min(self._count, n_lists * 64), replace=False)]
+            centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for k in range(n_lists):
+                    members = sample[labels == k]
+                    if len(members):
+                        centroids[k] = members.mean(axis=0)
+                centroids = normalize_rows(centroids)
+            self._set_centroids(centroids, self._count)
+            self._dirty = True
+            logger.info(f"🎯 Índice IVF treinado: {n_lists} listas para {self._count} vagas")
+
+    # --- Consulta ---
+
+    def search(self, vector, k=10, filters=None, exact=False):
+        """Top-k ``[(id, score, metadados)]`` por cosseno, respeitando os filtros"""
+        self._ensure_loaded()
+        query = normalize_rows(np.asarray(vector, dtype=np.float32))[0]
+        with self._lock:
+            if not self._count:
+                return []
+            dim = self._vectors.shape[1]
+            if query.shape[0] != dim:
+                raise ValueError(f"vector deve ter {dim} dimensões")
+            candidates = None
+            for field, value in (filters or {}).items():
+                if value in (None, ""):
                     continue
-                
-                # Coletar detalhes com IA
-                details = scrape_job_details(link, session)
-                
-                # Extrair skills usando ontologia dinâmica
-                skills = ONTOLOGY.extract_skills_intelligently(details["descricao_completa"])
-                
-                # Detectar senioridade e área usando IA
-                seniority_level = detect_seniority_with_ai(details["descricao_completa"], title)
-                area = detect_area_with_ai(details["descricao_completa"], title)
-                
-                # Montar registro completo
-                job_record = {
-                    "cargo": title.strip()[:100],
-                    "empresa": "Não informado",
-                    "salario_info": details["salario"],
-                    "modalidade": details["modalidade"],
-                    "data_publicacao": yesterday,
-                    "cidade": details["cidade"],
-                    "estado": details["estado"],
-                    "pais": "Brasil",
-                    "source_url": link[:255],
-                    "descricao_completa": details["descricao_completa"],
-                    "skills_required": skills,
-                    "seniority_level": seniority_level,
-                    "area": area,
-                    "quality_score": len(skills) * 0.1 + (1 if details["salario"]["disclosed"] else 0) * 0.3
-                }
-                
-                all_jobs.append(job_record)
-                logger.info(f"✅ Coletada vaga inteligente: {title[:50]}... (Skills: {len(skills)}, Score: {job_record['quality_score']:.1f}/1.0)")
-                
-                if len(all_jobs) >= MAX_VAGAS_TOTAIS:
-                    break
+                rows = self._inverted[field].get(fold_text(str(value)), set())
+                candidates = rows if candidates is None else candidates & rows
+            if candidates is not None:
+                candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
             
-            time.sleep(2)  # Respeitar SerpAPI (reduzido para plano pago)
-        
-        except Exception as e:
-            logger.error(f"❌ Erro na busca do Google/SerpAPI para {source_query}: {e}")
-            time.sleep(5)
-    
-    logger.info(f"✅ COLETA FINALIZADA: {len(all_jobs)} vagas INTELIGENTES coletadas")
-    return all_jobs
+            use_ivf = self.mode == "ivf" and not exact and self._centroids is not None
+            if use_ivf and (candidates is None or len(candidates) > 4 * k * self.n_probe):
+                probe = np.argsort(-(self._centroids @ query))[:self.n_probe]
+                in_probe = np.flatnonzero(np.isin(self._assignments[:self._count], probe))
+                candidates = in_probe if candidates is None else np.intersect1d(candidates, in_probe, assume_unique=True)
+            
+            if candidates is None:
+                scores = self._vectors[:self._count] @ query
+                rows = np.arange(self._count)
+            else:
+                if not len(candidates):
+                    return []
+                scores = self._vectors[candidates] @ query
+                rows = candidates
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[rows[i]], float(scores[i]), self._meta[rows[i]]) for i in top]
+
+class JobMatchIndex:
+    """Um ``VectorIndex`` por coluna de embedding (descrição e skills)"""
+
+    FIELDS = ("embedding", "skills_embedding")
+
+    def __init__(self, directory=VECTOR_INDEX_DIR, mode=VECTOR_INDEX_MODE):
+        self.directory = directory
+        self.indexes = {field: VectorIndex(os.path.join(directory, field), mode=mode) for field in self.FIELDS} if directory else {}
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def add_rows(self, rows):
+        for field, index in self.indexes.items():
+            selected = [row for row in rows if row.get(field)]
+            if selected:
+                index.add(
+                    [row["external_id"] for row in selected],
+                    [decode_vector(row[field]) for row in selected],
+                    [{key: row.get(key) for key in MATCH_CAMPOS} for row in selected]
+                )
+
+    def save(self):
+        for index in self.indexes.values():
+            index.save()
+
+    def search(self, vector, k=10, filters=None, field="embedding", exact=False):
+        return self.indexes[field].search(vector, k=k, filters=filters, exact=exact)
+
+MATCH_INDEX = JobMatchIndex()
 
 def process_job_for_lovable(raw_vaga):
     """Processamento avançado para o Lovable usando embeddings"""
-    # Gerar embeddings semânticos para matching perfeito
-    description_embedding = EMBEDDING_MODEL.encode([raw_vaga["descricao_completa"][:500]])[0].tolist() if EMBEDDING_MODEL else []
+    # Gerar embeddings semânticos para matching perfeito (descrição e skills num só lote)
     skills_text = " ".join([skill["name"] for skill in raw_vaga["skills_required"]])
-    skills_embedding = EMBEDDING_MODEL.encode([skills_text]) if EMBEDDING_MODEL and skills_text else []
+    texts = [raw_vaga["descricao_completa"][:500]] + ([skills_text] if skills_text else [])
+    vectors = EMBEDDING_MODEL.encode(texts)
+    description_embedding = vectors[0]
+    skills_embedding = vectors[1] if skills_text else None
     
     processed = {
         # Metadados
-        "external_id": f"eleva_{hash(raw_vaga['source_url'])}",
+        "external_id": stable_job_id(raw_vaga["source_url"]),
         "source": "inteligente_coletor",
         "source_url": raw_vaga["source_url"],
         "scraped_at": datetime.utcnow().isoformat(),
@@ -740,67 +3922,372 @@ def process_job_for_lovable(raw_vaga):
         
         # Skills
         "skills_required": raw_vaga["skills_required"],
-        "experience_years_min": 3 if "3+ anos" in raw_vaga["descricao_completa"].lower() else 5 if "5+ anos" in raw_vaga["descricao_completa"].lower() else 2,
+        "experience_years_min": raw_vaga.get("experience_years_min") or TEXT_FEATURES.scan(raw_vaga["descricao_completa"])["experience_years_min"],
         
         # Descrição
         "description": raw_vaga["descricao_completa"],
         "culture_keywords": ["inovação", "resultados", "colaboração", "excelência"],
         
         # Embeddings para matching
-        "embedding": json.dumps(description_embedding) if description_embedding else None,
-        "skills_embedding": json.dumps(skills_embedding[0].tolist()) if skills_embedding else None,
+        "embedding": encode_vector(description_embedding),
+        "skills_embedding": encode_vector(skills_embedding),
         
         # Qualidade
         "quality_score": raw_vaga["quality_score"]
     }
+    if SALVAR_SOURCE_URLS:
+        processed["source_urls"] = raw_vaga.get("source_urls") or [raw_vaga["source_url"]]  # Todas as fontes da mesma vaga
     
     return processed
 
-def save_to_supabase(vagas):
-    """Salvamento inteligente com tratamento de erros"""
-    logger.info(f"💾 SALVANDO {len(vagas)} VAGAS NO SUPABASE...")
-    saved_count = 0
-    errors_count = 0
+class BatchUpsertWriter:
+    """Grava vagas em lotes com um único upsert por lote.
+
+    A chave de conflito é ``external_id``, derivado do hash da URL canônica, então
+    reexecuções atualizam as mesmas linhas em vez de duplicá-las (a tabela precisa
+    de uma restrição UNIQUE em ``external_id``). Se um lote inteiro falhar, as
+    linhas são reenviadas uma a uma para isolar a linha problemática.
+    ``client`` é qualquer cliente PostgREST (Supabase ou ``SyncPostgrestClient``
+    apontando para um PostgREST local). ``on_saved`` recebe as linhas efetivamente
+    gravadas (ex.: para alimentar índices locais).
+    """
+
+    def __init__(self, client, table="vagas_lovable", batch_size=SUPABASE_BATCH_SIZE, on_conflict="external_id", on_saved=None):
+        self.client = client
+        self.on_saved = on_saved
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.on_conflict = on_conflict
+        self.saved_count = 0
+        self.errors_count = 0
+        self.round_trips = 0
+
+    def _upsert(self, rows):
+        self.round_trips += 1
+        with METRICS.timer("eleva_storage_write_seconds"):
+            self.client.table(self.table).upsert(rows, on_conflict=self.on_conflict).execute()
+
+    def write_batch(self, rows):
+        """Envia um lote; em caso de falha, tenta linha a linha. Retorna quantas foram salvas"""
+        if not rows:
+            return 0
+        try:
+            self._upsert(rows)
+            self.saved_count += len(rows)
+            METRICS.inc("eleva_storage_rows_total", len(rows), result="saved")
+            self._notify(rows)
+            return len(rows)
+        except Exception as e:
+            logger.warning(f"⚠️ Lote de {len(rows)} vagas falhou ({e}); tentando uma a uma")
+        
+        saved_rows = []
+        for row in rows:
+            try:
+                self._upsert([row])
+                saved_rows.append(row)
+            except Exception as e:
+                logger.error(f"❌ Erro ao salvar vaga inteligente '{row.get('title', 'Sem título')[:30]}...': {e}")
+                self.errors_count += 1
+        saved = len(saved_rows)
+        self.saved_count += saved
+        METRICS.inc("eleva_storage_rows_total", saved, result="saved")
+        METRICS.inc("eleva_storage_rows_total", len(rows) - saved, result="error")
+        self._notify(saved_rows)
+        return saved
+
+    def _notify(self, rows):
+        if self.on_saved and rows:
+            try:
+                self.on_saved(rows)
+            except Exception as e:
+                logger.warning(f"⚠️ Falha ao processar linhas gravadas: {e}")
+
+    def write(self, rows):
+        """Divide ``rows`` em lotes de ``batch_size`` e grava todos"""
+        for start in range(0, len(rows), self.batch_size):
+            self.write_batch(rows[start:start + self.batch_size])
+        return self.saved_count
+
+def index_saved_rows(rows):
+    """Pós-gravação: vetores das linhas salvas vão para os shards e o índice de /match"""
+    EMBEDDING_SHARDS.append_rows(rows)
+    if MATCH_INDEX.enabled:
+        MATCH_INDEX.add_rows(rows)
+
+def get_storage_client():
+    """Cliente de escrita: PostgREST local (POSTGREST_URL) ou o Supabase de produção"""
+    return postgrest if POSTGREST_URL else supabase
+
+def save_to_supabase(vagas, client=None, batch_size=SUPABASE_BATCH_SIZE):
+    """Salvamento inteligente em lotes (upsert idempotente) com tratamento de erros"""
+    logger.info(f"💾 SALVANDO {len(vagas)} VAGAS NO SUPABASE (lotes de {batch_size})...")
+    writer = BatchUpsertWriter(client or get_storage_client(), batch_size=batch_size, on_saved=index_saved_rows)
     
+    rows = {}
     for vaga in vagas:
         try:
             processed_vaga = process_job_for_lovable(vaga)
-            supabase.table("vagas_lovable").insert(processed_vaga).execute()
-            logger.info(f"✅ Vaga inteligente salva: {processed_vaga['title'][:50]}... ({processed_vaga['seniority_level']})")
-            saved_count += 1
+            # Mesma URL canônica no mesmo lote quebraria o upsert: manter a última
+            rows[processed_vaga["external_id"]] = processed_vaga
         except Exception as e:
-            logger.error(f"❌ Erro ao salvar vaga inteligente '{vaga.get('cargo', 'Sem título')[:30]}...': {e}")
-            errors_count += 1
+            logger.error(f"❌ Erro ao preparar vaga inteligente '{vaga.get('cargo', 'Sem título')[:30]}...': {e}")
+            writer.errors_count += 1
     
-    logger.info(f"✅ SALVAMENTO CONCLUÍDO: {saved_count} vagas inteligentes salvas, {errors_count} erros")
-    return saved_count
+    writer.write(list(rows.values()))
+    
+    logger.info(f"✅ SALVAMENTO CONCLUÍDO: {writer.saved_count} vagas inteligentes salvas, {writer.errors_count} erros, {writer.round_trips} requisições")
+    return writer.saved_count
+
+def write_run_profile(pipeline, metrics_before, started_at):
+    """Grava em METRICS_PROFILE_DIR o perfil da execução: contadores do pipeline + métricas do período"""
+    finished_at = datetime.now(timezone.utc)
+    profile = {
+        "query": pipeline.query_base,
+        "started_at": started_at.isoformat(),
+        "finished_at": finished_at.isoformat(),
+        "wall_seconds": round((finished_at - started_at).total_seconds(), 3),
+        "pipeline": pipeline.snapshot(),
+        **METRICS.profile(metrics_before)
+    }
+    try:
+        os.makedirs(METRICS_PROFILE_DIR, exist_ok=True)
+        path = os.path.join(METRICS_PROFILE_DIR, f"run-{started_at.strftime('%Y%m%dT%H%M%S')}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        logger.info(f"📏 Perfil da execução salvo em {path}")
+    except OSError as e:
+        logger.warning(f"⚠️ Falha ao salvar perfil da execução: {e}")
 
-def run_scrapper():
-    """Execução mestre do coletor disruptivo"""
+QUERY_PADRAO = "diretor OR gerente OR head OR líder OR executivo OR supervisor OR coordenador OR senior OR sênior OR c-level OR chief OR presidente OR sócio OR partner"
+
+def build_scrape_pipeline(query=QUERY_PADRAO, sources=None, days_back=1, max_jobs=MAX_VAGAS_TOTAIS, replay_date=REPLAY_DATE):
+    """Pipeline de coleta + gravação (em replay, só grava se houver um PostgREST local)"""
+    collect_only = bool(replay_date and not POSTGREST_URL)
+    if collect_only:
+        logger.info("📼 Modo replay sem POSTGREST_URL: gravação no banco ignorada")
+    return ScrapePipeline(query, days_back=days_back, replay_date=replay_date, sources=sources, max_jobs=max_jobs, collect=collect_only)
+
+def run_scrapper(replay_date=REPLAY_DATE, pipeline=None):
+    """Execução mestre do coletor disruptivo (``replay_date``: roda offline a partir do arquivo)"""
     logger.info("🚀 INICIANDO COLETOR DISRUPTIVO DE VAGAS (ZERO LISTAS MANUAIS)")
     logger.info("🧠 IA AUTONOMA: Skills, cargos e cidades aprendem automaticamente")
     
-    # Coletar vagas inteligentes
-    vagas = scrape_google_jobs(
-        "diretor OR gerente OR head OR líder OR executivo OR supervisor OR coordenador OR senior OR sênior OR c-level OR chief OR presidente OR sócio OR partner"
-    )
-    
-    # Salvar no banco de dados
-    saved_count = save_to_supabase(vagas)
+    # Coletar e salvar em fluxo contínuo
+    pipeline = pipeline or build_scrape_pipeline(replay_date=replay_date)
+    metrics_before = METRICS.snapshot() if METRICS_PROFILE_DIR else None
+    started_at = datetime.now(timezone.utc)
+    counters = pipeline.run()
+    if MATCH_INDEX.enabled:
+        MATCH_INDEX.save()
+    if metrics_before is not None:
+        write_run_profile(pipeline, metrics_before, started_at)
+    saved_count = counters["saved"]
     
     # Métricas de inteligência
     logger.info("📈 MÉTRICAS DE INTELIGÊNCIA:")
-    logger.info(f"   • Total de vagas coletadas: {len(vagas)}")
+    logger.info(f"   • Total de vagas coletadas: {counters['enriched']}")
     logger.info(f"   • Vagas salvas com sucesso: {saved_count}")
-    logger.info(f"   • Skills detectadas automaticamente: {sum(len(v.get('skills_required', [])) for v in vagas)}")
-    logger.info(f"   • Cidades identificadas: {len(set(v.get('cidade') for v in vagas))}")
-    logger.info(f"   • Áreas de negócio: {len(set(v.get('area') for v in vagas))}")
+    logger.info(f"   • Duplicatas entre fontes colapsadas: {counters['duplicates']}")
+    logger.info(f"   • Vagas com falha (fora do banco): {counters['failed'] + counters['circuit_skipped']}")
+    logger.info(f"   • Skills detectadas automaticamente: {pipeline.skills_count}")
+    logger.info(f"   • Cidades identificadas: {len(pipeline.cities)}")
+    logger.info(f"   • Áreas de negócio: {len(pipeline.areas)}")
+    # No modo com processos os modelos rodam nos filhos: somar o que eles reportaram
+    counts = _enrichment_counts()
+    for key, value in pipeline.worker_counts.items():
+        counts[key] = counts.get(key, 0) + value
+    logger.info(f"   • Geocodificação: {counts.get('geocode_gazetteer_hits', 0)} offline, {counts.get('geocode_cache_hits', 0)} do cache, {counts.get('geocode_network_calls', 0)} chamadas ao Nominatim")
+    hits, misses = counts.get("embeddings_hits", 0), counts.get("embeddings_misses", 0)
+    seconds_saved = round(counts.get("embeddings_encode_seconds", 0) / misses * hits, 3) if misses else 0.0
+    logger.info(f"   • Cache de embeddings: {hits} acertos ({counts.get('embeddings_disk_hits', 0)} do disco), {misses} codificações, ~{seconds_saved}s economizados")
     
     return saved_count
 
+# 🗂️ COLETAS EM SEGUNDO PLANO (disparadas e acompanhadas pela API)
+class ScrapeJobManager:
+    """Fila de coletas executadas fora da thread web.
+
+    ``submit`` valida os parâmetros e devolve o ID na hora; as coletas rodam num pool
+    com ``max_parallel`` threads (1 = em série, o padrão: ontologia, geocodificador e
+    estado incremental são compartilhados). Execuções finalizadas ficam disponíveis
+    para consulta até o limite de ``history``.
+    """
+
+    def __init__(self, max_parallel=SCRAPE_JOBS_MAX_PARALLEL, max_pending=SCRAPE_JOBS_MAX_PENDING, history=SCRAPE_JOBS_HISTORY):
+        self.max_parallel = max(1, max_parallel)
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = None  # Criado no primeiro submit: importar o módulo não inicia threads
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_params(payload):
+        """Parâmetros de uma coleta a partir do JSON recebido; ValueError se inválidos"""
+        payload = payload or {}
+        params = {
+            "query": payload.get("query") or QUERY_PADRAO,
+            "sources": payload.get("sources") or None,
+            "days_back": payload.get("days_back", 1),
+            "max_jobs": payload.get("max_jobs", MAX_VAGAS_TOTAIS),
+            "replay_date": payload.get("replay_date", REPLAY_DATE)
+        }
+        if not isinstance(params["query"], str):
+            raise ValueError("query deve ser texto")
+        if params["sources"] is not None and (not isinstance(params["sources"], list) or not all(isinstance(x, str) and x for x in params["sources"])):
+            raise ValueError("sources deve ser uma lista de filtros de busca (ex.: \"site:gupy.com.br\")")
+        for name in ("days_back", "max_jobs"):
+            if isinstance(params[name], bool) or not isinstance(params[name], int) or params[name] < 1:
+                raise ValueError(f"{name} deve ser um inteiro positivo")
+        if params["replay_date"] is not None and params["replay_date"] != "latest":
+            try:
+                datetime.strptime(params["replay_date"], "%Y-%m-%d")
+            except (TypeError, ValueError):
+                raise ValueError("replay_date deve ser \"latest\" ou AAAA-MM-DD")
+        return params
+
+    def submit(self, params):
+        """Enfileira uma coleta; devolve o registro da execução (LookupError se a fila estiver cheia)"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job["status"] == "queued")
+            if pending >= self.max_pending:
+                raise LookupError(f"{pending} coletas já aguardando na fila")
+            job = {
+                "id": uuid.uuid4().hex,
+                "status": "queued",
+                "params": params,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "saved": None,
+                "error": None,
+                "pipeline": None
+            }
+            self._jobs[job["id"]] = job
+            self._prune()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_parallel, thread_name_prefix="scrape-job")
+        self._executor.submit(self._run, job)
+        logger.info(f"🗂️ Coleta {job['id']} enfileirada: {params['query'][:60]}")
+        return self.describe(job["id"])
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("finished", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        with self._lock:
+            job["status"] = "running"
+            job["started_at"] = datetime.now(timezone.utc).isoformat()
+        try:
+            job["pipeline"] = build_scrape_pipeline(**job["params"])
+            saved = run_scrapper(pipeline=job["pipeline"])
+            with self._lock:
+                job["status"], job["saved"] = "finished", saved
+        except Exception as e:
+            logger.error(f"❌ Coleta {job['id']} falhou: {e}")
+            with self._lock:
+                job["status"], job["error"] = "failed", str(e)
+        finally:
+            with self._lock:
+                job["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+    def describe(self, job_id):
+        """Estado público de uma execução (None se desconhecida)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            described = {key: value for key, value in job.items() if key != "pipeline"}
+        described["counters"] = job["pipeline"].snapshot() if job["pipeline"] else None
+        return described
+
+    def list(self):
+        with self._lock:
+            job_ids = list(self._jobs)
+        return [self.describe(job_id) for job_id in reversed(job_ids)]
+
+SCRAPE_JOBS = ScrapeJobManager()
+
 # Flask API
 app = Flask(__name__)
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Métricas no formato de exposição do Prometheus"""
+    return METRICS.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/match", methods=["POST"])
+def match_jobs():
+    """Top-k vagas mais próximas de um texto ou vetor, com filtros opcionais.
+
+    Corpo: ``{"text": "...", "vector": [...], "k": 10, "field": "embedding",
+    "exact": false, "filters": {"area": ..., "seniority_level": ..., "city": ..., "work_model": ...}}``
+    """
+    if not MATCH_INDEX.enabled:
+        return {"error": "índice vetorial desativado (VECTOR_INDEX_DIR)"}, 503
+    payload = request.get_json(silent=True) or {}
+    field = payload.get("field", "embedding")
+    filters = payload.get("filters") or {}
+    k = payload.get("k", 10)
+    if field not in JobMatchIndex.FIELDS:
+        return {"error": f"field deve ser um de: {', '.join(JobMatchIndex.FIELDS)}"}, 400
+    if not isinstance(filters, dict) or any(key not in MATCH_FILTROS for key in filters):
+        return {"error": f"filtros aceitos: {', '.join(MATCH_FILTROS)}"}, 400
+    if isinstance(k, bool) or not isinstance(k, int) or not 1 <= k <= 100:
+        return {"error": "k deve ser um inteiro entre 1 e 100"}, 400
+    
+    started = time.perf_counter()
+    if payload.get("vector") is not None:
+        if not isinstance(payload["vector"], (list, str)):
+            return {"error": "vector deve ser uma lista de números ou um vetor codificado (json, pgvector, f16:, i8:)"}, 400
+        try:
+            vector = decode_vector(payload["vector"])
+        except (TypeError, ValueError) as e:
+            return {"error": f"vector inválido: {e}"}, 400
+        if vector.ndim != 1 or not vector.size or not np.all(np.isfinite(vector)):
+            return {"error": "vector deve ser unidimensional, não vazio e com valores finitos"}, 400
+    elif payload.get("text"):
+        vector = EMBEDDING_MODEL.encode([str(payload["text"])[:500]])[0]
+    else:
+        return {"error": "informe text ou vector"}, 400
+    
+    try:
+        results = MATCH_INDEX.search(vector, k=k, filters=filters, field=field, exact=bool(payload.get("exact")))
+    except ValueError as e:
+        return {"error": str(e)}, 400  # Dimensão diferente da do índice
+    return {
+        "matches": [{"external_id": row_id, "score": round(score, 4), **meta} for row_id, score, meta in results],
+        "mode": "exact" if payload.get("exact") else VECTOR_INDEX_MODE,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+@app.route("/scrape", methods=["POST"])
+def enqueue_scrape():
+    """Enfileira uma coleta e responde imediatamente com o ID da execução"""
+    try:
+        params = ScrapeJobManager.parse_params(request.get_json(silent=True))
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    try:
+        job = SCRAPE_JOBS.submit(params)
+    except LookupError as e:
+        return {"error": str(e)}, 429
+    return job, 202, {"Location": f"/scrape/{job['id']}"}
+
+@app.route("/scrape", methods=["GET"])
+def list_scrapes():
+    return {"jobs": SCRAPE_JOBS.list()}
+
+@app.route("/scrape/<job_id>", methods=["GET"])
+def scrape_status(job_id):
+    """Progresso de uma execução: estado, parâmetros e contadores por estágio"""
+    job = SCRAPE_JOBS.describe(job_id)
+    if job is None:
+        return {"error": "coleta não encontrada"}, 404
+    return job
+
 @app.route("/health", methods=["GET"])
 def health_check():
     return {
@@ -809,13 +4296,21 @@ def health_check():
         "mode": "DISRUPTIVO",
         "intelligence": "AUTONOMOUS",
         "models": {
-            "nlp": "pt_core_news_lg (auto-installed)",
-            "embeddings": "paraphrase-multilingual-MiniLM-L12-v2",
+            "nlp": " / ".join(NLP_MODELS),
+            "embeddings": EMBEDDING_MODEL_NAME,
             "geocoding": "nominatim"
-        }
+        },
+        "loaded": RESOURCES.status()
     }
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["check-embeddings"]:
+        # Ex.: python app.py check-embeddings  → exit 0 se o backend ONNX concorda com o torch
+        report = check_embedding_backend()
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        sys.exit(0 if report["ok"] else 1)
     logger.info("🔥 INICIANDO SERVIDOR DISRUPTIVO - AGUARDANDO REQUISIÇÕES")
-    run_scrapper()
+    warm_up_models()
+    if SCRAPE_ON_STARTUP:
+        SCRAPE_JOBS.submit(ScrapeJobManager.parse_params({}))
     app.run(host="0.0.0.0", port=8000)
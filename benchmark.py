@@ -0,0 +1,421 @@
+# benchmark.py — Benchmark offline de ponta a ponta do coletor
+#
+# Sobe servidores locais no lugar do SerpAPI, dos sites de vagas, do Nominatim e do
+# PostgREST/Supabase, roda o pipeline real contra eles e mede tempo total, vagas/s,
+# percentis de latência por estágio e pico de memória (RSS), comparando com um
+# baseline salvo.
+#
+# Uso:
+#   python benchmark.py --jobs 500                  # roda e compara com o baseline
+#   python benchmark.py --jobs 500 --save-baseline  # grava o resultado como novo baseline
+
+import argparse
+import functools
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bench_baseline.json")
+SERP_PAGE_SIZE = 20
+
+# 🧪 Massa de dados sintética (determinística por seed)
+CARGOS = ["Gerente", "Diretor", "Head", "Coordenador", "Supervisor", "Líder", "Analista Sênior", "Especialista Sênior"]
+AREAS = ["de Tecnologia", "Comercial", "de Marketing", "Financeiro", "de Recursos Humanos", "de Produto", "Jurídico", "de Operações"]
+CIDADES = [("São Paulo", "SP"), ("Rio de Janeiro", "RJ"), ("Belo Horizonte", "MG"), ("Curitiba", "PR"), ("Porto Alegre", "RS"),
+           ("Recife", "PE"), ("Salvador", "BA"), ("Campinas", "SP"), ("Florianópolis", "SC"), ("Brasília", "DF")]
+EMPRESAS = ["Acme Brasil", "Grupo Horizonte", "Nova Energia S.A.", "Banco Aurora", "Varejo Ipê", "LogBR", "Saúde+ Hospitais"]
+SKILLS = ["Python", "SQL", "Power BI", "Excel avançado", "gestão de equipes", "negociação", "inglês fluente", "SAP",
+          "metodologias ágeis", "AWS", "planejamento estratégico", "análise de dados", "CRM", "Salesforce", "liderança"]
+MODALIDADES = ["presencial", "híbrido", "remoto"]
+
+
+def brl(value):
+    """Valor inteiro no formato brasileiro (ex.: 15.000)"""
+    return f"{value:,}".replace(",", ".")
+
+
+class FakeJobWeb:
+    """Conteúdo servido pelos servidores falsos: ``n_jobs`` vagas distribuídas entre as fontes"""
+
+    def __init__(self, n_jobs, seed=42):
+        self.n_jobs = n_jobs
+        self.rng = random.Random(seed)
+        self.sources = []
+        self.jobs = [self._make_job(i) for i in range(n_jobs)]
+        self.rows_written = 0
+        self.write_requests = 0
+        self._lock = threading.Lock()
+
+    def _make_job(self, i):
+        rng = self.rng
+        cidade, uf = rng.choice(CIDADES)
+        salario = rng.randrange(8, 40) * 1000
+        return {
+            "id": i,
+            "cargo": f"{rng.choice(CARGOS)} {rng.choice(AREAS)}",
+            "empresa": rng.choice(EMPRESAS),
+            "cidade": cidade,
+            "uf": uf,
+            "modalidade": rng.choice(MODALIDADES),
+            "salario": (salario, salario + rng.randrange(2, 10) * 1000),
+            "skills": rng.sample(SKILLS, rng.randrange(4, 9)),
+            "paragrafos": rng.randrange(3, 9),
+            "json_ld": i % 3 == 0
+        }
+
+    def jobs_for_query(self, query):
+        """Vagas da fonte citada na query (fatias contíguas, na ordem das fontes)"""
+        index = next((i for i, source in enumerate(self.sources) if source in query), 0)
+        per_source = math.ceil(self.n_jobs / max(1, len(self.sources)))
+        return self.jobs[index * per_source:(index + 1) * per_source]
+
+    def serp_page(self, base_url, query, start):
+        jobs = self.jobs_for_query(query)
+        page = jobs[start:start + SERP_PAGE_SIZE]
+        data = {
+            "organic_results": [
+                {
+                    "link": f"{base_url}/vaga/{job['id']}",
+                    "title": f"{job['cargo']} - {job['empresa']}",
+                    "snippet": f"{job['cidade']}, {job['uf']}, Brasil · {job['modalidade']} · {job['cargo']} com experiência em {', '.join(job['skills'][:3])}."
+                }
+                for job in page
+            ]
+        }
+        if start + SERP_PAGE_SIZE < len(jobs):
+            data["serpapi_pagination"] = {"next": f"{base_url}/serpapi/search.json?start={start + SERP_PAGE_SIZE}"}
+        return data
+
+    def detail_html(self, job):
+        rng = random.Random(job["id"])
+        paragrafos = []
+        for _ in range(job["paragrafos"]):
+            skill = rng.choice(job["skills"])
+            paragrafos.append(
+                f"<p>Buscamos {job['cargo'].lower()} para liderar iniciativas estratégicas, com domínio de {skill} "
+                f"e experiência mínima de {rng.randrange(3, 12)} anos. A pessoa será responsável por indicadores, "
+                f"orçamento e desenvolvimento do time em {job['cidade']}.</p>"
+            )
+        requisitos = "".join(f"<li>Conhecimento avançado em {skill}</li>" for skill in job["skills"])
+        json_ld = ""
+        if job["json_ld"]:
+            json_ld = '<script type="application/ld+json">' + json.dumps({
+                "@context": "https://schema.org", "@type": "JobPosting",
+                "title": job["cargo"],
+                "hiringOrganization": {"@type": "Organization", "name": job["empresa"]},
+                "datePosted": "2026-01-02",
+                "employmentType": "FULL_TIME",
+                "jobLocation": {"@type": "Place", "address": {"addressLocality": job["cidade"], "addressRegion": job["uf"], "addressCountry": "BR"}},
+                "baseSalary": {"@type": "MonetaryAmount", "currency": "BRL", "value": {"minValue": job["salario"][0], "maxValue": job["salario"][1], "unitText": "MONTH"}},
+                "description": "".join(paragrafos)
+            }, ensure_ascii=False) + "</script>"
+        return (
+            f"<html><head><meta charset='utf-8'><title>{job['cargo']}</title>{json_ld}</head><body>"
+            f"<header><nav><a href='/'>Início</a> <a href='/vagas'>Vagas</a> <a href='/empresas'>Empresas</a></nav></header>"
+            f"<div class='job-description'><h1>{job['cargo']} - {job['empresa']}</h1>"
+            f"<p>Local: {job['cidade']}, {job['uf']} · Modelo {job['modalidade']}</p>{''.join(paragrafos)}"
+            f"<h2>Requisitos</h2><ul>{requisitos}</ul>"
+            f"<p>Salário: R$ {brl(job['salario'][0])} a R$ {brl(job['salario'][1])} + benefícios. Contratação CLT.</p></div>"
+            f"<aside class='related'><h3>Vagas similares</h3><ul><li>Analista de Dados</li><li>Gerente de Contas</li></ul></aside>"
+            f"<footer>© Portal de Vagas · Política de cookies</footer></body></html>"
+        )
+
+    def geocode(self, query):
+        name = query.split(",")[0].strip()
+        for cidade, uf in CIDADES:
+            if cidade.lower() == name.lower():
+                return [{
+                    "lat": "-23.55", "lon": "-46.63", "display_name": f"{cidade}, {uf}, Brasil",
+                    "address": {"city": cidade, "state": uf, "ISO3166-2-lvl4": f"BR-{uf}", "country_code": "br"}
+                }]
+        return []
+
+    def record_write(self, rows):
+        with self._lock:
+            self.write_requests += 1
+            self.rows_written += rows
+
+
+def make_handler(web):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, como os serviços reais
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json"):
+            payload = body.encode("utf-8") if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            params = dict(urllib.parse.parse_qsl(url.query))
+            base_url = f"http://{self.headers.get('Host')}"
+            if url.path == "/serpapi/search.json":
+                data = web.serp_page(base_url, params.get("q", ""), int(params.get("start", 0)))
+                self._send(200, json.dumps(data, ensure_ascii=False))
+            elif url.path.startswith("/vaga/"):
+                job_id = int(url.path.rsplit("/", 1)[1])
+                if job_id >= len(web.jobs):
+                    self._send(404, "não encontrada", "text/plain")
+                else:
+                    self._send(200, web.detail_html(web.jobs[job_id]), "text/html; charset=utf-8")
+            elif url.path == "/search":
+                self._send(200, json.dumps(web.geocode(params.get("q", ""))))
+            else:
+                self._send(404, "{}")
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            if self.path.startswith("/vagas_lovable"):
+                rows = json.loads(body or b"[]")
+                web.record_write(len(rows) if isinstance(rows, list) else 1)
+                self._send(201, "[]")
+            else:
+                self._send(404, "{}")
+
+    return Handler
+
+
+def start_fake_services(web):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(web))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def configure_environment(base_url, n_jobs, workdir):
+    """Aponta o coletor para os serviços locais, sem caches nem estado entre execuções"""
+    os.environ.update({
+        "SERPAPI_KEY": "benchmark",
+        "SERPAPI_URL": f"{base_url}/serpapi/search.json",
+        "SERPAPI_CACHE_DIR": "",
+        "SERPAPI_MAX_PAGINAS_POR_FONTE": str(math.ceil(n_jobs / SERP_PAGE_SIZE) + 1),
+        "SERPAPI_MAX_REQUISICOES": str(10 ** 6),
+        "NOMINATIM_DOMAIN": base_url.split("://", 1)[1],
+        "NOMINATIM_SCHEME": "http",
+        "POSTGREST_URL": base_url,
+        "MIN_INTERVALO_POR_DOMINIO": "0",
+        "ARCHIVE_DIR": "",
+        "CRAWL_STATE_PATH": os.path.join(workdir, "crawl_state.sqlite"),
+        "GEOCODE_CACHE_PATH": os.path.join(workdir, "geocode.sqlite"),
+        # Todo estado persistente fica no diretório temporário da execução: nada de
+        # vagas falsas no .cache real, e nenhuma execução herda a deduplicação da anterior
+        "DEDUP_INDEX_PATH": os.path.join(workdir, "dedup.sqlite"),
+        "VECTOR_INDEX_DIR": os.path.join(workdir, "vector_index"),
+        "EMBEDDING_SHARD_DIR": "",
+        "METRICS_PROFILE_DIR": "",
+        "SCRAPE_ON_STARTUP": "0"
+    })
+    os.environ.pop("SCRAPERAPI_KEY", None)
+    os.environ.pop("EMBEDDING_CACHE_DIR", None)
+    os.environ.pop("REPLAY_DATE", None)
+
+
+class StageTimer:
+    """Latências por estágio, coletadas envolvendo as funções quentes do coletor"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap_generator(self, stage, iterable):
+        """Mede o tempo gasto produzindo cada item (ex.: cada Doc do ``nlp.pipe``)"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.record(stage, time.perf_counter() - start)
+            yield item
+
+    def summary(self):
+        result = {}
+        with self._lock:
+            for stage, values in self.samples.items():
+                ordered = sorted(values)
+                result[stage] = {
+                    "count": len(ordered),
+                    "total_s": round(sum(ordered), 3),
+                    "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                    "p90_ms": round(percentile(ordered, 90) * 1000, 2),
+                    "p99_ms": round(percentile(ordered, 99) * 1000, 2)
+                }
+        return result
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    low, high = math.floor(k), math.ceil(k)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def instrument(app, timer):
+    """Envolve os pontos quentes do módulo com o cronômetro de estágios"""
+    app.SerpApiClient.search_page = timer.wrap("search", app.SerpApiClient.search_page)
+    app.fetch_job_page = timer.wrap("fetch", app.fetch_job_page)
+    app.extract_job_page = timer.wrap("parse", app.extract_job_page)
+    app.CachedEmbeddingModel.encode = timer.wrap("embedding", app.CachedEmbeddingModel.encode)
+    app.DynamicOntology.extract_cities_from_text = timer.wrap("geocoding", app.DynamicOntology.extract_cities_from_text)
+    app.BatchUpsertWriter.write_batch = timer.wrap("write", app.BatchUpsertWriter.write_batch)
+
+    nlp = app.nlp
+
+    class TimedNlp:
+        def __getattr__(self, name):
+            return getattr(nlp, name)
+
+        def __call__(self, *args, **kwargs):
+            return timer.wrap("ner", nlp)(*args, **kwargs)
+
+        def pipe(self, texts, *args, **kwargs):
+            # Materializar a entrada antes: o cronômetro não deve incluir a espera pelas filas
+            return timer.wrap_generator("ner", nlp.pipe(list(texts), *args, **kwargs))
+
+    app.nlp = TimedNlp()
+
+
+def compare(report, baseline, tolerance):
+    """Variação percentual das métricas principais; regressão se piorar além da tolerância"""
+    rows = []
+    regressions = []
+
+    def check(name, current, previous, higher_is_better):
+        if not previous:
+            return
+        delta = (current - previous) / previous
+        worse = -delta if higher_is_better else delta
+        rows.append((name, previous, current, delta))
+        if worse > tolerance:
+            regressions.append(name)
+
+    check("wall_s", report["wall_s"], baseline.get("wall_s"), higher_is_better=False)
+    check("jobs_per_s", report["jobs_per_s"], baseline.get("jobs_per_s"), higher_is_better=True)
+    check("peak_rss_mb", report["peak_rss_mb"], baseline.get("peak_rss_mb"), higher_is_better=False)
+    for stage, stats in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage, {})
+        check(f"{stage}.p50_ms", stats["p50_ms"], previous.get("p50_ms"), higher_is_better=False)
+        check(f"{stage}.p90_ms", stats["p90_ms"], previous.get("p90_ms"), higher_is_better=False)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do coletor (serviços locais falsos)")
+    parser.add_argument("--jobs", type=int, default=300, help="Vagas sintéticas servidas (e limite da coleta)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava este resultado como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Piora relativa aceita antes de acusar regressão")
+    parser.add_argument("--output", help="Arquivo JSON para o relatório completo")
+    args = parser.parse_args()
+
+    web = FakeJobWeb(args.jobs, seed=args.seed)
+    server, base_url = start_fake_services(web)
+    workdir = tempfile.mkdtemp(prefix="eleva-bench-")
+    configure_environment(base_url, args.jobs, workdir)
+
+    import app  # Só depois do ambiente configurado: as constantes são lidas na importação
+
+    web.sources = app.SOURCES_BRASIL
+    app.GEOCODER.min_delay = 0  # O Nominatim local não tem política de uso
+
+    warm_start = time.perf_counter()
+    app.warm_up_models()
+    warm_up_s = time.perf_counter() - warm_start
+
+    timer = StageTimer()
+    instrument(app, timer)
+
+    pipeline = app.build_scrape_pipeline(max_jobs=args.jobs, replay_date=None)
+    start = time.perf_counter()
+    saved = app.run_scrapper(pipeline=pipeline)
+    wall = time.perf_counter() - start
+    server.shutdown()
+
+    report = {
+        "jobs_served": args.jobs,
+        "jobs_enriched": pipeline.counters["enriched"],
+        "jobs_saved": saved,
+        "rows_received": web.rows_written,
+        "write_requests": web.write_requests,
+        "warm_up_s": round(warm_up_s, 3),
+        "wall_s": round(wall, 3),
+        "jobs_per_s": round(saved / wall, 3) if wall else 0.0,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "config": {
+            "embedding_backend": app.EMBEDDING_BACKEND,
+            "enrich_workers": app.ENRICH_WORKERS,
+            "fetch_concurrency": app.MAX_FETCH_CONCURRENCY,
+            "html_parser": app.HTML_PARSER_BACKEND
+        },
+        "stages": timer.summary()
+    }
+
+    print(f"\n📊 {report['jobs_saved']}/{args.jobs} vagas em {report['wall_s']}s "
+          f"({report['jobs_per_s']} vagas/s), pico de RSS {report['peak_rss_mb']} MB, aquecimento {report['warm_up_s']}s")
+    print(f"{'estágio':<12}{'n':>8}{'total s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for stage in ("search", "fetch", "parse", "ner", "embedding", "geocoding", "write"):
+        stats = report["stages"].get(stage)
+        if stats:
+            print(f"{stage:<12}{stats['count']:>8}{stats['total_s']:>10}{stats['p50_ms']:>10}{stats['p90_ms']:>10}{stats['p99_ms']:>10}")
+
+    exit_code = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("jobs_served") != args.jobs:
+            print(f"⚠️ Baseline medido com {baseline.get('jobs_served')} vagas; comparação aproximada")
+        rows, regressions = compare(report, baseline, args.tolerance)
+        print(f"\n{'métrica':<20}{'baseline':>12}{'atual':>12}{'variação':>10}")
+        for name, previous, current, delta in rows:
+            print(f"{name:<20}{previous:>12}{current:>12}{delta:>+10.1%}")
+        report["regressions"] = regressions
+        if regressions:
+            print(f"❌ Regressões acima de {args.tolerance:.0%}: {', '.join(regressions)}")
+            exit_code = 1
+        else:
+            print("✅ Sem regressões em relação ao baseline")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Baseline salvo em {args.baseline}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
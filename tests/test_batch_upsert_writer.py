@@ -0,0 +1,135 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import app
+
+
+class FakeAPIError(Exception):
+    """Erro 4xx como o PostgREST devolve para uma linha inválida"""
+
+    def __init__(self, code=400):
+        super().__init__(f"{code} Bad Request")
+        self.code = code
+
+
+class FakeClient:
+    """Stand-in do PostgREST: registra cada upsert e recusa lotes com linhas em ``bad_ids``"""
+
+    def __init__(self, bad_ids=()):
+        self.bad_ids = set(bad_ids)
+        self.upserts = []
+        self.saved = []
+        self._rows = None
+
+    def table(self, name):
+        assert name == "vagas_lovable"
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        assert on_conflict == "external_id"
+        self._rows = list(rows)
+        return self
+
+    def execute(self):
+        rows, self._rows = self._rows, None
+        self.upserts.append([row["external_id"] for row in rows])
+        if any(row["external_id"] in self.bad_ids for row in rows):
+            raise FakeAPIError()
+        self.saved.extend(row["external_id"] for row in rows)
+
+
+def rows(*ids):
+    return [{"external_id": i, "title": f"Vaga {i}"} for i in ids]
+
+
+@pytest.fixture(autouse=True)
+def sem_indices_locais(monkeypatch):
+    monkeypatch.setattr(app, "index_saved_rows", lambda rows: None)
+
+
+def test_lotes_por_tamanho():
+    client = FakeClient()
+    writer = app.BatchUpsertWriter(client, batch_size=2)
+    writer.write(rows("a", "b", "c", "d", "e"))
+
+    assert client.upserts == [["a", "b"], ["c", "d"], ["e"]]
+    assert writer.saved_count == 5
+    assert writer.round_trips == 3
+    assert writer.errors_count == 0
+
+
+def test_lote_com_4xx_cai_para_linha_a_linha():
+    client = FakeClient(bad_ids={"b"})
+    notified = []
+    writer = app.BatchUpsertWriter(client, batch_size=3, on_saved=notified.extend)
+    assert writer.write_batch(rows("a", "b", "c")) == 2
+
+    assert client.upserts == [["a", "b", "c"], ["a"], ["b"], ["c"]]
+    assert client.saved == ["a", "c"]
+    assert [row["external_id"] for row in notified] == ["a", "c"]  # Só o que foi gravado
+
+
+def test_linhas_que_falham_de_novo_contam_como_erro():
+    client = FakeClient(bad_ids={"a", "c"})
+    writer = app.BatchUpsertWriter(client, batch_size=10)
+    writer.write(rows("a", "b", "c", "d"))
+
+    assert writer.saved_count == 2
+    assert writer.errors_count == 2
+    assert writer.round_trips == 5  # 1 lote + 4 reenvios individuais
+
+
+def make_pipeline(client, batch_size, flush_seconds):
+    pipeline = app.ScrapePipeline("teste", client=client, batch_size=batch_size, flush_seconds=flush_seconds)
+    pipeline.crawl_state = None
+    pipeline.dedup = None
+    return pipeline
+
+
+def test_pipeline_grava_por_tamanho_e_no_encerramento():
+    client = FakeClient()
+    pipeline = make_pipeline(client, batch_size=2, flush_seconds=60)
+    q = queue.Queue()
+    for row in rows("a", "b", "c"):
+        q.put(row)
+    q.put(app._STOP)
+    pipeline._consume(q)
+
+    # O terceiro item não completa lote nem estoura o tempo: sai no encerramento
+    assert client.upserts == [["a", "b"], ["c"]]
+    assert pipeline.counters["saved"] == 3
+
+
+def test_pipeline_grava_por_tempo_sem_esperar_o_lote_encher():
+    client = FakeClient()
+    pipeline = make_pipeline(client, batch_size=50, flush_seconds=0.05)
+    q = queue.Queue()
+    consumer = threading.Thread(target=pipeline._consume, args=(q,), daemon=True)
+    consumer.start()
+
+    q.put(rows("a")[0])
+    deadline = time.monotonic() + 2
+    while not client.upserts and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.upserts == [["a"]]  # Gravado antes do _STOP
+
+    q.put(app._STOP)
+    consumer.join(timeout=2)
+    assert not consumer.is_alive()
+    assert pipeline.counters["saved"] == 1
+
+
+def test_pipeline_conta_erros_do_writer():
+    client = FakeClient(bad_ids={"b"})
+    pipeline = make_pipeline(client, batch_size=10, flush_seconds=60)
+    q = queue.Queue()
+    for row in rows("a", "b"):
+        q.put(row)
+    q.put(app._STOP)
+    pipeline._consume(q)
+
+    assert pipeline.counters["saved"] == 1
+    assert pipeline.counters["errors"] == 1
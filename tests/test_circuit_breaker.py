@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture(autouse=True)
+def sem_espera_entre_tentativas(monkeypatch):
+    monkeypatch.setattr(app, "RETRY_DELAY", 0)
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class FakeSession:
+    """Responde sempre com ``status`` e conta as requisições"""
+
+    def __init__(self, status):
+        self.status = status
+        self.calls = 0
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        return FakeResponse(self.status)
+
+
+def fetch(url, session, breaker, permit=None):
+    limiter = app.DomainRateLimiter(min_interval=0)
+    permit = permit or breaker.allow(app.get_domain(url))
+    return app.fetch_job_page(url, session, limiter, max_retries=3, breaker=breaker, permit=permit)
+
+
+def open_circuit(breaker, host="vagas.exemplo.com"):
+    session = FakeSession(403)
+    assert fetch(f"https://{host}/1", session, breaker) is None
+    assert breaker.is_open(host)
+    assert not breaker.allow(host)
+    return session
+
+
+def test_bloqueios_abrem_o_circuito_e_param_as_tentativas():
+    breaker = app.DomainCircuitBreaker(failure_threshold=3, block_threshold=2, cooldown=60)
+    session = open_circuit(breaker)
+    assert session.calls == 2  # Abriu no segundo 403: a terceira tentativa nem sai
+    assert breaker.stats()["opened"] == 1
+
+
+def test_teste_meio_aberto_com_sucesso_fecha_o_circuito():
+    breaker = app.DomainCircuitBreaker(failure_threshold=3, block_threshold=2, cooldown=0.05)
+    open_circuit(breaker)
+    time.sleep(0.06)
+
+    probe = breaker.allow("vagas.exemplo.com")
+    assert probe.probe
+    assert fetch("https://vagas.exemplo.com/2", FakeSession(200), breaker, probe).status_code == 200
+    assert not breaker.is_open("vagas.exemplo.com")
+    assert breaker.allow("vagas.exemplo.com")
+
+
+def test_teste_meio_aberto_com_404_nao_prende_o_dominio():
+    breaker = app.DomainCircuitBreaker(failure_threshold=3, block_threshold=2, cooldown=0.05)
+    open_circuit(breaker)
+    time.sleep(0.06)
+
+    probe = breaker.allow("vagas.exemplo.com")
+    session = FakeSession(404)
+    assert fetch("https://vagas.exemplo.com/removida", session, breaker, probe) is None
+    assert session.calls == 1  # 404 é definitivo: sem novas tentativas
+
+    # O site respondeu: o circuito fecha e as próximas URLs voltam a ser baixadas
+    assert breaker.stats()["open_domains"] == []
+    assert breaker.allow("vagas.exemplo.com")
+    assert fetch("https://vagas.exemplo.com/3", FakeSession(200), breaker).status_code == 200
+
+
+def test_teste_meio_aberto_com_falha_reabre_o_circuito():
+    breaker = app.DomainCircuitBreaker(failure_threshold=3, block_threshold=2, cooldown=0.05)
+    open_circuit(breaker)
+    time.sleep(0.06)
+
+    probe = breaker.allow("vagas.exemplo.com")
+    assert not breaker.allow("vagas.exemplo.com")  # Um único teste por vez
+    assert fetch("https://vagas.exemplo.com/4", FakeSession(503), breaker, probe) is None
+    assert breaker.is_open("vagas.exemplo.com")
+    assert not breaker.allow("vagas.exemplo.com")
+
+
+def test_dominios_diferentes_sao_independentes():
+    breaker = app.DomainCircuitBreaker(failure_threshold=3, block_threshold=2, cooldown=60)
+    open_circuit(breaker)
+    assert breaker.allow("outro.exemplo.com")
+
+
+def test_download_comum_em_voo_nao_decide_pelo_teste():
+    breaker = app.DomainCircuitBreaker(failure_threshold=3, block_threshold=2, cooldown=0.05)
+    em_voo = [breaker.allow("vagas.exemplo.com") for _ in range(2)]  # Autorizados antes da abertura
+    open_circuit(breaker)
+    time.sleep(0.06)
+    probe = breaker.allow("vagas.exemplo.com")
+    assert probe.probe
+
+    # Uma falha de quem não é o teste não reabre nem libera o teste em curso...
+    reopen_at = breaker._open_until["vagas.exemplo.com"]
+    assert fetch("https://vagas.exemplo.com/5", FakeSession(503), breaker, em_voo[0]) is None
+    assert breaker._open_until["vagas.exemplo.com"] == reopen_at
+    assert not breaker.allow("vagas.exemplo.com")
+    # ...e um sucesso dele também não fecha o circuito
+    assert fetch("https://vagas.exemplo.com/6", FakeSession(200), breaker, em_voo[1]).status_code == 200
+    assert breaker.is_open("vagas.exemplo.com")
+    assert not breaker.allow("vagas.exemplo.com")
+
+    # O veredito continua sendo do teste
+    assert fetch("https://vagas.exemplo.com/7", FakeSession(200), breaker, probe).status_code == 200
+    assert not breaker.is_open("vagas.exemplo.com")
+    assert breaker.stats()["opened"] == 1
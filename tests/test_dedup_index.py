@@ -0,0 +1,103 @@
+import queue
+
+import pytest
+
+import app
+
+TITULO = "Gerente de Projetos Sênior"
+SNIPPET = "Gestão de portfólio de projetos de tecnologia em São Paulo, metodologias ágeis"
+EMPRESA = "Eleva"
+GUPY = "https://eleva.gupy.io/jobs/123"
+LINKEDIN = "https://linkedin.com/jobs/view/456"
+
+
+@pytest.fixture
+def index(tmp_path):
+    return app.JobDedupIndex(str(tmp_path / "dedup.sqlite"), confirm_with_embeddings=False)
+
+
+def status(index, url):
+    row = index._conn.execute("SELECT status FROM dedup_jobs WHERE canonical_url = ?", (url,)).fetchone()
+    return row[0] if row else None
+
+
+def check(index, url, run_id):
+    return index.check(url, TITULO, SNIPPET, EMPRESA, run_id=run_id)
+
+
+def test_copia_de_canonica_que_nao_foi_gravada_e_reavaliada(index):
+    assert check(index, GUPY, "run-1") is None
+    assert check(index, LINKEDIN, "run-1") == GUPY
+    # A canônica não chegou a ser gravada: continua provisória da run-1
+
+    # Na execução seguinte a cópia não pode apontar para uma vaga que não está no banco
+    assert check(index, LINKEDIN, "run-2") is None
+    assert status(index, LINKEDIN) == "run-2"
+    assert status(index, GUPY) is None
+    index.confirm(LINKEDIN)
+    assert status(index, LINKEDIN) == "confirmed"
+    assert check(index, GUPY, "run-2") == LINKEDIN  # E a antiga canônica agora é a cópia
+
+
+def test_fallback_promove_a_proxima_fonte_quando_o_download_falha(index):
+    check(index, GUPY, "run-1")
+    check(index, LINKEDIN, "run-1")
+
+    assert index.fallback(GUPY) == LINKEDIN
+    assert index.sources(LINKEDIN) == [LINKEDIN]
+    index.confirm(LINKEDIN)
+    assert status(index, LINKEDIN) == "confirmed"
+    assert index.fallback(LINKEDIN) is None  # Confirmada não muda mais
+
+
+def test_provisoria_de_outra_execucao_nao_conta_como_original(index):
+    check(index, GUPY, "run-1")
+
+    # A run-2 não enxerga a provisória da run-1 como candidata
+    assert check(index, LINKEDIN, "run-2") is None
+    assert status(index, LINKEDIN) == "run-2"
+    # Ao reaparecer, a provisória antiga é descartada e reavaliada contra a run-2
+    assert check(index, GUPY, "run-2") == LINKEDIN
+    assert index.sources(GUPY) == [LINKEDIN, GUPY]
+
+
+class FakeClient:
+    """Stand-in do PostgREST que recusa as linhas em ``bad_ids``"""
+
+    def __init__(self, bad_ids=()):
+        self.bad_ids = set(bad_ids)
+        self._rows = None
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self._rows = rows
+        return self
+
+    def execute(self):
+        if any(row["external_id"] in self.bad_ids for row in self._rows):
+            raise RuntimeError("400 Bad Request")
+
+
+def test_confirma_so_depois_de_gravar(index, monkeypatch):
+    monkeypatch.setattr(app, "index_saved_rows", lambda rows: None)
+    outra = "https://vagas.exemplo.com/analista-financeiro"
+    check(index, GUPY, "run-1")
+    assert index.check(outra, "Analista Financeiro Pleno", "Contas a pagar e conciliação", "Outra", run_id="run-1") is None
+
+    falhou = app.stable_job_id(outra)
+    pipeline = app.ScrapePipeline("teste", client=FakeClient(bad_ids={falhou}), flush_seconds=60)
+    pipeline.crawl_state = None
+    pipeline.dedup = index
+    q = queue.Queue()
+    for link in (GUPY, outra):
+        pipeline._links_by_id[app.stable_job_id(link)] = link
+        q.put({"external_id": app.stable_job_id(link), "title": link})
+        assert status(index, link) == "run-1"  # Nada confirmado antes do upsert
+    q.put(app._STOP)
+    pipeline._consume(q)
+
+    assert status(index, GUPY) == "confirmed"
+    assert status(index, outra) == "run-1"
+    assert pipeline.counters["errors"] == 1
@@ -0,0 +1,114 @@
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+import app
+
+
+class FakeEmbeddingModel:
+    """Vetores determinísticos a partir do texto (sem torch)"""
+
+    loaded = True
+
+    def encode(self, texts, **kwargs):
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(sum(text.encode("utf-8")))
+            vectors.append(rng.standard_normal(8).astype(np.float32))
+        return np.vstack(vectors)
+
+    def stats(self):
+        return {"hits": 0, "disk_hits": 0, "misses": 0, "encode_seconds": 0.0}
+
+
+def fake_enrich_parsed_jobs(parsed, data_publicacao):
+    for link, title, failed, descricao, structured in parsed:
+        if failed:
+            yield link, None
+            continue
+        yield link, {
+            "cargo": title,
+            "empresa": "Eleva",
+            "salario_info": {"min": None, "max": None, "currency": "BRL", "disclosed": False, "type": "CLT"},
+            "modalidade": "remote",
+            "data_publicacao": data_publicacao,
+            "cidade": "São Paulo",
+            "estado": "SP",
+            "pais": "Brasil",
+            "source_url": link,
+            "descricao_completa": descricao,
+            "skills_required": [{"name": "Python"}],
+            "seniority_level": "senior",
+            "area": "tecnologia",
+            "experience_years_min": 3,
+            "quality_score": 0.1
+        }
+
+
+class FakeDedup:
+    """Cada vaga canônica também foi vista num agregador"""
+
+    def sources(self, url):
+        return [url, url.replace("empresa.exemplo.com", "agregador.exemplo.com")]
+
+
+class InlineEnrichmentExecutor(app.EnrichmentExecutor):
+    """Mesmo ``map``/coleta de métricas do pool, mas rodando ``_enrich_batch`` no próprio processo"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def _submit(self, batch, data_publicacao, embed):
+        future = Future()
+        future.set_result(app._enrich_batch(batch, data_publicacao, embed))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def enriquecimento_falso(monkeypatch):
+    monkeypatch.setattr(app, "enrich_parsed_jobs", fake_enrich_parsed_jobs)
+    monkeypatch.setattr(app, "EMBEDDING_MODEL", FakeEmbeddingModel())
+    monkeypatch.setattr(app, "EnrichmentExecutor", InlineEnrichmentExecutor)
+
+
+def make_pipeline(enrich_workers):
+    pipeline = app.ScrapePipeline("teste", enrich_workers=enrich_workers)
+    pipeline.yesterday = "2026-10-16"
+    pipeline.dedup = FakeDedup()
+    return pipeline
+
+
+PARSED = [
+    ("https://empresa.exemplo.com/vaga/1", "Engenheira de Dados", False, "Vaga remota de dados.", None),
+    ("https://empresa.exemplo.com/vaga/2", "Gerente de Produto", True, None, None),
+    ("https://empresa.exemplo.com/vaga/3", "Analista Financeiro", False, "Vaga de finanças.", None),
+]
+
+
+def rows_without_timestamp(rows):
+    return [{k: v for k, v in row.items() if k != "scraped_at"} for row in rows]
+
+
+@pytest.mark.parametrize("salvar_source_urls", [True, False])
+def test_modo_com_processos_grava_as_mesmas_linhas_que_o_serial(monkeypatch, salvar_source_urls):
+    monkeypatch.setattr(app, "SALVAR_SOURCE_URLS", salvar_source_urls)
+    serial = make_pipeline(enrich_workers=1)
+    serial_rows = list(serial._embed_stage(serial._enrich_stage(iter(PARSED))))
+    pooled = make_pipeline(enrich_workers=2)
+    pooled_rows = list(pooled._pooled_enrich_stage(iter(PARSED)))
+
+    assert len(serial_rows) == 2
+    assert rows_without_timestamp(pooled_rows) == rows_without_timestamp(serial_rows)
+    if salvar_source_urls:
+        assert pooled_rows[0]["source_urls"] == [
+            "https://empresa.exemplo.com/vaga/1", "https://agregador.exemplo.com/vaga/1"
+        ]
+    else:
+        # Sem a coluna no schema, a linha não pode mencioná-la
+        assert all("source_urls" not in row for row in pooled_rows)
+    assert pooled.counters["enriched"] == serial.counters["enriched"] == 2
+    assert pooled.counters["errors"] == serial.counters["errors"] == 1
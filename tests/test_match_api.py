@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    index = app.JobMatchIndex(str(tmp_path / "vector_index"), mode="exact")
+    rng = np.random.default_rng(7)
+    rows = [
+        {"external_id": f"eleva_{i}", "embedding": app.encode_vector(rng.standard_normal(8).astype(np.float32), fmt="json"),
+         "area": "tecnologia", "seniority_level": "senior", "city": "São Paulo", "work_model": "remote"}
+        for i in range(5)
+    ]
+    index.add_rows(rows)
+    monkeypatch.setattr(app, "MATCH_INDEX", index)
+    return app.app.test_client()
+
+
+def test_match_por_vetor(client):
+    res = client.post("/match", json={"vector": [0.1] * 8, "k": 3})
+    assert res.status_code == 200
+    assert len(res.get_json()["matches"]) == 3
+
+
+@pytest.mark.parametrize("size", [4, 16])
+def test_dimensao_errada_tem_mensagem_estavel(client, size):
+    res = client.post("/match", json={"vector": [0.1] * size})
+    assert res.status_code == 400
+    assert res.get_json() == {"error": "vector deve ter 8 dimensões"}
+
+
+@pytest.mark.parametrize("vector", [[], [[0.1, 0.2]], ["a", "b"], {"x": 1}, [float("nan")] * 8])
+def test_vetor_malformado_e_400(client, vector):
+    assert client.post("/match", json={"vector": vector}).status_code == 400
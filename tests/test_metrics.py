@@ -0,0 +1,38 @@
+import app
+
+
+def make_metrics():
+    metrics = app.Metrics(enabled=True)
+    metrics.counter("eleva_teste_total", "Teste")
+    metrics.histogram("eleva_teste_seconds", "Teste", buckets=(0.1, 1.0))
+    return metrics
+
+
+def test_delta_de_um_processo_somado_no_outro():
+    worker = make_metrics()
+    worker.inc("eleva_teste_total", source="cache")
+    before = worker.snapshot()
+    worker.inc("eleva_teste_total", 2, source="cache")
+    worker.inc("eleva_teste_total", source="nominatim")
+    worker.observe("eleva_teste_seconds", 0.5)
+    delta = worker.delta(before)
+
+    parent = make_metrics()
+    parent.inc("eleva_teste_total", source="cache")
+    parent.observe("eleva_teste_seconds", 0.05)
+    parent.merge(delta)
+
+    snapshot = parent.snapshot()
+    assert snapshot["counters"][("eleva_teste_total", (("source", "cache"),))] == 3
+    assert snapshot["counters"][("eleva_teste_total", (("source", "nominatim"),))] == 1
+    counts, total, count = snapshot["histograms"][("eleva_teste_seconds", ())]
+    assert counts == [1, 1] and count == 2
+    assert abs(total - 0.55) < 1e-9
+    assert 'eleva_teste_total{source="cache"} 3' in parent.render()
+
+
+def test_delta_sem_mudancas_vem_vazio():
+    metrics = make_metrics()
+    metrics.inc("eleva_teste_total")
+    metrics.observe("eleva_teste_seconds", 0.05)
+    assert metrics.delta(metrics.snapshot()) == {"counters": {}, "histograms": {}}
@@ -0,0 +1,53 @@
+import os
+
+import app
+
+
+def blobs(root):
+    return sorted(name for _, _, names in os.walk(os.path.join(root, "blobs")) for name in names)
+
+
+def age(archive, key, fetch_date):
+    with archive._lock:
+        archive._conn.execute("UPDATE responses SET fetch_date = ? WHERE key = ?", (fetch_date, key))
+        archive._conn.commit()
+
+
+def test_prune_remove_coletas_antigas_e_blobs_orfaos(tmp_path):
+    archive = app.ResponseArchive(str(tmp_path), retention_days=7)
+    archive.store("https://vagas.exemplo.com/antiga", 200, {}, b"<html>antiga</html>")
+    archive.store("https://vagas.exemplo.com/compartilhada-velha", 200, {}, b"<html>igual</html>")
+    archive.store("https://vagas.exemplo.com/compartilhada-nova", 200, {}, b"<html>igual</html>")
+    archive.store("https://vagas.exemplo.com/nova", 200, {}, b"<html>nova</html>")
+    age(archive, "https://vagas.exemplo.com/antiga", "2000-01-01")
+    age(archive, "https://vagas.exemplo.com/compartilhada-velha", "2000-01-01")
+    assert len(blobs(tmp_path)) == 3
+
+    assert archive.prune() == 2
+
+    assert archive.load("https://vagas.exemplo.com/antiga") is None
+    assert archive.load("https://vagas.exemplo.com/compartilhada-velha") is None
+    # O blob deduplicado continua lá enquanto uma coleta retida o referencia
+    assert archive.load("https://vagas.exemplo.com/compartilhada-nova").content == b"<html>igual</html>"
+    assert archive.load("https://vagas.exemplo.com/nova").content == b"<html>nova</html>"
+    assert len(blobs(tmp_path)) == 2
+
+
+def test_prune_com_retencao_zero_mantem_tudo(tmp_path):
+    archive = app.ResponseArchive(str(tmp_path), retention_days=0)
+    archive.store("https://vagas.exemplo.com/antiga", 200, {}, b"<html>antiga</html>")
+    age(archive, "https://vagas.exemplo.com/antiga", "2000-01-01")
+
+    assert archive.prune() == 0
+    assert archive.load("https://vagas.exemplo.com/antiga") is not None
+
+
+def test_blob_removido_e_regravado_no_proximo_store(tmp_path):
+    archive = app.ResponseArchive(str(tmp_path), retention_days=7)
+    archive.store("https://vagas.exemplo.com/a", 200, {}, b"<html>a</html>")
+    age(archive, "https://vagas.exemplo.com/a", "2000-01-01")
+    archive.prune()
+    assert blobs(tmp_path) == []
+
+    archive.store("https://vagas.exemplo.com/a", 200, {}, b"<html>a</html>")
+    assert archive.load("https://vagas.exemplo.com/a").content == b"<html>a</html>"
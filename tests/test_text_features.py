@@ -0,0 +1,127 @@
+import re
+
+import pytest
+
+import app
+
+
+# Heurísticas antigas (uma passada por palavra-chave), mantidas aqui só como referência
+def legacy_modalidade(descricao):
+    if "remoto" in descricao.lower() or "remote" in descricao.lower() or "home office" in descricao.lower():
+        return "remote"
+    elif "presencial" in descricao.lower() or "on-site" in descricao.lower() or "escritório" in descricao.lower():
+        return "onsite"
+    elif "híbrido" in descricao.lower() or "hibrido" in descricao.lower() or "hybrid" in descricao.lower():
+        return "hybrid"
+    return None
+
+
+def legacy_salary(text):
+    result = {"min": None, "max": None, "currency": "BRL", "disclosed": False, "type": "CLT"}
+    if "USD" in text or "dólar" in text.lower():
+        result["currency"] = "USD"
+    elif "EUR" in text or "euro" in text.lower():
+        result["currency"] = "EUR"
+    if "PJ" in text or "pessoa jurídica" in text.lower() or "pessoa física" in text.lower():
+        result["type"] = "PJ"
+    elif "estágio" in text.lower() or "trainee" in text.lower():
+        result["type"] = "Estágio"
+    patterns = [
+        r'R\$\s*([\d\.,]+)[\s\-]+([\d\.,]+)',
+        r'salário\s+de\s+R\$\s*([\d\.,]+)[\s\-]+([\d\.,]+)',
+        r'entre\s+([\d\.,]+)\s+e\s+([\d\.,]+)\s+reais',
+        r'([\d\.,]+)\s+a\s+([\d\.,]+)\s+mil',
+        r'faixa salarial:\s*R\$\s*([\d\.,]+)[\s\-]+([\d\.,]+)'
+    ]
+    for pattern in patterns:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            try:
+                min_val = float(matches[0][0].replace(".", "").replace(",", "."))
+                max_val = float(matches[0][1].replace(".", "").replace(",", "."))
+                if min_val < 10000:
+                    min_val *= 1000
+                    max_val *= 1000
+                result.update(min=int(min_val), max=int(max_val), disclosed=True)
+                return result
+            except (ValueError, IndexError):
+                continue
+    match = re.search(r'R\$\s*([\d\.,]+)', text)
+    if match:
+        try:
+            val = float(match.group(1).replace(".", "").replace(",", "."))
+            if val < 10000:
+                val *= 1000
+            result.update(min=int(val * 0.8), max=int(val * 1.2), disclosed=True)
+        except ValueError:
+            pass
+    return result
+
+
+def legacy_proficiency(context):
+    context_lower = context.lower()
+    if any(kw in context_lower for kw in ["especialista", "expert", "avançado", "sênior"]):
+        return 5
+    elif any(kw in context_lower for kw in ["experiente", "domínio", "proficiente", "avançado"]):
+        return 4
+    elif any(kw in context_lower for kw in ["competente", "intermediário", "bom conhecimento"]):
+        return 3
+    elif any(kw in context_lower for kw in ["básico", "iniciante", "conhecimentos"]):
+        return 2
+    return 3
+
+
+def legacy_importance(context):
+    context_lower = context.lower()
+    if any(kw in context_lower for kw in ["essencial", "obrigatório", "crítico", "fundamental", "requisito", "indispensável"]):
+        return 95
+    elif any(kw in context_lower for kw in ["importante", "desejável", "preferencial", "diferencial", "valioso"]):
+        return 80
+    return 70
+
+
+def legacy_experience(descricao):
+    return 3 if "3+ anos" in descricao.lower() else 5 if "5+ anos" in descricao.lower() else 2
+
+
+DESCRICOES = [
+    "Gerente de Projetos em São Paulo. Trabalho remoto. Salário de R$ 12.000 - 15.000. Requisito: 5+ anos em gestão.",
+    "Coordenador financeiro, modelo híbrido no Rio de Janeiro. Faixa salarial: R$ 8.500,00 - 10.000,00. Inglês é desejável.",
+    "Head de Dados. Contratação PJ, remuneração entre 20.000 e 25.000 reais. Domínio de Python obrigatório. 3+ anos.",
+    "Vaga presencial no escritório de Brasília. Remuneração de 9 a 12 mil. Conhecimentos básicos de Excel.",
+    "Programa de trainee 2025 com bolsa de R$ 2.500. Buscamos pessoas competentes e com vontade de aprender.",
+    "Diretor comercial. Salário em dólar (USD 10.000). Hybrid work. Experiência como especialista em vendas B2B é essencial.",
+    "Analista sênior de marketing, on-site. Bom conhecimento de SEO é um diferencial.",
+    "Supervisor de operações. Pagamento em EUR, atuação remota a partir de Portugal.",
+    "Descrição sem nenhuma das palavras-chave conhecidas.",
+    "",
+]
+
+
+@pytest.mark.parametrize("descricao", DESCRICOES)
+def test_matcher_equivale_as_heuristicas_antigas(descricao):
+    features = app.TEXT_FEATURES.scan(descricao)
+
+    assert features["work_model"] == legacy_modalidade(descricao)
+    assert app.extract_salary_intelligently(descricao, features) == legacy_salary(descricao)
+    assert features["proficiency"] == legacy_proficiency(descricao)
+    assert features["importance"] == legacy_importance(descricao)
+    assert features["experience_years_min"] == legacy_experience(descricao)
+
+
+def test_siglas_so_casam_como_palavra_inteira():
+    # A antiga contava "sp" dentro de "especialista" e "uk" dentro de "ukulele"
+    features = app.TEXT_FEATURES.scan("Especialista em ukulele, atendimento em SP")
+    assert features["geo_br"] == 1
+    assert features["geo_intl"] == 0
+
+
+def test_heuristicas_leem_a_descricao_truncada(monkeypatch):
+    monkeypatch.setattr(app.ONTOLOGY, "extract_cities_from_text", lambda text, doc=None: (None, None))
+    descricao = "Vaga de gerente. " + "x" * 3000 + " Trabalho remoto, salário de R$ 12.000 - 15.000."
+    details = app.analyze_job_description(descricao)
+
+    assert details["descricao_completa"] == app.truncate_description(descricao)
+    assert details["features"] == app.TEXT_FEATURES.scan(details["descricao_completa"])
+    assert details["modalidade"] == "Não informado"
+    assert details["salario"]["disclosed"] is False